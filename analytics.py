@@ -0,0 +1,334 @@
+"""
+This module contains the columnar analytics of the parsed events, used by the daily reports.
+
+The events of a type are turned into NumPy arrays, one per field (roleid, itemid, count,
+money, timestamp...), and aggregated with vectorized group-by, top-k and histogram helpers,
+so a day of events is reported in seconds instead of looping over every record.
+
+numpy is optional, the listener doesn't need it. The reports read the SQLite database written
+with --database:
+python analytics.py --database logs/events.db --day 2024-10-06
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from events import EVENT_SPECS
+from sinks import table_name
+
+try:
+    import numpy as np
+except ImportError:  # Only the reports need numpy
+    np = None  # type: ignore[assignment]
+
+# Largest number of possible keys group_sum counts with a bincount instead of sorting
+DENSE_GROUPS = 50_000_000
+
+# Sign of the money of each event type in the net money flow of a role
+MONEY_SIGNS = {
+    "process_receive_money": 1,
+    "process_pick_up_money": 1,
+    "process_spend_money": -1,
+    "process_discard_money": -1,
+    "process_upgrade_faction": -1,
+}
+
+
+def require_numpy() -> None:
+    """
+    Raises an ImportError explaining numpy is needed, if it isn't installed.
+    """
+    if np is None:
+        raise ImportError(
+            "The analytics need numpy, install it with: pip install numpy"
+        )
+
+
+def to_columns(
+    records: list[NamedTuple], fields: Optional[Iterable[str]] = None
+) -> dict:
+    """
+    Returns the records of one class as a dictionary of arrays, one per field.
+
+    Integer fields become int64 arrays, other fields object arrays.
+
+    Arguments:
+        records -- Records of the same class, or rows with the given fields
+        fields -- Names of the fields, taken from the records if not given
+    """
+    require_numpy()
+    if fields is None:
+        fields = records[0]._fields if records else ()
+    fields = tuple(fields)
+    if not records:
+        return {field: np.empty(0, dtype=np.int64) for field in fields}
+    try:
+        # A single conversion in C when every field is an integer
+        table = np.array(records, dtype=np.int64)
+        return {field: table[:, index] for index, field in enumerate(fields)}
+    except (TypeError, ValueError):
+        pass
+
+    columns = {}
+    for index, field in enumerate(fields):
+        values = [record[index] for record in records]
+        if all(value.__class__ is int for value in values):
+            columns[field] = np.array(values, dtype=np.int64)
+        else:
+            columns[field] = np.array(values, dtype=object)
+    return columns
+
+
+def group_by_class(records: Iterable[NamedTuple]) -> dict[type, dict]:
+    """
+    Returns the columns of a batch of mixed records, keyed by record class.
+
+    Arguments:
+        records -- Parsed events, e.g. a buffer of the sink
+    """
+    batches: dict[type, list[NamedTuple]] = {}
+    for record in records:
+        batches.setdefault(record.__class__, []).append(record)
+    return {record_class: to_columns(batch) for record_class, batch in batches.items()}
+
+
+def group_sum(values, *keys) -> tuple:
+    """
+    Returns the sum of the values of every distinct key, as (keys, sums), where keys is a
+    tuple with an array per key column, sorted by key.
+
+    The key columns are packed into a single integer per row, then summed with a bincount
+    when the packed keys are dense enough, or by sorting them otherwise.
+
+    Arguments:
+        values -- Integer values summed
+        keys -- Integer key columns, e.g. roleid or roleid and itemid
+    """
+    require_numpy()
+    if not len(values):
+        return tuple(key[:0] for key in keys), values[:0]
+
+    lows = [int(key.min()) for key in keys]
+    spans = [int(key.max()) - low + 1 for key, low in zip(keys, lows)]
+    size = 1
+    for span in spans:
+        size *= span
+    if size >= 2**62:
+        return _group_sum_lexsort(values, keys)
+
+    packed = np.zeros(len(values), dtype=np.int64)
+    for key, low, span in zip(keys, lows, spans):
+        packed *= span
+        packed += key - low
+
+    if size <= DENSE_GROUPS:
+        counts = np.bincount(packed, minlength=size)
+        present = np.flatnonzero(counts)
+        # The float sums are exact below 2 ** 53
+        sums = np.bincount(packed, weights=values, minlength=size)[present]
+        sums = sums.astype(values.dtype) if values.dtype.kind in "iu" else sums
+        packed = present
+    else:
+        order = np.argsort(packed)
+        packed = packed[order]
+        starts = np.flatnonzero(np.concatenate(([True], packed[1:] != packed[:-1])))
+        sums = np.add.reduceat(values[order], starts)
+        packed = packed[starts]
+
+    unpacked = []
+    for low, span in zip(lows[::-1], spans[::-1]):
+        packed, offset = np.divmod(packed, span)
+        unpacked.append(offset + low)
+    return tuple(unpacked[::-1]), sums
+
+
+def _group_sum_lexsort(values, keys) -> tuple:
+    # Keys too sparse to be packed into an int64, lexsort sorts by the last key first
+    order = np.lexsort(keys[::-1])
+    sorted_keys = [key[order] for key in keys]
+    changed = np.zeros(len(values), dtype=bool)
+    changed[0] = True
+    for key in sorted_keys:
+        changed[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(changed)
+    sums = np.add.reduceat(values[order], starts)
+    return tuple(key[starts] for key in sorted_keys), sums
+
+
+def top_k(keys: tuple, values, count: int) -> list[tuple]:
+    """
+    Returns the count keys with the highest values, as (key..., value) tuples, highest first.
+
+    Arguments:
+        keys -- Tuple with an array per key column, as returned by group_sum
+        values -- Value of every key
+        count -- Number of keys returned
+    """
+    require_numpy()
+    if len(values) > count:
+        chosen = np.argpartition(values, -count)[-count:]
+    else:
+        chosen = np.arange(len(values))
+    chosen = np.sort(chosen)
+    # Ties keep the order of the keys
+    chosen = chosen[np.argsort(-values[chosen], kind="stable")]
+    return [
+        tuple(int(key[index]) for key in keys) + (int(values[index]),)
+        for index in chosen
+    ]
+
+
+def time_histogram(timestamps, bucket: int = 3600, weights=None) -> tuple:
+    """
+    Returns the number of events (or the sum of weights) in every time bucket, as
+    (bucket starts, counts), covering the first to the last timestamp.
+
+    Arguments:
+        timestamps -- Epoch timestamps
+        bucket -- Seconds of a bucket
+        weights -- Values summed instead of counting the events
+    """
+    require_numpy()
+    if not len(timestamps):
+        return timestamps[:0], timestamps[:0]
+    numbers = timestamps // bucket
+    first = numbers.min()
+    counts = np.bincount(numbers - first, weights=weights)
+    if weights is not None and weights.dtype.kind in "iu":
+        counts = counts.astype(np.int64)
+    return (np.arange(len(counts)) + first) * bucket, counts
+
+
+def economy_report(columns: dict[str, dict], count: int = 100) -> list[tuple]:
+    """
+    Returns the roles with the highest net money flow, as (roleid, money) tuples.
+
+    Arguments:
+        columns -- Columns of the events, keyed by event type name (e.g. process_spend_money)
+        count -- Number of roles
+    """
+    require_numpy()
+    roles = []
+    money = []
+    for name, sign in MONEY_SIGNS.items():
+        event = columns.get(name)
+        if event is not None and len(event["roleid"]):
+            roles.append(event["roleid"])
+            money.append(event["money"] * sign)
+    if not roles:
+        return []
+    keys, sums = group_sum(np.concatenate(money), np.concatenate(roles))
+    return top_k(keys, sums, count)
+
+
+def mining_report(columns: dict[str, dict], count: int = 100) -> list[tuple]:
+    """
+    Returns the roles and items with the most units mined, as (roleid, itemid, count) tuples.
+
+    Arguments:
+        columns -- Columns of the events, keyed by event type name
+        count -- Number of rows
+    """
+    mine = columns.get("process_mine")
+    if mine is None:
+        return []
+    keys, sums = group_sum(mine["count"], mine["roleid"], mine["itemid"])
+    return top_k(keys, sums, count)
+
+
+def exp_report(columns: dict[str, dict], count: int = 100) -> tuple[list[tuple], tuple]:
+    """
+    Returns the roles with the most exp, as (roleid, exp) tuples, and the exp gained in every
+    hour, as returned by time_histogram.
+
+    Arguments:
+        columns -- Columns of the events, keyed by event type name
+        count -- Number of roles
+    """
+    exp = columns.get("process_exp_sp")
+    if exp is None:
+        return [], ((), ())
+    keys, sums = group_sum(exp["exp"], exp["roleid"])
+    return top_k(keys, sums, count), time_histogram(exp["timestamp"], 3600, exp["exp"])
+
+
+def load_events(
+    database: str, names: Iterable[str], start: int, end: int
+) -> dict[str, dict]:
+    """
+    Returns the columns of the events of the given types stored by the SQLiteSink between
+    two timestamps, keyed by event type name.
+
+    Arguments:
+        database -- Path of the SQLite database
+        names -- Event type names, e.g. process_mine
+        start -- First epoch timestamp included
+        end -- First epoch timestamp excluded
+    """
+    require_numpy()
+    connection = sqlite3.connect(database)
+    columns = {}
+    try:
+        for name in names:
+            record = EVENT_SPECS[name].record
+            if record is None:
+                continue
+            table = table_name(record)
+            try:
+                cursor = connection.execute(
+                    f"SELECT * FROM {table} WHERE timestamp >= ? AND timestamp < ?",
+                    (start, end),
+                )
+            except sqlite3.OperationalError:
+                continue
+            fields = [description[0] for description in cursor.description]
+            columns[name] = to_columns(cursor.fetchall(), fields)
+    finally:
+        connection.close()
+    return columns
+
+
+def main(argv: list[str]) -> int:
+    """
+    Prints the economy, mining and exp reports of a day, returns the exit code.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    parser = argparse.ArgumentParser(description="Daily reports of the stored events")
+    parser.add_argument(
+        "--database", required=True, help="SQLite database of the events"
+    )
+    parser.add_argument("--day", required=True, help="Day of the report, as YYYY-MM-DD")
+    parser.add_argument(
+        "--top", type=int, default=100, help="Number of rows of each report"
+    )
+    args = parser.parse_args(argv)
+
+    start = int(time.mktime(time.strptime(args.day, "%Y-%m-%d")))
+    end = start + 86400
+    columns = load_events(
+        args.database, [*MONEY_SIGNS, "process_mine", "process_exp_sp"], start, end
+    )
+
+    print(f"Top {args.top} money earners of {args.day} (role ID, net money):")
+    for roleid, money in economy_report(columns, args.top):
+        print(f"  {roleid}: {money}")
+    print(f"Top {args.top} miners of {args.day} (role ID, item ID, units):")
+    for roleid, itemid, count in mining_report(columns, args.top):
+        print(f"  {roleid}, {itemid}: {count}")
+    top_exp, (hours, exp) = exp_report(columns, args.top)
+    print(f"Top {args.top} exp of {args.day} (role ID, exp):")
+    for roleid, gained in top_exp:
+        print(f"  {roleid}: {gained}")
+    print("Exp per hour:")
+    for hour, gained in zip(hours, exp):
+        print(f"  {time.strftime('%H:00', time.localtime(int(hour)))}: {int(gained)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
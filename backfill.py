@@ -0,0 +1,229 @@
+"""This module contains the parallel backfill of whole log files, plain or rotated .gz, and the
+parser processes it shares with the --pipeline parse workers"""
+
+import gzip
+import heapq
+import multiprocessing
+import os
+import re
+import signal
+from collections import deque
+from operator import itemgetter
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Optional
+
+from sinks import MemorySink
+
+if TYPE_CHECKING:
+    from log_listener import LogHandler
+
+# Bytes of a plain file parsed by one task, files are split into ranges of this size
+RANGE_SIZE = 32 * 1024 * 1024
+
+# Rotation suffix of a log file, a number or a date, optionally compressed
+ROTATION_SUFFIX = re.compile(r"\.(?:\d+|\d{4}-\d{2}-\d{2})(?:\.gz)?$|\.gz$")
+
+# Handler of a worker process, the sink of its events and the encoding of the log files,
+# created once by init_worker
+_WORKER: Optional[tuple["LogHandler", MemorySink, str]] = None
+
+
+def split_ranges(path: str, range_size: int = RANGE_SIZE) -> list[tuple[str, int, int]]:
+    """
+    Returns the (path, start, end) byte ranges a plain file is parsed in, each one starting
+    right after a newline.
+
+    Arguments:
+        path -- Path of the log file
+        range_size -- Approximate size of a range
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        start = 0
+        while start < size:
+            file.seek(min(start + range_size, size))
+            # The end of the line the boundary fell into, so a line is never split
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((path, start, end))
+            start = end
+    return ranges
+
+
+def iter_tasks(paths: Iterable[str], range_size: int = RANGE_SIZE) -> Iterator:
+    """
+    Yields the tasks of the workers, in the order of the files and of their lines: the byte
+    ranges of the plain files, and the decompressed blocks of the .gz files, which can't be
+    read from an offset, cut after their last newline.
+
+    Arguments:
+        paths -- Log files
+        range_size -- Approximate size of a range or block
+    """
+    for path in paths:
+        if not path.endswith(".gz"):
+            yield from split_ranges(path, range_size)
+            continue
+        partial = b""
+        with gzip.open(path, "rb") as file:
+            while True:
+                block = file.read(range_size)
+                if not block:
+                    break
+                block = partial + block
+                end = block.rfind(b"\n") + 1
+                partial = block[end:]
+                if end:
+                    yield block[:end]
+        if partial:
+            yield partial
+
+
+def read_lines(task, encoding: str = "utf-8") -> list[str]:
+    """
+    Returns the lines of a task, decoded with one call and without newlines.
+
+    Arguments:
+        task -- (path, start, end) byte range of a plain file, or a block of a .gz file
+        encoding -- Encoding the file is written in
+    """
+    if isinstance(task, bytes):
+        data = task
+    else:
+        path, start, end = task
+        with open(path, "rb") as file:
+            file.seek(start)
+            data = file.read(end - start)
+    return data.decode(encoding, "replace").split("\n")
+
+
+def init_worker(encoding: str) -> None:
+    """
+    Creates the handler of a worker process, without observers: the stateful observers see
+    every event in order in the parent process. Parsing a line (decoding a chat message
+    included) doesn't depend on the lines parsed before it, so a worker gives the events the
+    parent would, whichever lines it's given.
+
+    Arguments:
+        encoding -- Encoding of the log files
+    """
+    # log_listener imports this module for --backfill
+    # pylint: disable=import-outside-toplevel,global-statement
+    from log_listener import LogHandler
+
+    global _WORKER
+    # Ctrl+C reaches the whole process group, the parent stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sink = MemorySink()
+    _WORKER = (LogHandler(sink=sink), sink, encoding)
+
+
+def parse_task(task) -> tuple[int, list[NamedTuple]]:
+    """
+    Returns the number of lines of a task and the events parsed from them, in a worker.
+
+    Arguments:
+        task -- Task yielded by iter_tasks
+    """
+    assert _WORKER is not None, "init_worker wasn't run in this process"
+    handler, sink, encoding = _WORKER
+    lines = read_lines(task, encoding)
+    source = None if isinstance(task, bytes) else task[0]
+    return handler.process_stream(lines, source), sink.take()
+
+
+def parse_lines(lines: list[str], source: Optional[str] = None) -> list[NamedTuple]:
+    """
+    Returns the events parsed from lines, in a worker of the --pipeline parse pool.
+
+    Arguments:
+        lines -- Log lines, without newlines
+        source -- Path of the file the lines were read from
+    """
+    assert _WORKER is not None, "init_worker wasn't run in this process"
+    handler, sink, _ = _WORKER
+    handler.process_stream(lines, source)
+    return sink.take()
+
+
+def stream_name(path: str) -> str:
+    """
+    Returns the log a file belongs to, without its rotation suffix: world2.log.2.gz and
+    world2.log.2024-10-06 are both world2.log.
+
+    Arguments:
+        path -- Path of the log file
+    """
+    return ROTATION_SUFFIX.sub("", path, count=1)
+
+
+def parsed_records(
+    pool, tasks: Iterator, lookahead: int, counts: list[int]
+) -> Iterator[tuple]:
+    """
+    Yields the events parsed by the pool from a sequence of tasks, in order, keeping up to
+    lookahead tasks queued ahead of the one being read.
+
+    Arguments:
+        pool -- Process pool whose workers were created by init_worker
+        tasks -- Tasks of one log, as yielded by iter_tasks
+        lookahead -- Number of tasks queued ahead
+        counts -- Single item list the number of lines processed is added to
+    """
+    pending: deque = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(parse_task, (task,)))
+        if len(pending) > lookahead:
+            count, records = pending.popleft().get()
+            counts[0] += count
+            yield from records
+    while pending:
+        count, records = pending.popleft().get()
+        counts[0] += count
+        yield from records
+
+
+def backfill(
+    handler,
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    encoding: str = "utf-8",
+    range_size: int = RANGE_SIZE,
+) -> int:
+    """
+    This function parses whole log files with a pool of processes and writes their events
+    through the handler, in order, the same as if the handler had read them: the workers only
+    parse, the handler writes every event to its sink and passes it to its observers (trades,
+    sessions, rates...).
+
+    The files of each log (world2.log, world2.chat...) are read in the given order, and the
+    events of the logs are merged by timestamp with a heap. Each log keeps a few tasks queued,
+    so neither the .gz blocks nor the parsed events pile up in memory.
+
+    Arguments:
+        handler -- LogHandler whose sink and observers receive the events
+        paths -- Log files, oldest first within each log, e.g. world2.log.2.gz world2.log.1
+        workers -- Number of processes, the number of cores by default
+        encoding -- Encoding of the log files
+        range_size -- Approximate size of the byte range of a task
+
+    Returns:
+        Number of lines processed
+    """
+    workers = workers or os.cpu_count() or 1
+    logs: dict[str, list[str]] = {}
+    for path in paths:
+        logs.setdefault(stream_name(path), []).append(path)
+    lookahead = max(2 * workers // len(logs), 1) if logs else 1
+    counts = [0]
+
+    with multiprocessing.Pool(
+        workers, initializer=init_worker, initargs=(encoding,)
+    ) as pool:
+        streams = [
+            parsed_records(pool, iter_tasks(files, range_size), lookahead, counts)
+            for files in logs.values()
+        ]
+        for record in heapq.merge(*streams, key=itemgetter(0)):
+            handler.write_record(record)
+    return counts[0]
@@ -0,0 +1,16 @@
+"""This module exposes the log lines used in tests/test_logs.py so benchmarks run on real lines"""
+
+from tests.test_logs import TestLogs
+
+
+def fixture_lines() -> dict[str, str]:
+    """
+    Returns the fixture log lines of TestLogs, keyed by their attribute name.
+    """
+    case = TestLogs()
+    case.setUp()
+    return {
+        name: value
+        for name, value in vars(case).items()
+        if isinstance(value, str) and not name.startswith("_")
+    }
@@ -0,0 +1,185 @@
+"""
+Generator of synthetic world2 logs, built from the fixture lines of tests/test_logs.py.
+
+Every generated line is a fixture line with a new timestamp and new random values for the
+numbers of 3 or more digits (role, user, item and order ids, amounts of money...), except
+the type= codes the handlers match on (formatlog:die type=258 is a player kill), so the
+corpus has realistic lines without repeating the same ids. A ratio of the lines are taken
+from UNMATCHED_LINES instead, lines the listener has no handler for.
+
+Write a corpus from the repository root with:
+python -m benchmarks.generator --lines 1000000 --output world2.log
+"""
+
+import argparse
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from benchmarks.fixtures import fixture_lines
+
+# Lines written by the world2 daemons that match no keyword of LOG_PATTERNS
+UNMATCHED_LINES = {
+    "instance": "2024-10-06 20:42:05 pwtestes.com gamed: info : 用户1024进入副本 10 分钟后离开",
+    "keepalive": "2024-10-06 20:42:05 pwtestes.com glinkd-1: info : keepalive userid=1072:localsid=147",
+    "save_role": "2024-10-06 20:42:05 pwtestes.com gamedbd: notice : formatlog:putrole:roleid=1041:size=8342",
+    "mapping": "2024-10-06 20:42:05 pwtestes.com gdeliveryd: notice : formatlog:mapping:userid=1072:zoneid=1",
+}
+
+NUMBER = re.compile(r"(?<!type=)(\d{3,})")
+
+
+class Template:
+    """
+    This class generates lines like a fixture line, with random numbers and a given timestamp.
+
+    Arguments:
+        name -- Name of the fixture line, used as the event type in the reports
+        line -- Fixture line
+    """
+
+    def __init__(self, name: str, line: str) -> None:
+        self.name = name
+        # The literal parts are at even positions, the widths of the numbers at odd ones
+        parts = NUMBER.split(line[19:])
+        self.literals = parts[0::2]
+        self.widths = [len(number) for number in parts[1::2]]
+
+    def render(self, timestamp: str, rng: random.Random) -> str:
+        """
+        Returns a line with the given timestamp and random numbers of the same widths.
+
+        Arguments:
+            timestamp -- Timestamp of the line, as YYYY-MM-DD HH:MM:SS
+            rng -- Random generator of the numbers
+        """
+        pieces = [timestamp, self.literals[0]]
+        for width, literal in zip(self.widths, self.literals[1:]):
+            pieces.append(str(rng.randrange(10 ** (width - 1), 10**width)))
+            pieces.append(literal)
+        return "".join(pieces)
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+    Returns the weights of an event mix given as name=weight,name=weight.
+
+    Arguments:
+        mix -- Event mix, the names are the fixture line names of tests/test_logs.py
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight) if weight else 1.0
+    return weights
+
+
+def generate_lines(
+    count: int,
+    mix: Optional[dict[str, float]] = None,
+    unmatched_ratio: float = 0.3,
+    lines_per_second: int = 1000,
+    seed: int = 0,
+    start: datetime = datetime(2024, 10, 6, 20, 0, 0),
+) -> Iterator[tuple[str, str]]:
+    """
+    Yields synthetic log lines as (event type, line) tuples, the event type being the name of
+    the fixture line, or "unmatched" for a line the listener has no handler for.
+
+    Arguments:
+        count -- Number of lines
+        mix -- Weight of each fixture line, every fixture line has weight 1 if None
+        unmatched_ratio -- Ratio of unmatched lines, between 0 and 1
+        lines_per_second -- Number of lines with the same timestamp
+        seed -- Seed of the random generator, the same seed generates the same corpus
+        start -- Timestamp of the first line
+    """
+    fixtures = fixture_lines()
+    if mix is None:
+        mix = dict.fromkeys(fixtures, 1.0)
+    unknown = set(mix) - set(fixtures)
+    if unknown:
+        raise ValueError(
+            f"Unknown fixture lines in the mix: {', '.join(sorted(unknown))}"
+        )
+
+    templates = [Template(name, fixtures[name]) for name in mix]
+    weights = list(mix.values())
+    unmatched = [Template("unmatched", line) for line in UNMATCHED_LINES.values()]
+    rng = random.Random(seed)
+
+    timestamp = start
+    text = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    batch = 4096
+    for first in range(0, count, batch):
+        size = min(batch, count - first)
+        chosen = rng.choices(templates, weights, k=size)
+        for index, template in enumerate(chosen, first):
+            if index and index % lines_per_second == 0:
+                timestamp += timedelta(seconds=1)
+                text = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            if rng.random() < unmatched_ratio:
+                template = rng.choice(unmatched)
+            yield template.name, template.render(text, rng)
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """
+    Parses the command line arguments of the generator.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    parser = argparse.ArgumentParser(description="Generate a synthetic world2 log")
+    add_corpus_arguments(parser)
+    parser.add_argument(
+        "--output", help="File the lines are written to, stdout if not given"
+    )
+    return parser.parse_args(argv)
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the arguments that describe a generated corpus, shared by the benchmarks.
+
+    Arguments:
+        parser -- Parser the arguments are added to
+    """
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Number of lines")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        help="Weights of the fixture lines as name=weight,... (every line has weight 1 if not given)",
+    )
+    parser.add_argument(
+        "--unmatched", type=float, default=0.3, help="Ratio of lines with no handler"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the random generator"
+    )
+
+
+def main(argv: list[str]) -> int:
+    """
+    Writes a generated corpus to a file or stdout.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    args = parse_args(argv)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for _, line in generate_lines(
+            args.lines, args.mix, args.unmatched, seed=args.seed
+        ):
+            output.write(f"{line}\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
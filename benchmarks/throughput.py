@@ -0,0 +1,207 @@
+"""
+Throughput benchmark of LogHandler.process_log_line on a generated world2 corpus.
+
+It reports:
+- lines per second of the whole handler, parsing and writing the events to a FileSink
+- parse latency per event type (mean, median and 99th percentile), timed line by line
+- peak memory, traced while the handler processes a sample of the corpus, and the peak RSS
+
+Run it from the repository root with: python -m benchmarks.throughput --lines 1000000
+With --save the results are written as json, and with --baseline it fails when the lines per
+second fall more than --tolerance below a saved result.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from array import array
+from itertools import islice
+
+from benchmarks.generator import add_corpus_arguments, generate_lines
+from log_listener import LogHandler
+from sinks import FileSink
+
+CHUNK_SIZE = 100_000
+
+
+def make_handler(output: str) -> LogHandler:
+    """
+    Returns a handler writing to the given file, os.devnull keeps the benchmark off the disk.
+
+    Arguments:
+        output -- File the events are written to
+    """
+    return LogHandler(sink=FileSink(output, flush_interval=0))
+
+
+def measure_throughput(args: argparse.Namespace) -> float:
+    """
+    Returns the lines per second of the handler on the whole corpus.
+
+    The corpus is generated in chunks, only the processing of each chunk is timed.
+
+    Arguments:
+        args -- Parsed command line arguments
+    """
+    handler = make_handler(args.output)
+    lines = generate_lines(args.lines, args.mix, args.unmatched, seed=args.seed)
+    elapsed = 0.0
+    processed = 0
+    try:
+        while True:
+            chunk = [line for _, line in islice(lines, CHUNK_SIZE)]
+            if not chunk:
+                break
+            process_log_line = handler.process_log_line
+            started = time.perf_counter()
+            for line in chunk:
+                process_log_line(line)
+            elapsed += time.perf_counter() - started
+            processed += len(chunk)
+    finally:
+        handler.close()
+    return processed / elapsed
+
+
+def measure_latency(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    """
+    Returns the parse latency of each event type in microseconds, on a sample of the corpus.
+
+    Arguments:
+        args -- Parsed command line arguments
+    """
+    handler = make_handler(args.output)
+    timings: dict[str, array] = {}
+    sample = generate_lines(
+        min(args.lines, args.sample), args.mix, args.unmatched, seed=args.seed
+    )
+    clock = time.perf_counter_ns
+    try:
+        for name, line in sample:
+            started = clock()
+            handler.process_log_line(line)
+            timings.setdefault(name, array("q")).append(clock() - started)
+    finally:
+        handler.close()
+
+    report = {}
+    for name, values in sorted(timings.items()):
+        ordered = sorted(values)
+        report[name] = {
+            "count": len(ordered),
+            "mean": statistics.fmean(ordered) / 1000,
+            "p50": ordered[len(ordered) // 2] / 1000,
+            "p99": ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] / 1000,
+        }
+    return report
+
+
+def measure_memory(args: argparse.Namespace) -> int:
+    """
+    Returns the peak memory in bytes allocated while the handler processes a sample.
+
+    Arguments:
+        args -- Parsed command line arguments
+    """
+    sample = [
+        line
+        for _, line in generate_lines(
+            min(args.lines, args.sample), args.mix, args.unmatched, seed=args.seed
+        )
+    ]
+    handler = make_handler(args.output)
+    tracemalloc.start()
+    try:
+        for line in sample:
+            handler.process_log_line(line)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        handler.close()
+    return peak
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """
+    Parses the command line arguments of the benchmark.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark LogHandler.process_log_line"
+    )
+    add_corpus_arguments(parser)
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=200_000,
+        help="Number of lines timed one by one for the latency and memory reports",
+    )
+    parser.add_argument(
+        "--output", default=os.devnull, help="File the FileSink writes the events to"
+    )
+    parser.add_argument("--save", help="Write the results to this json file")
+    parser.add_argument(
+        "--baseline", help="Json file of a previous run to compare with"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Fraction of the baseline lines per second that may be lost before failing",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    """
+    Runs the benchmark and prints its report, returns 1 on a regression against the baseline.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    args = parse_args(argv)
+    results = {
+        "lines": args.lines,
+        "lines_per_second": measure_throughput(args),
+        "latency_us": measure_latency(args),
+        "peak_traced_bytes": measure_memory(args),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+    print(f"lines/sec: {results['lines_per_second']:,.0f} ({args.lines:,} lines)")
+    print(f"peak traced memory: {results['peak_traced_bytes'] / 2**20:.1f} MiB")
+    print(f"peak RSS: {results['peak_rss_bytes'] / 2**20:.1f} MiB")
+    print(
+        f"{'event type':<28}{'count':>10}{'mean (us)':>12}{'p50 (us)':>12}{'p99 (us)':>12}"
+    )
+    for name, latency in results["latency_us"].items():
+        print(
+            f"{name:<28}{latency['count']:>10}{latency['mean']:>12.2f}"
+            f"{latency['p50']:>12.2f}{latency['p99']:>12.2f}"
+        )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["lines_per_second"]
+        change = results["lines_per_second"] / baseline - 1
+        print(f"lines/sec against the baseline: {change:+.1%}")
+        if change < -args.tolerance:
+            print("Throughput regression", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,167 @@
+"""This module contains the parser of the chat lines of world2.chat and the decoder of their messages"""
+
+import binascii
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional
+
+from config import CHAT_CHANNELS
+from log_header import LogHeader, to_epoch
+
+
+class ChatMessage(NamedTuple):
+    """
+    Message of a chat line. receiver is the role a whisper was sent to, or the faction of a
+    faction message, else 0.
+    """
+
+    timestamp: int
+    channel: str
+    roleid: int
+    receiver: int
+    text: str
+
+
+# Payload of a chat line, e.g. "Chat: src=1041 chl=1 msg=SABpAA==". Public channels have a chl
+# code, whispers (Whisper: ... dst=) and faction messages (Guild: ... fid=) name the receiver
+CHAT_REGEX = re.compile(r"\w+: src=(\d+) (?:(\w+)=(\d+) )?msg=(\S*)")
+
+# Channel of the chat lines that name their receiver, by the key of the receiver
+DIRECT_KEYS = {"dst": "whisper", "fid": "faction"}
+
+# Unicode categories that don't occur in a chat message: control, private use, surrogate and
+# unassigned characters, what GBK bytes turn into when they're decoded as UTF-16LE
+REJECTED_CATEGORIES = frozenset(("Cc", "Co", "Cs", "Cn"))
+
+
+def is_text(text: str) -> bool:
+    """
+    Returns True if a decoded message has no character of REJECTED_CATEGORIES, apart from
+    tabs and newlines.
+
+    Arguments:
+        text -- Decoded message
+    """
+    # isprintable also rejects the spaces other than " " and the format characters, which
+    # can be part of a message, so only the texts it rejects are checked one character at a time
+    if text.isprintable():
+        return True
+    category = unicodedata.category
+    return all(
+        category(char) not in REJECTED_CATEGORIES or char in "\t\n\r" for char in text
+    )
+
+
+# The 6763 hanzi of GB2312 (rows 0xB0 to 0xF7), the characters nearly every Chinese message is
+# written with. Text decoded with the wrong encoding has other characters: the GBK characters
+# read from UTF-16LE bytes are all outside GB2312 (one of their bytes is below 0xA1), and the
+# ideographs read from ASCII pairs as UTF-16LE are mostly rare ones
+COMMON_HANZI = frozenset(
+    bytes((row, cell)).decode("gb2312")
+    for row in range(0xB0, 0xF8)
+    for cell in range(0xA1, 0xFF)
+    if (row, cell) < (0xD7, 0xFA) or row > 0xD7
+)
+
+
+def text_score(text: str) -> int:
+    """
+    Returns how much of a decoded message is made of what the messages are written with:
+    ASCII letters, digits and spaces count 1 and COMMON_HANZI count 2, the bytes they take,
+    so the two characters a hanzi turns into when its bytes are read as ASCII don't outweigh it.
+
+    Arguments:
+        text -- Decoded message
+    """
+    score = 0
+    for char in text:
+        if char in COMMON_HANZI:
+            score += 2
+        elif char.isascii() and (char.isalnum() or char == " "):
+            score += 1
+    return score
+
+
+class ChatDecoder:
+    """
+    This class decodes the base64 messages of the chat lines.
+
+    The game client sends the text as UTF-16LE, older servers log it as GBK. Most byte strings
+    of an even length decode as UTF-16LE without an error, so a message is decoded with every
+    encoding and the texts with characters no message has (see is_text) are rejected. A
+    message valid in several encodings (ASCII text in GBK is valid CJK in UTF-16LE) is decoded
+    with the one whose text has the highest text_score, the first one on a tie: "hello!" in
+    GBK scores 5, and 0 as the rare ideographs "敨汬Ⅿ" it reads as in UTF-16LE. If no encoding
+    gives a valid text, the last one replaces the bytes it can't decode. A server known to
+    write a single encoding can be given only that one (CHAT_ENCODINGS).
+
+    The decoding only depends on the message, so the same line gives the same text in every
+    process, the listener and the --backfill or --parse-workers workers alike.
+
+    The same message is often repeated (spam, trade announcements), so the decoded texts are
+    kept in an LRU cache and a repeated message costs a dictionary lookup.
+
+    Arguments:
+        encodings -- Text encodings, in order of preference
+        cache_size -- Number of decoded messages kept
+    """
+
+    def __init__(
+        self, encodings: Iterable[str] = ("utf-16-le", "gbk"), cache_size: int = 4096
+    ) -> None:
+        self.encodings = tuple(encodings)
+        self.decode = lru_cache(maxsize=cache_size)(self._decode)
+
+    def cache_info(self) -> dict:
+        """
+        Returns the hits, misses and size of the cache, for the stats file.
+        """
+        info = self.decode.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+    def _decode(self, message: str) -> str:
+        try:
+            data = binascii.a2b_base64(message)
+        except binascii.Error:
+            return message
+        valid = []
+        for encoding in self.encodings:
+            try:
+                text = data.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+            if is_text(text):
+                valid.append(text)
+        if not valid:
+            return data.decode(self.encodings[-1], "replace")
+        if len(valid) == 1:
+            return valid[0]
+        # max keeps the first of the texts with the highest score
+        return max(valid, key=text_score)
+
+
+def parse_chat(header: LogHeader, decoder: ChatDecoder) -> Optional[ChatMessage]:
+    """
+    Returns the ChatMessage of a chat line, or None if the line isn't a chat message.
+
+    Arguments:
+        header -- Header of the log line, its level is chat
+        decoder -- Decoder of the base64 messages
+    """
+    matches = CHAT_REGEX.match(header.payload)
+    if matches is None:
+        return None
+    roleid, key, value, message = matches.groups()
+    direct = DIRECT_KEYS.get(key)
+    if direct is not None:
+        channel, receiver = direct, int(value)
+    else:
+        channel, receiver = CHAT_CHANNELS.get(int(value or 0), "unknown"), 0
+    return ChatMessage(
+        to_epoch(header.timestamp),
+        channel,
+        int(roleid),
+        receiver,
+        decoder.decode(message),
+    )
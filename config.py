@@ -1,9 +1,11 @@
 """This module contains configurations such as function names and regex patterns for the log handler"""
 
+# The regexes of the process_* functions are declared with their fields in events.py
+
 LOG_PATTERNS = {
-    "GM:": "processGMActions",
-    "chat :": "processChat",
-    "formatlog:sendmail": "processSendMail",
+    "GM:": "process_gm_actions",  # done, matched against the templates of REGEX_PATTERNS
+    "chat :": "process_chat",  # done, matched against the level of the line
+    "formatlog:sendmail": "process_send_mail",  # done
     # Missing added auction itens and purchase from auction
     "formatlog:rolelogin": "process_login",  # done
     "formatlog:rolelogout": "process_logout",  # done
@@ -35,6 +37,7 @@ LOG_PATTERNS = {
     "得到经验": "process_exp_sp",  # done
 }
 
+# printf-style templates of the GM lines, compiled into a single matcher by templates.py
 REGEX_PATTERNS = {
     "startActivity": "GM %d started the activity %d.",
     "stopActivity": "GM %d stopped the activity %d.",
@@ -50,44 +53,106 @@ REGEX_PATTERNS = {
     "movePlayer": "GM %d moved player %d to position (%f, %f, %f).",
     "command": "The GM with Role ID %d executed internal command %d.",
     # Missing kicking from faction?
-    "process_mine": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*? 用户(\d+)采集得到(\d+)个(\d+)",
-    "process_create_faction": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*roleid=(\d+):factionid=(\d+)",
-    "process_upgrade_faction": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?factionid=(\d+):master=(\d+):money=(\d+):level=(\d+)",
-    "process_join_faction": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s.*roleid=(?P<roleid>\d+):factionid=(?P<factionid>\d+)",
-    "process_promote_in_faction": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?type=promote:superior=(\d+):roleid=(\d+):factionid=(\d+):role=(\d+)",
-    "process_leave_faction": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?type=leave:roleid=(\d+):factionid=(\d+):role=\d+",
-    "process_delete_faction": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?type=delete:factionid=(\d+)",
-    "process_create_party": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?用户(\d+)建立了队伍\((\d+),\d+\)",
-    "process_join_party": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?用户(\d+)成为队员\((\d+),\d+\)",
-    "process_leave_party": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?用户(\d+)脱离队伍\((\d+),\d+\)",
-    "process_egg_hatch": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)孵化了宠物蛋(\d+)",
     "petEggRestore": "The Role ID %d restored a pet and received the pet egg ID %d.",
-    "process_craft_item": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?用户(\d+).*?(\d+).*?(\d+).*?(\d+).*?(\d+).*?(\d+).*?(\d+).*?(\d+)",
-    "process_kill_person": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*roleid=(\d+):type=258:.*attacker=(\d+)",
-    "process_spend_money": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)花掉金钱(\d+)",
-    "process_spend_sp": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)消耗了sp (\d+)",
-    "process_upgrade_skill": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)技能(\d+)达到(\d+)级",
     "sendMail": "Timestamp: %d, The Role ID %d just sent a mail to role ID %d. Mail ID: %d. Mail size: %d. Money sent: %d. Item ID: %d. Item count: %d. Mail position: %d.",
-    "process_logout": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*userid=(\d+):roleid=(\d+):.*time=(\d+)",
-    "process_login": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*userid=(\d+):roleid=(\d+)",
-    "process_drop_equipment": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)丢弃装备(\d+)",
-    "process_drop_item": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)丢弃包裹(\d+)个(\d+)",
-    "process_pick_item": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)拣起(\d+)个(\d+)",
     "purchaseFromAuction": "The Role ID %d purchased %d item(s) from gshop, spent %d unit(s) of cash, remaining balance: %d",
-    "process_trade_add_itens": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*roleid=(\d+),goods is \(id=(\d+),pos=\d+,count=(\d+)\),money=(\d+),tid=(\d+)",
-    "process_trade_remove_itens": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) .*? roleid=(\d+),item \(id=(\d+),pos=\d+,count=(\d+)\),money=(\d+),tid=(\d+)",
-    "process_trade_submit": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*rid=(\d+),A:(\d+),B:(\d+),.*tid=(\d+)",
-    "process_trade_save": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*tid=(\d+),\(Trader:(\d+),(\d+)\)",
     # Missing trading cancel?
     "pickupTeamMoney": "Role ID %d picked up money (%d) dropped by Role ID %d they both were in a Party.",
-    "process_pick_up_money": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?用户(\d+)拣起金钱(\d+)",
-    "process_discard_money": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)丢弃金钱(\d+)",
-    "process_sell_item": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)卖店(\d+)个(\d+)",
-    "process_receive_money": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)得到金钱(\d+)",
-    "process_task": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*roleid=(\d+):taskid=(\d+)",
-    "process_task_receive_item": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*roleid=(\d+):taskid=(\d+).*Item id = (\d+), Count = (\d+)",
-    "process_task_receive_reward": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*roleid=(\d+):taskid=(\d+).*gold\s*=\s*(\d+),\s*exp\s*=\s*(\d+),\s*sp\s*=\s*(\d+),\s*reputation\s*=\s*(\d+)",
-    "process_level_up": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*用户(\d+)升级到(\d+)级金钱(\d+),游戏时间(\d+:\d{2}:\d{2})",
-    "process_gshop_trade": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*userid=(\d+):.*order_id=(\d+):item_id=(\d+):.*item_count=(\d+):cash_need=(\d+):cash_left=(\d+)",
-    "process_exp_sp": r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}).*?用户(\d+)得到经验 (\d+)/(\d+)",
 }
+
+FACTION_ROLES = {
+    2: "Marechal",
+    3: "General",
+    4: "Major",
+    5: "Capitão",
+    6: "Membro",
+}
+
+# Encoding the log files are written in, utf-8 or gbk for servers writing the Chinese lines in
+# GBK. The lines are decoded a block at a time when they are read, see reader.TrackedFile
+LOG_ENCODING = "utf-8"
+
+# Lines of the followed files are merged by timestamp, held up to this many seconds (log time
+# and wall time) and this many lines, see merge.ReorderBuffer. 0 disables the merge
+REORDER_WINDOW = 2.0
+REORDER_MAX_LINES = 100_000
+
+# Lines (or events) held by each queue of the --pipeline stages, see pipeline.Pipeline
+PIPELINE_QUEUE_LINES = 100_000
+
+# Parser processes of --pipeline (0 parses in the listener process) and lines parsed by a
+# process at a time, see pipeline.Pipeline
+PARSE_WORKERS = 0
+PARSE_CHUNK_LINES = 5000
+
+# Output of the parsed events, see sinks.FileSink
+OUTPUT_FILE = "logs/log.log"
+OUTPUT_MAX_BYTES = 100 * 1024 * 1024
+OUTPUT_ROTATE_DAILY = False
+
+# Positions of the log files read with --follow, see reader.Checkpoint
+CHECKPOINT_FILE = "logs/checkpoint.json"
+
+# Metrics of the handlers written by the long-running modes, see metrics.StatsWriter
+STATS_FILE = "logs/stats.json"
+STATS_INTERVAL = 10.0
+
+# Open trades not updated for this many seconds are dropped, see trades.TradeCorrelator
+TRADE_SESSION_TTL = 600
+TRADE_MAX_SIDES = 100_000
+
+# Rate limits of the farming events, see rates.RateDetector. The total of value (or the number
+# of events if value is None) per key over the last window seconds, counted in buckets of
+# bucket seconds, raises an alert when it reaches the threshold (or the item's threshold)
+RATE_RULES = {
+    "process_mine": {
+        "key": ("roleid", "itemid"),
+        "value": "count",
+        "window": 600,
+        "bucket": 10,
+        "threshold": 300,
+        "item_thresholds": {},
+    },
+    "process_pick_item": {
+        "key": ("roleid", "itemid"),
+        "value": "count",
+        "window": 600,
+        "bucket": 10,
+        "threshold": 1000,
+    },
+    "process_receive_money": {
+        "key": ("roleid",),
+        "value": "money",
+        "window": 3600,
+        "bucket": 60,
+        "threshold": 50_000_000,
+    },
+    "process_exp_sp": {
+        "key": ("roleid",),
+        "value": "exp",
+        "window": 3600,
+        "bucket": 60,
+        "threshold": 10_000_000,
+    },
+}
+RATE_MAX_KEYS = 100_000
+
+# Snapshot of the party and faction members, saved with the checkpoint, see
+# groups.GroupMembership
+GROUPS_SNAPSHOT_FILE = "logs/groups.json"
+
+# Names of the chat channels by the chl code of the chat lines, see chat.parse_chat
+CHAT_CHANNELS = {
+    0: "common",
+    1: "world",
+    2: "party",
+    3: "faction",
+    7: "trade",
+    9: "broadcast",
+    12: "horn",
+}
+# Encodings of the chat messages in order of preference, the first one wins a tie between
+# valid texts, see chat.ChatDecoder. A server known to write a single one can list only it.
+# Number of decoded messages cached
+CHAT_ENCODINGS = ("utf-16-le", "gbk")
+CHAT_CACHE_SIZE = 4096
@@ -0,0 +1,67 @@
+"""This module contains the keyword dispatcher used to route log lines to their handler"""
+
+import re
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class KeywordDispatcher(Generic[T]):
+    """
+    This class finds which keyword of a dictionary is present in a log line, in a single pass.
+
+    All keywords are compiled once into a single regex shaped like a prefix tree, so the
+    "formatlog:" prefix shared by most keywords is only compared once. The regex engine walks the
+    line a single time and, at the first position where a keyword starts, the longest keyword
+    wins (leftmost-longest). That way "组队拣起用户" is preferred over "拣起" no matter the
+    order of the dictionary, and a line without any keyword costs one scan instead of one scan
+    per keyword.
+    """
+
+    def __init__(self, keywords: dict[str, T]) -> None:
+        self.keywords = dict(keywords)
+        trie: dict = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self._regex = re.compile(_trie_to_regex(trie))
+
+    def find(self, log_line: str) -> Optional[tuple[str, T]]:
+        """
+        This function returns the matched keyword and its value, or None if no keyword is found.
+
+        Arguments:
+            log_line -- Log Line to be searched
+        """
+        matches = self._regex.search(log_line)
+        if matches is None:
+            return None
+        keyword = matches.group()
+        return keyword, self.keywords[keyword]
+
+
+def _trie_to_regex(node: dict) -> str:
+    """
+    Turns a prefix tree of characters into a regex, where "" marks the end of a keyword.
+    Branches start with different characters, so at most one of them is tried, and the
+    continuation after the end of a keyword is a greedy optional group, so the longest
+    keyword starting at a position is the one matched.
+
+    Arguments:
+        node -- Prefix tree node to be converted
+    """
+    ends_here = "" in node
+    branches = [
+        re.escape(char) + _trie_to_regex(child)
+        for char, child in node.items()
+        if char != ""
+    ]
+    if not branches:
+        return ""
+
+    body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+    if ends_here:
+        return f"(?:{body})?" if len(branches) == 1 and len(body) > 1 else f"{body}?"
+    return body
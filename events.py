@@ -0,0 +1,874 @@
+"""This module declares every event type found in the log lines and the generic engine that parses them"""
+
+import re
+from typing import Any, Callable, Iterable, NamedTuple, Optional, get_type_hints
+
+from config import FACTION_ROLES
+from log_header import LogHeader, to_epoch
+
+# The records are the typed rows of the sinks, their fields the columns of the tables. A count
+# field shadows tuple.count, which the records never use, so it keeps the name of the column
+
+
+class Login(NamedTuple):
+    """
+    A role logged in.
+    """
+
+    timestamp: int
+    userid: int
+    roleid: int
+
+
+class Logout(NamedTuple):
+    """
+    A role logged out, after duration seconds online.
+    """
+
+    timestamp: int
+    userid: int
+    roleid: int
+    duration: int
+
+
+class ExpSp(NamedTuple):
+    """
+    A role received experience and spirit.
+    """
+
+    timestamp: int
+    roleid: int
+    exp: int
+    sp: int
+
+
+class PickUpMoney(NamedTuple):
+    """
+    A role picked money up from the ground.
+    """
+
+    timestamp: int
+    roleid: int
+    money: int
+
+
+class TaskGiveUp(NamedTuple):
+    """
+    A role gave up a task.
+    """
+
+    timestamp: int
+    roleid: int
+    taskid: int
+    action: str
+
+
+class TaskReceive(NamedTuple):
+    """
+    A role received a task.
+    """
+
+    timestamp: int
+    roleid: int
+    taskid: int
+    action: str
+
+
+class TaskReceiveItem(NamedTuple):
+    """
+    A role received an item from a task.
+    """
+
+    timestamp: int
+    roleid: int
+    taskid: int
+    itemid: int
+    count: int  # type: ignore[assignment]
+
+
+class TaskReceiveReward(NamedTuple):
+    """
+    A role completed a task and received its reward.
+    """
+
+    timestamp: int
+    roleid: int
+    taskid: int
+    gold: int
+    exp: int
+    sp: int
+    reputation: int
+
+
+class Mine(NamedTuple):
+    """
+    A role mined an item.
+    """
+
+    timestamp: int
+    roleid: int
+    count: int  # type: ignore[assignment]
+    itemid: int
+
+
+class CraftItem(NamedTuple):
+    """
+    A role crafted an item with a recipe.
+    """
+
+    timestamp: int
+    roleid: int
+    count: int  # type: ignore[assignment]
+    itemid: int
+    recipe: int
+
+
+class CreateFaction(NamedTuple):
+    """
+    A role created a faction.
+    """
+
+    timestamp: int
+    roleid: int
+    factionid: int
+
+
+class JoinFaction(NamedTuple):
+    """
+    A role joined a faction.
+    """
+
+    timestamp: int
+    roleid: int
+    factionid: int
+
+
+class PromoteInFaction(NamedTuple):
+    """
+    A superior changed the faction role of a member, new_role is its name.
+    """
+
+    timestamp: int
+    superior: int
+    roleid: int
+    factionid: int
+    role: int
+    new_role: str
+
+
+class LeaveFaction(NamedTuple):
+    """
+    A role left a faction.
+    """
+
+    timestamp: int
+    roleid: int
+    factionid: int
+
+
+class DeleteFaction(NamedTuple):
+    """
+    A faction was deleted.
+    """
+
+    timestamp: int
+    factionid: int
+
+
+class UpgradeFaction(NamedTuple):
+    """
+    The master of a faction upgraded it, level is the new level.
+    """
+
+    timestamp: int
+    factionid: int
+    roleid: int
+    money: int
+    level: int
+
+
+class CreateParty(NamedTuple):
+    """
+    A role created a party.
+    """
+
+    timestamp: int
+    roleid: int
+    partyid: int
+
+
+class JoinParty(NamedTuple):
+    """
+    A role joined a party.
+    """
+
+    timestamp: int
+    roleid: int
+    partyid: int
+
+
+class LeaveParty(NamedTuple):
+    """
+    A role left a party.
+    """
+
+    timestamp: int
+    roleid: int
+    partyid: int
+
+
+class KillPerson(NamedTuple):
+    """
+    A role was killed by another role.
+    """
+
+    timestamp: int
+    roleid: int
+    attacker: int
+
+
+class GshopTrade(NamedTuple):
+    """
+    A user bought an item in the gshop.
+    """
+
+    timestamp: int
+    userid: int
+    orderid: int
+    itemid: int
+    count: int  # type: ignore[assignment]
+    cash_need: int
+    cash_left: int
+
+
+class DropItem(NamedTuple):
+    """
+    A role dropped items from the inventory.
+    """
+
+    timestamp: int
+    roleid: int
+    count: int  # type: ignore[assignment]
+    itemid: int
+
+
+class DropEquipment(NamedTuple):
+    """
+    A role dropped a piece of equipment.
+    """
+
+    timestamp: int
+    roleid: int
+    itemid: int
+
+
+class DiscardMoney(NamedTuple):
+    """
+    A role discarded money.
+    """
+
+    timestamp: int
+    roleid: int
+    money: int
+
+
+class SellItem(NamedTuple):
+    """
+    A role sold items to a shop.
+    """
+
+    timestamp: int
+    roleid: int
+    count: int  # type: ignore[assignment]
+    itemid: int
+
+
+class ReceiveMoney(NamedTuple):
+    """
+    A role received money.
+    """
+
+    timestamp: int
+    roleid: int
+    money: int
+
+
+class PickItem(NamedTuple):
+    """
+    A role picked items up from the ground.
+    """
+
+    timestamp: int
+    roleid: int
+    count: int  # type: ignore[assignment]
+    itemid: int
+
+
+class LevelUp(NamedTuple):
+    """
+    A role leveled up, playtime is the total time played as H:MM:SS.
+    """
+
+    timestamp: int
+    roleid: int
+    level: int
+    playtime: str
+
+
+class SpendMoney(NamedTuple):
+    """
+    A role spent money.
+    """
+
+    timestamp: int
+    roleid: int
+    money: int
+
+
+class SpendSp(NamedTuple):
+    """
+    A role spent spirit.
+    """
+
+    timestamp: int
+    roleid: int
+    sp: int
+
+
+class UpgradeSkill(NamedTuple):
+    """
+    A role upgraded a skill.
+    """
+
+    timestamp: int
+    roleid: int
+    skillid: int
+    level: int
+
+
+class EggHatch(NamedTuple):
+    """
+    A role hatched a pet egg.
+    """
+
+    timestamp: int
+    roleid: int
+    eggid: int
+
+
+class SendMail(NamedTuple):
+    """
+    A role sent a mail, with money and an item (itemid -1 for none).
+    """
+
+    timestamp: int
+    roleid: int
+    receiver: int
+    mailid: int
+    size: int
+    money: int
+    itemid: int
+    count: int  # type: ignore[assignment]
+    pos: int
+
+
+class TradeAddItens(NamedTuple):
+    """
+    A role added items and money to a trade.
+    """
+
+    timestamp: int
+    roleid: int
+    itemid: int
+    count: int  # type: ignore[assignment]
+    money: int
+    tid: int
+
+
+class TradeRemoveItens(NamedTuple):
+    """
+    A role removed items and money from a trade.
+    """
+
+    timestamp: int
+    roleid: int
+    itemid: int
+    count: int  # type: ignore[assignment]
+    money: int
+    tid: int
+
+
+class TradeSubmit(NamedTuple):
+    """
+    A role submitted the trade between roles A and B.
+    """
+
+    timestamp: int
+    roleid: int
+    roleid_a: int
+    roleid_b: int
+    tid: int
+
+
+class TradeSave(NamedTuple):
+    """
+    The trade between roles A and B was done.
+    """
+
+    timestamp: int
+    tid: int
+    roleid_a: int
+    roleid_b: int
+
+
+class EventSpec:
+    """
+    Declaration of an event type. The regex is matched with re.match against the payload of the
+    line, and its named groups are the fields of the record, in order, after the timestamp.
+    Keywords shared by several kinds of lines (tasks, factions and trades) have sub-types instead
+    of a regex: the token that follows their discriminator (msg=, type= or the trade_debug verb)
+    picks the sub-type from a dictionary, so only the regex of that sub-type runs. The tokens are
+    looked up by their first token_length characters (the length of the shortest token), then
+    compared in full, which reads the token without scanning for where it ends.
+
+    Every event type with a regex has a record class, a typing.NamedTuple (so without a
+    __dict__) named after the event type, e.g. Mine for process_mine. Its first field is the
+    timestamp as an epoch, the fields are converted to their annotated type once, when the line
+    is parsed, and the fields after the named groups are added by constants or post.
+
+    Arguments:
+        name -- Name of the event type, the same as the process_* function name
+        record -- Record class of the events
+        pattern -- Regex matched against the payload, with a named group per field
+        message -- Message printed by a verbose LogHandler, formatted with the fields
+        constants -- Values added to the end of every event of this type
+        post -- Function applied to the values after the match, to derive fields
+        discriminator -- Text right before the token of the sub-type, its first occurrence
+        subtypes -- Event type name of each token
+    """
+
+    __slots__ = (
+        "name",
+        "regex",
+        "message",
+        "fields",
+        "types",
+        "group_types",
+        "all_int",
+        "constants",
+        "post",
+        "discriminator",
+        "token_length",
+        "subtype_names",
+        "subtypes",
+        "record",
+        "make",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        record: Optional[type[NamedTuple]] = None,
+        pattern: Optional[str] = None,
+        message: str = "",
+        constants: tuple = (),
+        post: Optional[Callable[[tuple], tuple]] = None,
+        discriminator: str = "",
+        subtypes: Optional[dict[str, str]] = None,
+    ) -> None:
+        self.name = name
+        self.regex = re.compile(pattern) if pattern else None
+        self.message = message
+        self.record = record
+        self.make: Optional[Callable[[Iterable[Any]], NamedTuple]] = None
+        self.fields: tuple[str, ...] = ()
+        self.types: tuple[type, ...] = ()
+        if record is not None:
+            self.make = record._make
+            hints = get_type_hints(record)
+            self.fields = tuple(hints)
+            self.types = tuple(hints.values())
+        group_names = tuple(self.regex.groupindex) if self.regex else ()
+        if self.fields[1 : len(group_names) + 1] != group_names:
+            raise ValueError(
+                f"The named groups of {name} aren't the fields of its record"
+            )
+        self.group_types = self.types[1 : len(group_names) + 1]
+        self.all_int = all(convert is int for convert in self.group_types)
+        self.constants = constants
+        self.post = post
+        self.discriminator = discriminator
+        self.subtype_names = subtypes or {}
+        # Filled once every event type is declared, see below EVENT_SPECS
+        self.subtypes: dict[str, tuple[str, EventSpec]] = {}
+        self.token_length = min(map(len, self.subtype_names), default=0)
+        if len({token[: self.token_length] for token in self.subtype_names}) < len(
+            self.subtype_names
+        ):
+            raise ValueError(
+                f"The sub-types of {name} don't differ in their first characters"
+            )
+
+    def __repr__(self) -> str:
+        return f"EventSpec({self.name!r})"
+
+
+def next_level(values: tuple) -> tuple:
+    """
+    The upgrade faction line logs the level before the upgrade, this returns the new level.
+    """
+    return values[:-1] + (values[-1] + 1,)
+
+
+def add_role_name(values: tuple) -> tuple:
+    """
+    Adds the name of the faction role to the end of the values.
+    """
+    return values + (FACTION_ROLES.get(values[-1], "Unknown"),)
+
+
+EVENT_SPECS = {
+    spec.name: spec
+    for spec in (
+        EventSpec(
+            "process_login",
+            Login,
+            r"formatlog:rolelogin:userid=(?P<userid>\d+):roleid=(?P<roleid>\d+)",
+            "User ID {userid} with Role {roleid} logged in at {timestamp}",
+        ),
+        EventSpec(
+            "process_logout",
+            Logout,
+            r"formatlog:rolelogout:userid=(?P<userid>\d+):roleid=(?P<roleid>\d+):.*?"
+            r"time=(?P<duration>\d+)",
+            "User ID {userid} with Role {roleid} logged out at {timestamp} after {duration} seconds",
+        ),
+        EventSpec(
+            "process_exp_sp",
+            ExpSp,
+            r"用户(?P<roleid>\d+)得到经验 (?P<exp>\d+)/(?P<sp>\d+)",
+            "Role ID {roleid} received {exp} EXP and {sp} SP at {timestamp}",
+        ),
+        EventSpec(
+            "process_pick_up_money",
+            PickUpMoney,
+            r"用户(?P<roleid>\d+)拣起金钱(?P<money>\d+)",
+            "Role ID: {roleid} picked up {money} money at {timestamp}",
+        ),
+        EventSpec(
+            "process_task",
+            discriminator="msg=",
+            subtypes={
+                "GiveUpTask": "process_task_give_up",
+                "CheckDeliverTask": "process_task_receive",
+                "DeliverItem": "process_task_receive_item",
+                "DeliverByAwardData": "process_task_receive_reward",
+            },
+        ),
+        EventSpec(
+            "process_task_give_up",
+            TaskGiveUp,
+            r"formatlog:task:roleid=(?P<roleid>\d+):taskid=(?P<taskid>\d+)",
+            "Role ID {roleid} gave up task ID {taskid} at {timestamp}",
+            constants=("give_up",),
+        ),
+        EventSpec(
+            "process_task_receive",
+            TaskReceive,
+            r"formatlog:task:roleid=(?P<roleid>\d+):taskid=(?P<taskid>\d+)",
+            "Role ID {roleid} received task ID {taskid} at {timestamp}",
+            constants=("receive",),
+        ),
+        EventSpec(
+            "process_task_receive_item",
+            TaskReceiveItem,
+            r"formatlog:task:roleid=(?P<roleid>\d+):taskid=(?P<taskid>\d+):.*?"
+            r"Item id = (?P<itemid>\d+), Count = (?P<count>\d+)",
+            "Role ID {roleid} received {count} units of item ID {itemid} from task ID {taskid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_task_receive_reward",
+            TaskReceiveReward,
+            r"formatlog:task:roleid=(?P<roleid>\d+):taskid=(?P<taskid>\d+):.*?"
+            r"gold\s*=\s*(?P<gold>\d+),\s*exp\s*=\s*(?P<exp>\d+),\s*sp\s*=\s*(?P<sp>\d+),"
+            r"\s*reputation\s*=\s*(?P<reputation>\d+)",
+            "Role ID {roleid} completed the task ID {taskid} and received as reward: "
+            "gold = {gold}, exp = {exp}, sp = {sp}, reputation = {reputation}",
+        ),
+        EventSpec(
+            "process_mine",
+            Mine,
+            r"用户(?P<roleid>\d+)采集得到(?P<count>\d+)个(?P<itemid>\d+)",
+            "Role ID {roleid} mined and obtained {count} unit(s) of item ID {itemid}",
+        ),
+        EventSpec(
+            "process_craft_item",
+            CraftItem,
+            r"用户(?P<roleid>\d+)制造了(?P<count>\d+)个(?P<itemid>\d+), 配方(?P<recipe>\d+)",
+            "Role ID {roleid} crafted {count} unit(s) of item ID {itemid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_faction",
+            discriminator="type=",
+            subtypes={
+                "create": "process_create_faction",
+                "join": "process_join_faction",
+                "promote": "process_promote_in_faction",
+                "leave": "process_leave_faction",
+                "delete": "process_delete_faction",
+            },
+        ),
+        EventSpec(
+            "process_create_faction",
+            CreateFaction,
+            r"formatlog:faction:type=create:roleid=(?P<roleid>\d+):factionid=(?P<factionid>\d+)",
+            "Role ID {roleid} created faction ID {factionid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_join_faction",
+            JoinFaction,
+            r"formatlog:faction:type=join:roleid=(?P<roleid>\d+):factionid=(?P<factionid>\d+)",
+            "Role ID {roleid} joined faction ID {factionid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_promote_in_faction",
+            PromoteInFaction,
+            r"formatlog:faction:type=promote:superior=(?P<superior>\d+):roleid=(?P<roleid>\d+):"
+            r"factionid=(?P<factionid>\d+):role=(?P<role>\d+)",
+            "Role ID {superior} promoted Role ID {roleid} to role {role} in faction ID {factionid} at {timestamp}",
+            post=add_role_name,
+        ),
+        EventSpec(
+            "process_leave_faction",
+            LeaveFaction,
+            r"formatlog:faction:type=leave:roleid=(?P<roleid>\d+):factionid=(?P<factionid>\d+):role=\d+",
+            "Role ID {roleid} left faction ID {factionid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_delete_faction",
+            DeleteFaction,
+            r"formatlog:faction:type=delete:factionid=(?P<factionid>\d+)",
+            "Faction ID {factionid} was deleted at {timestamp}",
+        ),
+        EventSpec(
+            "process_upgrade_faction",
+            UpgradeFaction,
+            r"formatlog:upgradefaction:factionid=(?P<factionid>\d+):master=(?P<roleid>\d+):"
+            r"money=(?P<money>\d+):level=(?P<level>\d+)",
+            "Faction ID {factionid} was upgraded by the master role {roleid}. Money: {money}, Level: {level}",
+            post=next_level,
+        ),
+        EventSpec(
+            "process_create_party",
+            CreateParty,
+            r"用户(?P<roleid>\d+)建立了队伍\((?P<partyid>\d+),\d+\)",
+            "Role ID {roleid} created party ID {partyid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_join_party",
+            JoinParty,
+            r"用户(?P<roleid>\d+)成为队员\((?P<partyid>\d+),\d+\)",
+            "Role ID {roleid} joined party ID {partyid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_leave_party",
+            LeaveParty,
+            r"用户(?P<roleid>\d+)脱离队伍\((?P<partyid>\d+),\d+\)",
+            "Role ID {roleid} left party ID {partyid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_kill_person",
+            KillPerson,
+            r"formatlog:die:roleid=(?P<roleid>\d+):type=258:.*?attacker=(?P<attacker>\d+)",
+            "Role ID {roleid} was killed by Role ID {attacker} at {timestamp}",
+        ),
+        EventSpec(
+            "process_gshop_trade",
+            GshopTrade,
+            r"formatlog:gshop_trade:userid=(?P<userid>\d+):.*?order_id=(?P<orderid>\d+):"
+            r"item_id=(?P<itemid>\d+):.*?item_count=(?P<count>\d+):"
+            r"cash_need=(?P<cash_need>\d+):cash_left=(?P<cash_left>\d+)",
+            "User ID {userid} bought {count} unit(s) of item ID {itemid} at {timestamp}, "
+            "cash used: {cash_need}, cash left: {cash_left}",
+        ),
+        EventSpec(
+            "process_drop_item",
+            DropItem,
+            r"用户(?P<roleid>\d+)丢弃包裹(?P<count>\d+)个(?P<itemid>\d+)",
+            "Role ID {roleid} dropped {count} item ID {itemid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_drop_equipment",
+            DropEquipment,
+            r"用户(?P<roleid>\d+)丢弃装备(?P<itemid>\d+)",
+            "Role ID {roleid} dropped equipment ID {itemid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_discard_money",
+            DiscardMoney,
+            r"用户(?P<roleid>\d+)丢弃金钱(?P<money>\d+)",
+            "Role ID {roleid} discarded {money} money at {timestamp}",
+        ),
+        EventSpec(
+            "process_sell_item",
+            SellItem,
+            r"用户(?P<roleid>\d+)卖店(?P<count>\d+)个(?P<itemid>\d+)",
+            "Role ID {roleid} sold {count} unit(s) of item ID {itemid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_receive_money",
+            ReceiveMoney,
+            r"用户(?P<roleid>\d+)得到金钱(?P<money>\d+)",
+            "Role ID {roleid} received {money} money at {timestamp}",
+        ),
+        EventSpec(
+            "process_pick_item",
+            PickItem,
+            r"用户(?P<roleid>\d+)拣起(?P<count>\d+)个(?P<itemid>\d+)",
+            "Role ID {roleid} picked up {count} item ID {itemid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_level_up",
+            LevelUp,
+            r"用户(?P<roleid>\d+)升级到(?P<level>\d+)级金钱\d+,游戏时间(?P<playtime>\d+:\d{2}:\d{2})",
+            "Role ID {roleid} leveled up to {level} at {timestamp} after playing for {playtime}",
+        ),
+        EventSpec(
+            "process_spend_money",
+            SpendMoney,
+            r"用户(?P<roleid>\d+)花掉金钱(?P<money>\d+)",
+            "Role ID {roleid} spent {money} money at {timestamp}",
+        ),
+        EventSpec(
+            "process_spend_sp",
+            SpendSp,
+            r"用户(?P<roleid>\d+)消耗了sp (?P<sp>\d+)",
+            "Role ID {roleid} spent {sp} SP at {timestamp}",
+        ),
+        EventSpec(
+            "process_upgrade_skill",
+            UpgradeSkill,
+            r"用户(?P<roleid>\d+)技能(?P<skillid>\d+)达到(?P<level>\d+)级",
+            "Role ID {roleid} upgraded skill ID {skillid} to level {level} at {timestamp}",
+        ),
+        EventSpec(
+            "process_egg_hatch",
+            EggHatch,
+            r"用户(?P<roleid>\d+)孵化了宠物蛋(?P<eggid>\d+)",
+            "Role ID {roleid} hatched egg ID {eggid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_send_mail",
+            SendMail,
+            r"formatlog:sendmail:timestamp=\d+:src=(?P<roleid>\d+):dst=(?P<receiver>\d+):"
+            r"mid=(?P<mailid>\d+):size=(?P<size>\d+):money=(?P<money>\d+):"
+            r"item=(?P<itemid>-?\d+):count=(?P<count>\d+):pos=(?P<pos>-?\d+)",
+            "Role ID {roleid} sent mail ID {mailid} to Role ID {receiver} at {timestamp}, "
+            "money: {money}, item ID: {itemid}, item count: {count}",
+        ),
+        EventSpec(
+            "process_trade",
+            discriminator="trade_debug:",
+            subtypes={
+                "tradeaddgoods": "process_trade_add_itens",
+                "traderemovegoods": "process_trade_remove_itens",
+                "tradesubmit": "process_trade_submit",
+                "TradeSave": "process_trade_save",
+            },
+        ),
+        EventSpec(
+            "process_trade_add_itens",
+            TradeAddItens,
+            r"formatlog:trade_debug:tradeaddgoods: roleid=(?P<roleid>\d+),goods is \(id=(?P<itemid>\d+),"
+            r"pos=\d+,count=(?P<count>\d+)\),money=(?P<money>\d+),tid=(?P<tid>\d+)",
+            "Role ID {roleid} added {count} unit(s) of item ID {itemid} to trade ID {tid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_trade_remove_itens",
+            TradeRemoveItens,
+            r"formatlog:trade_debug:traderemovegoods: roleid=(?P<roleid>\d+),item \(id=(?P<itemid>\d+),"
+            r"pos=\d+,count=(?P<count>\d+)\),money=(?P<money>\d+),tid=(?P<tid>\d+)",
+            "Role ID {roleid} removed {count} unit(s) of item ID {itemid} from trade ID {tid} at {timestamp}",
+        ),
+        EventSpec(
+            "process_trade_submit",
+            TradeSubmit,
+            r"formatlog:trade_debug:tradesubmit,rid=(?P<roleid>\d+),A:(?P<roleid_a>\d+),"
+            r"B:(?P<roleid_b>\d+),.*?tid=(?P<tid>\d+)",
+            "Role ID {roleid_a} submitted the trade with Role ID {roleid_b} at {timestamp}",
+        ),
+        EventSpec(
+            "process_trade_save",
+            TradeSave,
+            r"formatlog:trade_debug:TradeSave:Trade done\. tid=(?P<tid>\d+),"
+            r"\(Trader:(?P<roleid_a>\d+),(?P<roleid_b>\d+)\)",
+            "Trade ID {tid} was saved by Role ID {roleid_a} and Role ID {roleid_b} at {timestamp}",
+        ),
+    )
+}
+
+# Sub-types are resolved once, so parsing a line never looks a spec up by name
+for _spec in EVENT_SPECS.values():
+    _spec.subtypes = {
+        token[: _spec.token_length]: (token, EVENT_SPECS[name])
+        for token, name in _spec.subtype_names.items()
+    }
+
+
+def resolve_spec(spec: EventSpec, payload: str) -> Optional[EventSpec]:
+    """
+    Returns the sub-type of an event type named by the token of the payload, the event type
+    itself if it has no sub-types, or None if the payload has no known token.
+
+    Arguments:
+        spec -- Event type found by the dispatcher
+        payload -- Payload of the log line
+    """
+    while spec.subtypes:
+        start = payload.find(spec.discriminator)
+        if start < 0:
+            return None
+        start += len(spec.discriminator)
+        found = spec.subtypes.get(payload[start : start + spec.token_length])
+        if found is None or not payload.startswith(found[0], start):
+            return None
+        spec = found[1]
+    return spec
+
+
+def parse_event(spec: EventSpec, header: LogHeader) -> Optional[NamedTuple]:
+    """
+    Generic parser of every event type: picks the sub-type, matches its regex against the payload
+    and returns its record, or None if the line doesn't match.
+
+    Arguments:
+        spec -- Event type found by the dispatcher
+        header -- Header of the log line, the regex is matched against its payload
+    """
+    payload = header.payload
+    if spec.subtypes:
+        resolved = resolve_spec(spec, payload)
+        if resolved is None:
+            return None
+        spec = resolved
+
+    regex, make = spec.regex, spec.make
+    if regex is None or make is None:
+        return None
+    matches = regex.match(payload)
+    if matches is None:
+        return None
+
+    if spec.all_int:
+        fields = tuple(map(int, matches.groups()))
+    else:
+        fields = tuple(
+            [
+                convert(value)
+                for convert, value in zip(spec.group_types, matches.groups())
+            ]
+        )
+    values = (to_epoch(header.timestamp),) + fields + spec.constants
+    if spec.post is not None:
+        values = spec.post(values)
+    return make(values)
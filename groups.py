@@ -0,0 +1,294 @@
+"""This module contains the membership of the parties and factions, kept from their events"""
+
+import json
+import os
+from typing import Any, Callable, NamedTuple, Optional
+
+from config import FACTION_ROLES
+from events import (
+    CreateFaction,
+    CreateParty,
+    DeleteFaction,
+    JoinFaction,
+    JoinParty,
+    LeaveFaction,
+    LeaveParty,
+    PromoteInFaction,
+)
+
+# Faction role of the creator of a faction and of the roles joining it, see FACTION_ROLES
+MASTER_ROLE = 2
+MEMBER_ROLE = 6
+
+
+def faction_role_name(role: int) -> str:
+    """
+    Returns the name of a faction role, like LogHandler.get_role_name.
+
+    Arguments:
+        role -- Faction role
+    """
+    return FACTION_ROLES.get(role, "Unknown")
+
+
+class GroupMembership:
+    """
+    This class keeps the members of every party and faction up to date from their events, with
+    the faction role of each member and the reverse index from a role to its party and faction,
+    so the membership is known without replaying the logs.
+
+    The state is saved to a json snapshot by save_state, which the handler calls right before
+    the checkpoint is saved, and when the handler is closed, and it's loaded back when it's
+    created, so a restart only needs the lines after the checkpoint. The snapshot is never
+    older than the checkpoint: at worst a crash between the two replays lines already in the
+    snapshot, and joining or leaving a group again leaves the membership the same.
+
+    Arguments:
+        snapshot_path -- Path of the snapshot file, None keeps the state only in memory
+        role_name -- Returns the name of a faction role, LogHandler.get_role_name in the listener
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Optional[str] = None,
+        role_name: Callable[[int], str] = faction_role_name,
+    ) -> None:
+        self.snapshot_path = snapshot_path
+        self.role_name = role_name
+        self.parties: dict[int, dict[int, bool]] = {}
+        self.factions: dict[int, dict[int, int]] = {}
+        self.role_party: dict[int, int] = {}
+        self.role_faction: dict[int, int] = {}
+        self.changed = False
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load()
+
+    def handlers(self) -> dict[type, Callable[[Any], Optional[NamedTuple]]]:
+        """
+        Returns the function called with each record class this model follows.
+        """
+        return {
+            CreateParty: self.create_party,
+            JoinParty: self.join_party,
+            LeaveParty: self.leave_party,
+            CreateFaction: self.create_faction,
+            JoinFaction: self.join_faction,
+            PromoteInFaction: self.promote_in_faction,
+            LeaveFaction: self.leave_faction,
+            DeleteFaction: self.delete_faction,
+        }
+
+    def create_party(self, record: CreateParty) -> None:
+        """
+        This function adds a party with its leader.
+
+        Arguments:
+            record -- CreateParty record
+        """
+        self._join_party(record.partyid, record.roleid, True)
+
+    def join_party(self, record: JoinParty) -> None:
+        """
+        This function adds a member to a party.
+
+        Arguments:
+            record -- JoinParty record
+        """
+        self._join_party(record.partyid, record.roleid, False)
+
+    def leave_party(self, record: LeaveParty) -> None:
+        """
+        This function removes a member from a party, the party is dropped once it's empty.
+
+        Arguments:
+            record -- LeaveParty record
+        """
+        self._leave(self.parties, self.role_party, record.partyid, record.roleid)
+        self.changed = True
+
+    def create_faction(self, record: CreateFaction) -> None:
+        """
+        This function adds a faction with its creator as master.
+
+        Arguments:
+            record -- CreateFaction record
+        """
+        self._join_faction(record.factionid, record.roleid, MASTER_ROLE)
+
+    def join_faction(self, record: JoinFaction) -> None:
+        """
+        This function adds a member to a faction.
+
+        Arguments:
+            record -- JoinFaction record
+        """
+        self._join_faction(record.factionid, record.roleid, MEMBER_ROLE)
+
+    def promote_in_faction(self, record: PromoteInFaction) -> None:
+        """
+        This function changes the faction role of a member.
+
+        Arguments:
+            record -- PromoteInFaction record
+        """
+        self._join_faction(record.factionid, record.roleid, record.role)
+
+    def leave_faction(self, record: LeaveFaction) -> None:
+        """
+        This function removes a member from a faction.
+
+        Arguments:
+            record -- LeaveFaction record
+        """
+        self._leave(self.factions, self.role_faction, record.factionid, record.roleid)
+        self.changed = True
+
+    def delete_faction(self, record: DeleteFaction) -> None:
+        """
+        This function drops a faction and its members.
+
+        Arguments:
+            record -- DeleteFaction record
+        """
+        for roleid in self.factions.pop(record.factionid, {}):
+            if self.role_faction.get(roleid) == record.factionid:
+                del self.role_faction[roleid]
+        self.changed = True
+
+    def party_members(self, partyid: int) -> dict[int, str]:
+        """
+        Returns the members of a party, with "Leader" or "Member".
+
+        Arguments:
+            partyid -- Party ID
+        """
+        return {
+            roleid: "Leader" if leader else "Member"
+            for roleid, leader in self.parties.get(partyid, {}).items()
+        }
+
+    def faction_members(self, factionid: int) -> dict[int, str]:
+        """
+        Returns the members of a faction, with the name of their faction role.
+
+        Arguments:
+            factionid -- Faction ID
+        """
+        return {
+            roleid: self.role_name(role)
+            for roleid, role in self.factions.get(factionid, {}).items()
+        }
+
+    def groups_of(self, roleid: int) -> dict[str, Optional[int]]:
+        """
+        Returns the party and faction of a role, None where it has none.
+
+        Arguments:
+            roleid -- Role ID
+        """
+        return {
+            "party": self.role_party.get(roleid),
+            "faction": self.role_faction.get(roleid),
+        }
+
+    def faction_role(self, roleid: int) -> Optional[str]:
+        """
+        Returns the name of the faction role of a role, None if it isn't in a faction.
+
+        Arguments:
+            roleid -- Role ID
+        """
+        factionid = self.role_faction.get(roleid)
+        if factionid is None:
+            return None
+        return self.role_name(self.factions[factionid][roleid])
+
+    def summary(self) -> dict:
+        """
+        Returns the number of parties and factions, for the stats file.
+        """
+        return {"parties": len(self.parties), "factions": len(self.factions)}
+
+    def save(self) -> None:
+        """
+        This function writes the snapshot, replacing the previous one atomically.
+        """
+        self.changed = False
+        if not self.snapshot_path:
+            return
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.snapshot_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"parties": self.parties, "factions": self.factions}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_path)
+
+    def load(self) -> None:
+        """
+        This function reads the snapshot and rebuilds the reverse indexes.
+        """
+        if not self.snapshot_path:
+            return
+        with open(self.snapshot_path, encoding="utf-8") as file:
+            snapshot = json.load(file)
+        # json turns the ids into strings
+        self.parties = {
+            int(partyid): {int(roleid): leader for roleid, leader in members.items()}
+            for partyid, members in snapshot["parties"].items()
+        }
+        self.factions = {
+            int(factionid): {int(roleid): role for roleid, role in members.items()}
+            for factionid, members in snapshot["factions"].items()
+        }
+        self.role_party = {
+            roleid: partyid
+            for partyid, members in self.parties.items()
+            for roleid in members
+        }
+        self.role_faction = {
+            roleid: factionid
+            for factionid, members in self.factions.items()
+            for roleid in members
+        }
+
+    def save_state(self) -> None:
+        """
+        This function saves the snapshot if the membership changed since the last one, called
+        by the handler before it saves the checkpoint.
+        """
+        if self.changed:
+            self.save()
+
+    def close(self) -> None:
+        """
+        This function saves the snapshot a last time.
+        """
+        self.save()
+
+    def _join_party(self, partyid: int, roleid: int, leader: bool) -> None:
+        previous = self.role_party.get(roleid)
+        if previous is not None and previous != partyid:
+            self._leave(self.parties, self.role_party, previous, roleid)
+        self.parties.setdefault(partyid, {})[roleid] = leader
+        self.role_party[roleid] = partyid
+        self.changed = True
+
+    def _join_faction(self, factionid: int, roleid: int, role: int) -> None:
+        previous = self.role_faction.get(roleid)
+        if previous is not None and previous != factionid:
+            self._leave(self.factions, self.role_faction, previous, roleid)
+        self.factions.setdefault(factionid, {})[roleid] = role
+        self.role_faction[roleid] = factionid
+        self.changed = True
+
+    def _leave(self, groups: dict, index: dict, groupid: int, roleid: int) -> None:
+        members = groups.get(groupid)
+        if members is not None:
+            members.pop(roleid, None)
+            if not members and groups is self.parties:
+                del groups[groupid]
+        if index.get(roleid) == groupid:
+            del index[roleid]
@@ -0,0 +1,246 @@
+"""This module contains the economy ledger, the money flow of every role rolled up over time"""
+
+import heapq
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+from events import (
+    DiscardMoney,
+    GshopTrade,
+    PickUpMoney,
+    ReceiveMoney,
+    SpendMoney,
+    UpgradeFaction,
+)
+from trades import TradeCompleted
+
+# Events that move the money of one role
+MoneyEvent = Union[ReceiveMoney, PickUpMoney, SpendMoney, DiscardMoney, UpgradeFaction]
+
+# gshop purchases are paid with cash, not money, so they're kept out of the net money flow
+CASH_SOURCES = frozenset({"gshop"})
+
+# Resolution and number of buckets of each rollup, the totals of a rollup cover its buckets
+ROLLUPS = {"minute": (60, 60), "hour": (3600, 24), "day": (86400, 30)}
+
+
+class Rollup:
+    """
+    This class keeps the money flow per role and source in time buckets, and the running totals
+    of the buckets it retains, so the last hour (60 minute buckets) or the last day (24 hour
+    buckets) are read without adding the buckets up.
+
+    When a new bucket starts, the buckets that leave the retention are subtracted from the
+    totals, which keeps each event O(1) and the memory bounded by the active roles.
+
+    Arguments:
+        resolution -- Seconds of a bucket
+        retention -- Number of buckets kept
+    """
+
+    def __init__(self, resolution: int, retention: int) -> None:
+        self.resolution = resolution
+        self.retention = retention
+        self.buckets: OrderedDict[int, dict[tuple[int, str], int]] = OrderedDict()
+        self.totals: dict[tuple[int, str], int] = {}
+        self.role_totals: dict[int, int] = {}
+
+    def add(self, timestamp: int, roleid: int, source: str, amount: int) -> None:
+        """
+        This function adds an amount of money to the bucket of its timestamp.
+
+        Arguments:
+            timestamp -- Epoch timestamp of the event
+            roleid -- Role ID
+            source -- Source type, e.g. receive_money
+            amount -- Money, negative if the role lost it
+        """
+        number = timestamp // self.resolution
+        bucket = self.buckets.get(number)
+        if bucket is None:
+            newest = next(reversed(self.buckets), None)
+            if newest is not None and number < newest:
+                if number <= newest - self.retention:
+                    return
+                # A late event of a retained bucket that had no events
+                bucket = self.buckets[number] = {}
+                self.buckets = OrderedDict(sorted(self.buckets.items()))
+            else:
+                bucket = self.buckets[number] = {}
+                self._expire(number)
+
+        key = (roleid, source)
+        bucket[key] = bucket.get(key, 0) + amount
+        self.totals[key] = self.totals.get(key, 0) + amount
+        if source not in CASH_SOURCES:
+            self.role_totals[roleid] = self.role_totals.get(roleid, 0) + amount
+
+    def top(self, count: int, source: Optional[str] = None) -> list[tuple[int, int]]:
+        """
+        Returns the roles with the highest net flow over the retained buckets, as
+        (roleid, amount) tuples, of every money source or of one source.
+
+        Arguments:
+            count -- Number of roles
+            source -- Source type, None adds up the money sources
+        """
+        # The items are copied first, the stats file reads them from another thread
+        if source is None:
+            totals = list(self.role_totals.items())
+        else:
+            totals = [
+                (roleid, amount)
+                for (roleid, flow_source), amount in list(self.totals.items())
+                if flow_source == source
+            ]
+        return heapq.nlargest(count, totals, key=lambda item: item[1])
+
+    def history(self, roleid: int) -> list[tuple[int, dict[str, int]]]:
+        """
+        Returns the flow of a role by source in every retained bucket, as (bucket start, flows).
+
+        Arguments:
+            roleid -- Role ID
+        """
+        history = []
+        for number, bucket in self.buckets.items():
+            flows = {
+                source: amount
+                for (role, source), amount in bucket.items()
+                if role == roleid
+            }
+            if flows:
+                history.append((number * self.resolution, flows))
+        return history
+
+    def _expire(self, newest: int) -> None:
+        while self.buckets:
+            number = next(iter(self.buckets))
+            if number > newest - self.retention:
+                break
+            for key, amount in self.buckets.pop(number).items():
+                total = self.totals[key] - amount
+                if total:
+                    self.totals[key] = total
+                else:
+                    del self.totals[key]
+                roleid, source = key
+                if source not in CASH_SOURCES:
+                    total = self.role_totals[roleid] - amount
+                    if total:
+                        self.role_totals[roleid] = total
+                    else:
+                        del self.role_totals[roleid]
+
+
+class EconomyLedger:
+    """
+    This class rolls up the money flow of every role by source type in minute, hour and day
+    rollups (see Rollup), from the money events, the faction upgrades, the completed trades
+    and the gshop purchases (as cash). Reports like the top 100 earners of the last hour read
+    the running totals of a rollup instead of the events.
+
+    The gshop lines only have the user ID, user_role returns the role that user has online
+    (from the SessionTracker in the listener) and the purchases of other users are skipped.
+
+    Arguments:
+        rollups -- Resolution and retention of each rollup by name, ROLLUPS by default
+        user_role -- Returns the role online of a user ID, or None
+    """
+
+    def __init__(
+        self,
+        rollups: Optional[dict[str, tuple[int, int]]] = None,
+        user_role: Optional[Callable[[int], Optional[int]]] = None,
+    ) -> None:
+        self.rollups = {
+            name: Rollup(resolution, retention)
+            for name, (resolution, retention) in (rollups or ROLLUPS).items()
+        }
+        self.user_role = user_role
+
+    def handlers(self) -> dict[type, Callable[[Any], Optional[NamedTuple]]]:
+        """
+        Returns the function called with each record class this ledger follows.
+        """
+        return {
+            ReceiveMoney: partial(self.money, "receive_money", 1),
+            PickUpMoney: partial(self.money, "pick_up_money", 1),
+            SpendMoney: partial(self.money, "spend_money", -1),
+            DiscardMoney: partial(self.money, "discard_money", -1),
+            UpgradeFaction: partial(self.money, "upgrade_faction", -1),
+            TradeCompleted: self.trade,
+            GshopTrade: self.gshop,
+        }
+
+    def money(self, source: str, sign: int, record: MoneyEvent) -> None:
+        """
+        This function adds the money of an event to the role that received or lost it.
+
+        Arguments:
+            source -- Source type
+            sign -- 1 if the role received the money, -1 if it lost it
+            record -- Event with roleid and money fields
+        """
+        if record.money:
+            self.add(record.timestamp, record.roleid, source, sign * record.money)
+
+    def trade(self, record: TradeCompleted) -> None:
+        """
+        This function adds the money exchanged by a completed trade to both roles.
+
+        Arguments:
+            record -- TradeCompleted record
+        """
+        net = record.money_b - record.money_a
+        if net:
+            self.add(record.timestamp, record.roleid_a, "trade", net)
+            self.add(record.timestamp, record.roleid_b, "trade", -net)
+
+    def gshop(self, record: GshopTrade) -> None:
+        """
+        This function adds the cash spent in a gshop purchase to the role of the user.
+
+        Arguments:
+            record -- GshopTrade record
+        """
+        roleid = self.user_role(record.userid) if self.user_role else None
+        if roleid is not None:
+            self.add(record.timestamp, roleid, "gshop", -record.cash_need)
+
+    def add(self, timestamp: int, roleid: int, source: str, amount: int) -> None:
+        """
+        This function adds an amount to every rollup.
+
+        Arguments:
+            timestamp -- Epoch timestamp of the event
+            roleid -- Role ID
+            source -- Source type
+            amount -- Money, negative if the role lost it
+        """
+        for rollup in self.rollups.values():
+            rollup.add(timestamp, roleid, source, amount)
+
+    def top_earners(
+        self, count: int = 100, period: str = "hour", source: Optional[str] = None
+    ) -> list[tuple[int, int]]:
+        """
+        Returns the roles with the highest net money flow, as (roleid, amount) tuples.
+
+        Arguments:
+            count -- Number of roles
+            period -- "hour" (minute rollup), "day" (hour rollup) or "month" (day rollup)
+            source -- Source type, None adds up the money sources
+        """
+        rollup = {"hour": "minute", "day": "hour", "month": "day"}[period]
+        return self.rollups[rollup].top(count, source)
+
+    def summary(self) -> dict:
+        """
+        Returns the top 10 earners of the last hour and day, for the stats file.
+        """
+        return {
+            "top_earners_hour": self.top_earners(10, "hour"),
+            "top_earners_day": self.top_earners(10, "day"),
+        }
@@ -0,0 +1,62 @@
+"""This module contains the parser of the header shared by every line of the world2 log files"""
+
+import sys
+import time
+from typing import NamedTuple, Optional
+
+
+class LogHeader(NamedTuple):
+    """
+    Header of a log line, split once so handlers only match their regex against the payload.
+
+    A line like "2024-10-06 20:42:05 pwtestes.com glinkd-1: notice : formatlog:rolelogin:..."
+    is split into timestamp, host, daemon (without the instance number), level and payload.
+    """
+
+    timestamp: str
+    host: str
+    daemon: str
+    level: str
+    payload: str
+
+
+def parse_header(log_line: str) -> Optional[LogHeader]:
+    """
+    Splits the header of a log line, or returns None if the line has no valid header.
+
+    Arguments:
+        log_line -- Log Line to be split
+    """
+    if len(log_line) < 20 or log_line[10] != " " or log_line[19] != " ":
+        return None
+
+    parts = log_line[20:].split(" ", 4)
+    if len(parts) != 5 or parts[3] != ":" or not parts[1].endswith(":"):
+        return None
+
+    host, daemon, level, _, payload = parts
+    daemon = daemon[:-1].partition("-")[0]
+    return LogHeader(
+        log_line[:19], sys.intern(host), sys.intern(daemon), sys.intern(level), payload
+    )
+
+
+_HOUR_EPOCHS: dict[str, int] = {}
+
+
+def to_epoch(timestamp: str) -> int:
+    """
+    Converts a "YYYY-MM-DD HH:MM:SS" timestamp, in the local time of the server, to an epoch.
+    The epoch of each hour is cached, so only the minutes and seconds are parsed per line.
+
+    Arguments:
+        timestamp -- Timestamp of the log line
+    """
+    hour = timestamp[:13]
+    base = _HOUR_EPOCHS.get(hour)
+    if base is None:
+        if len(_HOUR_EPOCHS) > 4096:
+            _HOUR_EPOCHS.clear()
+        base = int(time.mktime(time.strptime(hour, "%Y-%m-%d %H")))
+        _HOUR_EPOCHS[hour] = base
+    return base + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
@@ -1,24 +1,137 @@
 """This is the main script for the processing of the log file"""
 
-import re
+import argparse
+import asyncio
+import io
+import multiprocessing
+import signal
 import sys
-from typing import Any, Union
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter_ns
+from typing import Callable, Iterable, NamedTuple, Optional, Union
+
+from backfill import backfill, init_worker
+from chat import ChatDecoder, parse_chat
+from config import (
+    CHAT_CACHE_SIZE,
+    CHAT_ENCODINGS,
+    CHECKPOINT_FILE,
+    FACTION_ROLES,
+    GROUPS_SNAPSHOT_FILE,
+    LOG_ENCODING,
+    LOG_PATTERNS,
+    OUTPUT_FILE,
+    OUTPUT_MAX_BYTES,
+    OUTPUT_ROTATE_DAILY,
+    PARSE_CHUNK_LINES,
+    PARSE_WORKERS,
+    PIPELINE_QUEUE_LINES,
+    RATE_MAX_KEYS,
+    RATE_RULES,
+    REGEX_PATTERNS,
+    REORDER_MAX_LINES,
+    REORDER_WINDOW,
+    STATS_FILE,
+    STATS_INTERVAL,
+    TRADE_MAX_SIDES,
+    TRADE_SESSION_TTL,
+)
+from dispatcher import KeywordDispatcher
+from events import EVENT_SPECS, EventSpec, parse_event, resolve_spec
+from groups import GroupMembership
+from ledger import EconomyLedger
+from log_header import LogHeader, parse_header
+from merge import ReorderBuffer
+from metrics import HandlerMetrics, StatsWriter
+from pipeline import Pipeline
+from rates import RateDetector
+from reader import Checkpoint, Tailer, TrackedFile, positions_of
+from sessions import SessionTracker
+from sinks import FileSink, MemorySink, SQLiteSink
+from templates import TemplateMatcher, parse_gm_action
+from trades import TradeCorrelator
+
+
+def as_header(header: Union[LogHeader, str]) -> Optional[LogHeader]:
+    """
+    Returns the header of a log line, splitting it if it's still a str, None if it has no
+    valid header.
+
+    Arguments:
+        header -- Header of the log line, or the line itself
+    """
+    return parse_header(header) if isinstance(header, str) else header
 
-from config import LOG_PATTERNS, REGEX_PATTERNS
+
+def default_sink() -> FileSink:
+    """
+    Returns the sink of the events when no other is given, a buffered FileSink of OUTPUT_FILE.
+    """
+    return FileSink(OUTPUT_FILE, max_bytes=OUTPUT_MAX_BYTES, daily=OUTPUT_ROTATE_DAILY)
 
 
 class LogHandler:
     """
     This class handle the processing of the log file.
-    It's called in log_listener.sh script for each new log line that is written to the log files.
-    The line is then routed into it's corresponding method based on the log_patterns dictionary.
+    It's created once by log_listener.sh, which pipes every new log line written to the log files
+    into a long-running process (see process_stream).
+    The line is then routed into it's corresponding event type (see events.py) based on the
+    log_patterns dictionary, or into a method for the functions that aren't event types.
+
+    Arguments:
+        verbose -- Prints what was found in every line, meant for debugging single lines
+        sink -- Where the events are written, a buffered FileSink of OUTPUT_FILE by default
+        metrics -- Where the lines are counted, a new HandlerMetrics by default
+        observers -- Stateful consumers of the events (e.g. trades.TradeCorrelator), whose
+            handlers() map record classes to functions; the records they return are written
+            to the sink too
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        verbose: bool = False,
+        sink=None,
+        metrics: Optional[HandlerMetrics] = None,
+        observers: Iterable = (),
+    ) -> None:
+        self.verbose = verbose
+        self.sink = sink if sink is not None else default_sink()
         self.log_patterns = LOG_PATTERNS
         self.regex_patterns = REGEX_PATTERNS
+        self.metrics = metrics or HandlerMetrics(self.log_patterns)
+        self.dispatcher = KeywordDispatcher(
+            {
+                pattern: EVENT_SPECS.get(func_name) or getattr(self, func_name, None)
+                for pattern, func_name in self.log_patterns.items()
+            }
+        )
+        # Patterns like "chat :" name the level of the line, which parse_header splits off
+        # the payload, so they're looked up by level instead of searched in the payload
+        self.level_handlers = {
+            pattern[:-2]: (pattern, self.dispatcher.keywords[pattern])
+            for pattern in self.log_patterns
+            if pattern.endswith(" :")
+        }
+        self.chat_decoder = ChatDecoder(CHAT_ENCODINGS, CHAT_CACHE_SIZE)
+        self.gm_matcher = TemplateMatcher(self.regex_patterns)
+        self.observers: list = []
+        self.observer_functions: dict[type, list[Callable]] = {}
+        for observer in observers:
+            self.add_observer(observer)
+
+    def add_observer(self, observer) -> None:
+        """
+        This function makes an observer receive the records of the classes it handles.
+
+        Arguments:
+            observer -- Object with a handlers() method returning {record class: function}
+        """
+        self.observers.append(observer)
+        for record_class, function in observer.handlers().items():
+            self.observer_functions.setdefault(record_class, []).append(function)
 
-    def process_log_line(self, log_line: str) -> Union[tuple[Any], None]:
+    def process_log_line(self, log_line: str) -> Union[NamedTuple, None]:
         """
         This function gets the correct method to process the log line.
 
@@ -27,782 +140,905 @@ class LogHandler:
         """
         results = self.get_method(log_line)
         if results:
-            print("Found some results!")
-            self.write_to_file(results, "logs/log.log")
-        else:
+            if self.verbose:
+                print("Found some results!")
+            self.write_record(results)
+        elif self.verbose:
             print("No method found for this log line")
 
         return results
 
-    def get_method(self, log_line: str) -> Union[tuple[Any], None]:
+    def write_record(self, record: NamedTuple) -> None:
+        """
+        This function writes a parsed event to the sink and passes it to its observers.
+
+        Arguments:
+            record -- Event parsed from a log line, here or by a backfill worker
+        """
+        self.sink.write(record)
+        if record.__class__ in self.observer_functions:
+            self.notify_observers(record)
+
+    def notify_observers(self, record: NamedTuple) -> None:
+        """
+        This function passes a record to the observers of its class. The records they return
+        (e.g. a TradeCompleted) are written to the sink and passed to their own observers.
+
+        Arguments:
+            record -- Event written to the sink
+        """
+        for function in self.observer_functions.get(record.__class__, ()):
+            derived = function(record)
+            if derived is not None:
+                self.sink.write(derived)
+                self.notify_observers(derived)
+
+    def process_stream(self, lines: Iterable[str], source: Optional[str] = None) -> int:
+        """
+        This function processes every line of an iterable (sys.stdin or an open file)
+        with this same handler, so the interpreter start up, config import and handler
+        creation are paid once instead of once per line.
+
+        A line that raises an error is reported to stderr and skipped, the same way a
+        failing per-line process used to only lose its own line.
+
+        Arguments:
+            lines -- Iterable of log lines, trailing newlines are stripped
+            source -- File the lines were read from, shown in the errors
+
+        Returns:
+            Number of lines processed
+        """
+        processed = 0
+        for line in lines:
+            log_line = line.rstrip("\r\n")
+            if not log_line:
+                continue
+            try:
+                self.process_log_line(log_line)
+            except Exception:  # pylint: disable=broad-exception-caught
+                origin = f" from {source}" if source else ""
+                print(
+                    f"Failed to process log line{origin}: {log_line}", file=sys.stderr
+                )
+                traceback.print_exc()
+            processed += 1
+
+        return processed
+
+    def follow_files(
+        self,
+        tailer: Tailer,
+        checkpoint: Optional[Checkpoint] = None,
+        follow: bool = True,
+        reorder: Optional[ReorderBuffer] = None,
+    ) -> None:
+        """
+        This function processes the new lines of the log files as they are written.
+
+        After every round that read lines, the sink is flushed and the state of the observers
+        saved, and only then the positions are saved to the checkpoint, so a restart resumes
+        right after the last written event.
+
+        With a reorder buffer the lines of the files are merged by timestamp, so the observers
+        see a logout after the last pick-up of the role even if world2.log was read later. The
+        positions saved then only cover the lines the buffer released.
+
+        Arguments:
+            tailer -- Tailer following the log files
+            checkpoint -- Where the positions are saved, None doesn't save them
+            follow -- Keeps waiting for new lines, False returns once every file was read
+            reorder -- Buffer merging the lines of the files by timestamp, None processes
+                each batch as it's read
+        """
+        while True:
+            batches = tailer.read_batches()
+            if reorder is None:
+                for source, lines in batches:
+                    self.process_stream(lines, source)
+                if batches and checkpoint is not None:
+                    self.sink.flush()
+                    self.save_state()
+                    checkpoint.save(tailer.files)
+            else:
+                released, positions = reorder.release(
+                    batches,
+                    positions_of(tailer.files) if batches and checkpoint else None,
+                    final=not (batches or follow),
+                )
+                for source, lines in released:
+                    self.process_stream(lines, source)
+                if positions is not None and checkpoint is not None:
+                    self.sink.flush()
+                    self.save_state()
+                    checkpoint.save_positions(positions)
+
+            if batches:
+                continue
+            if follow:
+                tailer.wait()
+            else:
+                return
+
+    def get_method(self, log_line: str) -> Union[NamedTuple, None]:
         """
         This function gets the correct method based in the log_patterns dictionary.
         Each key in the dictionary contains the function name.
 
-        If the pattern is found in the log line, the function is called.
+        The header of the line is split once, then the pattern of its level (chat lines) or the
+        dispatcher finds the longest pattern present in the payload with a single pass. Event
+        types are parsed by the generic parse_event, other functions are called with the parsed
+        header. Every outcome is counted in self.metrics.
 
         Arguments:
             log_line -- Log Line to be processed
         """
-        for pattern, func_name in self.log_patterns.items():
-            if pattern in log_line:
-                print(f"Found pattern: {pattern} in log line {log_line}")
-                method = getattr(self, func_name, None)
-                if method:
-                    return method(log_line, func_name)  # pylint: disable=not-callable
+        header = parse_header(log_line)
+        if header is None:
+            self.metrics.malformed += 1
+            return None
+
+        found = self.level_handlers.get(header.level) or self.dispatcher.find(
+            header.payload
+        )
+        if found is None:
+            self.metrics.misses += 1
+            return None
+
+        pattern, handler = found
+        if self.verbose:
+            print(f"Found pattern: {pattern} in log line {log_line}")
+        started = perf_counter_ns()
+        try:
+            if isinstance(handler, EventSpec):
+                results = parse_event(handler, header)
+                if results is not None and self.verbose:
+                    self.print_event(handler, header, results)
+            elif handler:
+                results = handler(header, self.log_patterns[pattern])
+            else:
+                results = None
+        except Exception:
+            self.metrics.patterns[pattern].errors += 1
+            raise
+        self.metrics.record(
+            pattern, results is not None, perf_counter_ns() - started, header.timestamp
+        )
 
-        return None
+        return results
 
-    def write_to_file(self, results: tuple[Any], file_name: str):
+    def print_event(
+        self, spec: EventSpec, header: LogHeader, results: NamedTuple
+    ) -> None:
         """
-        This function is responsible for writing the results into a log file.
-        """        
+        This function prints the message of the event type that parsed the line.
 
-        with open(file_name, "a") as file:
-            file.write(f"{results}\n")
+        Arguments:
+            spec -- Event type found by the dispatcher
+            header -- Header of the log line
+            results -- Record returned by parse_event
+        """
+        event_spec = resolve_spec(spec, header.payload)
+        if event_spec is None:
+            return
+        fields = results._asdict()
+        fields["timestamp"] = header.timestamp
+        print(event_spec.message.format(**fields))
+
+    def handle_event(self, header: Union[LogHeader, str], function: str):
+        """
+        This function parses the header with the event type of the given function name,
+        it's what the process_* methods call.
 
-    def process_login(self, log_line: str, function: str):
+        Arguments:
+            header -- Header of the log line, the regex is matched against its payload
+            function -- Name of the event type
+        """
+        parsed = as_header(header)
+        if parsed is None:
+            return None
+        spec = EVENT_SPECS[function]
+        results = parse_event(spec, parsed)
+        if results is not None and self.verbose:
+            self.print_event(spec, parsed, results)
+        return results
+
+    def save_state(self) -> None:
+        """
+        This function makes the observers that keep their state on disk (e.g. the groups
+        snapshot) save it. It's called right before the checkpoint is saved, so a restart
+        resumes the state and the log files from the same lines.
+        """
+        for observer in self.observers:
+            save_state = getattr(observer, "save_state", None)
+            if save_state is not None:
+                save_state()
+
+    def close(self) -> None:
+        """
+        This function closes the observers that have a close method (e.g. to save their
+        state), then writes the buffered events and closes the sink.
+        """
+        for observer in self.observers:
+            close = getattr(observer, "close", None)
+            if close is not None:
+                close()
+        self.sink.close()
+
+    def process_login(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player logs in
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            userid = matches.group(2)
-            roleid = matches.group(3)
-            print(f"User ID {userid} with Role {roleid} logged in at {date_time}")
-            return date_time, userid, roleid
+        return self.handle_event(header, function)
 
-    def process_logout(self, log_line: str, function: str):
+    def process_logout(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player logs out
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            userid = matches.group(2)
-            roleid = matches.group(3)
-            print(f"User ID {userid} with Role {roleid} logged out at {date_time}")
-            return date_time, userid, roleid
+        return self.handle_event(header, function)
 
-    def process_exp_sp(self, log_line: str, function: str):
+    def process_exp_sp(self, header: Union[LogHeader, str], function: str):
         """
         Function called when exp_sp pattern is found in the log line
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            exp = matches.group(3)
-            sp = matches.group(4)
-            print(f"Role ID {roleid} received {exp} EXP and {sp} SP at {date_time}")
+        return self.handle_event(header, function)
 
-            return date_time, roleid, exp, sp
-
-    def process_pick_up_money(self, log_line: str, function: str):
+    def process_pick_up_money(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player picks up money is found in the log line
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            money = matches.group(3)
-            print(f"Role ID: {roleid} picked up {money} money at {date_time}")
-            return date_time, roleid, money
+        return self.handle_event(header, function)
 
-    def process_task(self, log_line: str, function: str):
+    def process_task(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player interacts with tasks
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            taskid = matches.group(3)
-
-        if "GiveUpTask" in log_line:
-            print(f"Role ID {roleid} gave up task ID {taskid} at {date_time}")
-            return date_time, roleid, taskid, "give_up"
-        elif "CheckDeliverTask" in log_line:
-            print(f"Role ID {roleid} received task ID {taskid} at {date_time}")
-            return date_time, roleid, taskid, "receive"
-        # TODO: Find a better method to give correct func name
-        elif "DeliverItem" in log_line:
-            return self.process_task_receive_item(
-                log_line, function="process_task_receive_item"
-            )
-        elif "DeliverByAwardData" in log_line:
-            return self.process_task_receive_reward(
-                log_line, function="process_task_receive_reward"
-            )
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
 
-    def process_task_receive_item(self, log_line: str, function: str):
+    def process_task_receive_item(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player gives up on a task
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
+        return self.handle_event(header, function)
 
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            taskid = matches.group(3)
-            itemid = matches.group(4)
-            item_count = matches.group(5)
-            print(
-                f"Role ID {roleid} received {item_count} units of item ID {itemid} from task ID {taskid} at {date_time}"
-            )
-            return date_time, roleid, taskid, itemid, item_count
-
-    def process_task_receive_reward(self, log_line: str, function: str):
+    def process_task_receive_reward(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player receives an item via task
         Arguments:
-            log_line -- Log line to be processed
-            roleid -- Role that received item
-            taskid -- Task that gave item
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            taskid = matches.group(3)
-            gold = matches.group(4)
-            exp = matches.group(5)
-            sp = matches.group(6)
-            reputation = matches.group(7)
-            print(
-                f"Role ID {roleid} completed the task ID {taskid} and received as reward: gold = {gold}, exp = {exp}, sp = {sp}, reputation = {reputation}"
-            )
-            return date_time, roleid, taskid, gold, exp, sp, reputation
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
 
-    def process_mine(self, log_line: str, function: str):
+    def process_mine(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player mines
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            item_count = matches.group(3)
-            itemid = matches.group(4)
-            print(
-                f"Role ID {roleid} mined and obtained {item_count} unit(s) of item ID {itemid}"
-            )
-            return date_time, roleid, item_count, itemid
+        return self.handle_event(header, function)
 
-    def process_craft_item(self, log_line: str, function: str):
+    def process_craft_item(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player crafts an item
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            item_count = matches.group(3)
-            itemid = matches.group(4)
-            recipe = matches.group(5)
-            print(
-                f"Role ID {roleid} crafted {item_count} unit(s) of item ID {itemid} at {date_time}"
-            )
-            return date_time, roleid, item_count, itemid, recipe
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
 
-    def process_faction(self, log_line: str, function: str):
+    def process_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player interacts with factions
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
+        return self.handle_event(header, function)
 
-        if "type=create" in log_line:
-            return self.process_create_faction(
-                log_line, function="process_create_faction"
-            )
-        elif "type=join" in log_line:
-            return self.process_join_faction(log_line, function="process_join_faction")
-        elif "type=promote" in log_line:
-            return self.process_promote_in_faction(
-                log_line, function="process_promote_in_faction"
-            )
-        elif "type=leave" in log_line:
-            return self.process_leave_faction(
-                log_line, function="process_leave_faction"
-            )
-        if "type=delete" in log_line:
-            return self.process_delete_faction(
-                log_line, function="process_delete_faction"
-            )
-
-    def process_create_faction(self, log_line: str, function: str):
+    def process_create_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player creates a faction
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            factionid = matches.group(3)
-            print(f"Role ID {roleid} created faction ID {factionid} at {date_time}")
-            return date_time, roleid, factionid
+        return self.handle_event(header, function)
 
-    def process_join_faction(self, log_line: str, function: str):
+    def process_join_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player joins a faction
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        print(f"Regex: {regex}")
-        if matches:
-            print(f"MATCHES: {matches} \n\n\n\n")
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            factionid = matches.group(3)
-            print(f"Role ID {roleid} joined faction ID {factionid} at {date_time}")
-            return date_time, roleid, factionid
+        return self.handle_event(header, function)
 
-    def process_promote_in_faction(self, log_line: str, function: str):
+    def process_promote_in_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player promotes a role in a faction
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            superior = matches.group(2)
-            roleid = matches.group(3)
-            factionid = matches.group(4)
-            role = matches.group(5)
-            new_role = self.get_role_name(role)
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
+
+    def process_chat(self, header: Union[LogHeader, str], _function: str):
+        """
+        Function called when a player sends a chat message, the message is decoded from base64
+        Arguments:
+            header -- Header of the log line, its level is chat, or the line itself
+            _function -- Name of the method, unused
+        """
+        parsed = as_header(header)
+        if parsed is None:
+            return None
+        results = parse_chat(parsed, self.chat_decoder)
+        if results is not None and self.verbose:
+            print(
+                f"Role ID {results.roleid} said in the {results.channel} channel at "
+                f"{parsed.timestamp}: {results.text}"
+            )
+        return results
+
+    def process_gm_actions(self, header: Union[LogHeader, str], _function: str):
+        """
+        Function called when a GM line is found, its message is matched against every template
+        of REGEX_PATTERNS at once
+        Arguments:
+            header -- Header of the log line, or the line itself, split with parse_header
+            _function -- Name of the method, unused
+        """
+        parsed = as_header(header)
+        if parsed is None:
+            return None
+        results = parse_gm_action(parsed, self.gm_matcher)
+        if results is not None and self.verbose:
             print(
-                f"Role ID {superior} promoted Role ID {roleid} to role {role} in faction ID {factionid} at {date_time}"
+                f"{results.action} by Role ID {results.roleid} at {parsed.timestamp}: "
+                f"{', '.join(str(value) for value in results.arguments)}"
             )
-            return date_time, superior, roleid, factionid, role, new_role
+        return results
 
-    def get_role_name(self, role: str) -> str:
+    def get_role_name(self, role: Union[int, str]) -> str:
         """
         Function to get the role name based on the role id
         Arguments:
             role -- Role ID
         """
+        try:
+            return FACTION_ROLES.get(int(role), "Unknown")
+        except ValueError:
+            return "Unknown"
 
-        if role == "2":
-            return "Marechal"
-        elif role == "3":
-            return "General"
-        elif role == "4":
-            return "Major"
-        elif role == "5":
-            return "Capitão"
-        elif role == "6":
-            return "Membro"
-        return "Unknown"
-
-    def process_leave_faction(self, log_line: str, function: str):
+    def process_leave_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player deletes a role from a faction
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            factionid = matches.group(3)
-            print(f"Role ID {roleid} left faction ID {factionid} at {date_time}")
-            return date_time, roleid, factionid
+        return self.handle_event(header, function)
 
-    def process_delete_faction(self, log_line: str, function: str):
+    def process_delete_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player deletes a faction
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            factionid = matches.group(2)
-            print(f"Faction ID {factionid} was deleted at {date_time}")
-            return date_time, factionid
+        return self.handle_event(header, function)
 
-    def process_upgrade_faction(self, log_line: str, function: str):
+    def process_upgrade_faction(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player upgrades a faction
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            factionid = matches.group(2)
-            roleid = matches.group(3)
-            money = matches.group(4)
-            level = str(int(matches.group(5)) + 1)
-            print(
-                f"Faction ID {factionid} was upgraded by the master role {roleid}. Money: {money}, Level: {level}"
-            )
-            return date_time, factionid, roleid, money, level
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
 
-    def process_create_party(self, log_line: str, function: str):
+    def process_create_party(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player creates a party
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            partyid = matches.group(3)
-            print(f"Role ID {roleid} created party ID {partyid} at {date_time}")
-
-            return date_time, roleid, partyid
+        return self.handle_event(header, function)
 
-    def process_join_party(self, log_line: str, function: str):
+    def process_join_party(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player joins a party
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            partyid = matches.group(3)
-            print(f"Role ID {roleid} joined party ID {partyid} at {date_time}")
+        return self.handle_event(header, function)
 
-            return date_time, roleid, partyid
-
-    def process_leave_party(self, log_line: str, function: str):
+    def process_leave_party(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player leaves a party
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            partyid = matches.group(3)
-            print(f"Role ID {roleid} left party ID {partyid} at {date_time}")
-
-            return date_time, roleid, partyid
+        return self.handle_event(header, function)
 
-    def process_kill_person(self, log_line: str, function: str):
+    def process_kill_person(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player kills another player
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            killer = matches.group(2)
-            victim = matches.group(3)
-            print(f"Role ID {killer} killed Role ID {victim} at {date_time}")
+        return self.handle_event(header, function)
 
-            return date_time, killer, victim
-
-    def process_gshop_trade(self, log_line: str, function: str):
+    def process_gshop_trade(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player trades in the gshop
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            itemid = matches.group(3)
-            item_count = matches.group(4)
-            price = matches.group(5)
-            cash_needed = matches.group(6)
-            cash_left = matches.group(7)
-            print(
-                f"Role ID {roleid} traded {item_count} unit(s) of item ID {itemid} for {price} at {date_time}, cash used: {cash_needed}, cash left: {cash_left}"
-            )
-
-            return date_time, roleid, itemid, item_count, price, cash_needed, cash_left
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
 
-    def process_drop_item(self, log_line: str, function: str):
+    def process_drop_item(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player drops an item
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            item_count = matches.group(3)
-            itemid = matches.group(4)
-            print(
-                f"Role ID {roleid} dropped {item_count} item ID {itemid} at {date_time}"
-            )
+        return self.handle_event(header, function)
 
-            return date_time, roleid, item_count, itemid
-
-    def process_drop_equipment(self, log_line: str, function: str):
+    def process_drop_equipment(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player drops an equipment
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            itemid = matches.group(3)
-            print(f"Role ID {roleid} dropped equipment ID {itemid} at {date_time}")
-
-            return date_time, roleid, itemid
+        return self.handle_event(header, function)
 
-    def process_discard_money(self, log_line: str, function: str):
+    def process_discard_money(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player discards money
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            money = matches.group(3)
-            print(f"Role ID {roleid} discarded {money} money at {date_time}")
+        return self.handle_event(header, function)
 
-            return date_time, roleid, money
-
-    def process_sell_item(self, log_line: str, function: str):
+    def process_sell_item(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player sells an item. Unfortunately, the log line
         does not contain the item price.
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            item_count = matches.group(3)
-            itemid = matches.group(4)
-            print(
-                f"Role ID {roleid} sold {item_count} unit(s) of item ID {itemid} at {date_time}"
-            )
+        return self.handle_event(header, function)
 
-            return date_time, roleid, item_count, itemid
-
-    def process_receive_money(self, log_line: str, function: str):
+    def process_receive_money(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player receives money
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            money = matches.group(3)
-            print(f"Role ID {roleid} received {money} money at {date_time}")
-
-            return date_time, roleid, money
+        return self.handle_event(header, function)
 
-    def process_pick_item(self, log_line: str, function: str):
+    def process_pick_item(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player picks up an item
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            item_count = matches.group(3)
-            itemid = matches.group(4)
-            print(
-                f"Role ID {roleid} picked up {item_count} item ID {itemid} at {date_time}"
-            )
+        return self.handle_event(header, function)
 
-            return date_time, roleid, item_count, itemid
-
-    def process_level_up(self, log_line: str, function: str):
+    def process_level_up(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player levels up
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
-        """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            level = matches.group(3)
-            _ = matches.group(4)
-            playtime = matches.group(5)
-            print(
-                f"Role ID {roleid} leveled up to {level} at {date_time} after playing for {playtime} minutes"
-            )
-
-            return date_time, roleid, level, playtime
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
+        """
+        return self.handle_event(header, function)
 
-    def process_spend_money(self, log_line: str, function: str):
+    def process_spend_money(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player spends money
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            money = matches.group(3)
-            print(f"Role ID {roleid} spent {money} money at {date_time}")
-
-            return date_time, roleid, money
+        return self.handle_event(header, function)
 
-    def process_spend_sp(self, log_line: str, function: str):
+    def process_spend_sp(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player spends sp
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            sp = matches.group(3)
-            print(f"Role ID {roleid} spent {sp} SP at {date_time}")
+        return self.handle_event(header, function)
 
-            return date_time, roleid, sp
-
-    def process_upgrade_skill(self, log_line: str, function: str):
+    def process_upgrade_skill(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player upgrades a skill
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            skillid = matches.group(3)
-            level = matches.group(4)
-            print(
-                f"Role ID {roleid} upgraded skill ID {skillid} to level {level} at {date_time}"
-            )
-
-            return date_time, roleid, skillid, level
+        return self.handle_event(header, function)
 
-    def process_egg_hatch(self, log_line: str, function: str):
+    def process_egg_hatch(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player hatches an egg
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            eggid = matches.group(3)
-            print(f"Role ID {roleid} hatched egg ID {eggid} at {date_time}")
+        return self.handle_event(header, function)
 
-            return date_time, roleid, eggid
-
-    def process_trade(self, log_line: str, function: str):
+    def process_trade(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player trades with another player
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
+        return self.handle_event(header, function)
 
-        if "tradeaddgoods" in log_line:
-            return self.process_trade_add_itens(
-                log_line, function="process_trade_add_itens"
-            )
-        elif "traderemovegoods" in log_line:
-            return self.process_trade_remove_itens(
-                log_line, function="process_trade_remove_itens"
-            )
-        elif "tradesubmit" in log_line:
-            return self.process_trade_submit(log_line, function="process_trade_submit")
-        elif "TradeSave" in log_line:
-            return self.process_trade_save(log_line, function="process_trade_save")
-
-    def process_trade_add_itens(self, log_line: str, function: str):
+    def process_trade_add_itens(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player adds items to the trade window
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
+        return self.handle_event(header, function)
 
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            itemid = matches.group(3)
-            item_count = matches.group(4)
-            money = matches.group(5)
-            trade_id = matches.group(6)
-            print(
-                f"Role ID {roleid} added {item_count} unit(s) of item ID {itemid} to trade ID {trade_id} at {date_time}"
-            )
-
-            return date_time, roleid, itemid, item_count, money, trade_id
-
-    def process_trade_remove_itens(self, log_line: str, function: str):
+    def process_trade_remove_itens(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player removes items from the trade window
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
+        return self.handle_event(header, function)
 
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            roleid = matches.group(2)
-            itemid = matches.group(3)
-            item_count = matches.group(4)
-            money = matches.group(5)
-            trade_id = matches.group(6)
-            print(
-                f"Role ID {roleid} removed {item_count} unit(s) of item ID {itemid} from trade ID {trade_id} at {date_time}"
-            )
-
-            return date_time, roleid, itemid, item_count, money, trade_id
-
-    def process_trade_submit(self, log_line: str, function: str):
+    def process_trade_submit(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player submits the trade
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
+        return self.handle_event(header, function)
 
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            role_id = matches.group(2)
-            roleid_a = matches.group(3)
-            roleid_b = matches.group(4)
-            trade_id = matches.group(5)
-            print(
-                f"Role ID {roleid_a} submitted the trade with Role ID {roleid_b} at {date_time}"
-            )
-
-            return date_time, role_id, roleid_a, roleid_b, trade_id
-
-    def process_trade_save(self, log_line: str, function: str):
+    def process_trade_save(self, header: Union[LogHeader, str], function: str):
         """
         Function called when the player saves the trade
         Arguments:
-            log_line -- Log Line
-            function -- Log Line called, it's used to get the regex pattern
+            header -- Header of the log line, or the line itself, split with parse_header
+            function -- Name of the method, the key of its event type in EVENT_SPECS
         """
-        regex = self.regex_patterns[function]
-        matches = re.search(regex, log_line)
-        if matches:
-            date_time = matches.group(1)
-            trade_id = matches.group(2)
-            roleid_a = matches.group(3)
-            roleid_b = matches.group(4)
-            print(
-                f"Trade ID {trade_id} was saved by Role ID {roleid_a} and Role ID {roleid_b} at {date_time}"
-            )
+        return self.handle_event(header, function)
+
 
-            return date_time, trade_id, roleid_a, roleid_b
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """
+    Parses the command line arguments of the listener.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    parser = argparse.ArgumentParser(description="Process Perfect World log lines")
+    parser.add_argument("log_line", nargs="?", help="Single log line to be processed")
+    parser.add_argument(
+        "--stream",
+        nargs="*",
+        metavar="FILE",
+        help="Keep running and process every line of the given files, or stdin if none is given",
+    )
+    parser.add_argument(
+        "--follow",
+        nargs="+",
+        metavar="FILE",
+        help="Keep reading the new lines of the files, resuming from the checkpoint",
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs="+",
+        metavar="FILE",
+        help="Parse whole files (plain or .gz, oldest first) with a process pool and exit",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes of --backfill, the number of cores by default",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=CHECKPOINT_FILE,
+        help="File where --follow saves the position of each file",
+    )
+    parser.add_argument(
+        "--from-start",
+        action="store_true",
+        help="Read files missing from the checkpoint from their start instead of their end",
+    )
+    parser.add_argument(
+        "--reorder-window",
+        type=float,
+        default=REORDER_WINDOW,
+        metavar="SECONDS",
+        help="Seconds --follow holds the lines to merge the files by timestamp, 0 disables it",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Run --follow as concurrent read, parse and write stages joined by bounded queues",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=PARSE_WORKERS,
+        metavar="N",
+        help="Number of processes parsing the lines of --follow, which runs as a --pipeline",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Stop --follow once every file was read to its end",
+    )
+    parser.add_argument(
+        "--encoding",
+        default=LOG_ENCODING,
+        help="Encoding of the log files read by --follow, --stream and --backfill, e.g. gbk",
+    )
+    parser.add_argument(
+        "--stats",
+        default=STATS_FILE,
+        metavar="FILE",
+        help="File where --follow and --stream write the handler metrics, empty disables it",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print what was found in every line, always on for a single log line",
+    )
+    parser.add_argument(
+        "--database",
+        metavar="FILE",
+        help="Store the events in this SQLite database instead of the output file",
+    )
+    parser.add_argument(
+        "--groups-snapshot",
+        metavar="FILE",
+        help="Snapshot of the party and faction members, GROUPS_SNAPSHOT_FILE by default. "
+        "--backfill only loads and saves one given here, never the live one",
+    )
+    return parser.parse_args(argv)
+
+
+def make_handler(
+    args: argparse.Namespace,
+    sink,
+    groups_snapshot: Optional[str] = GROUPS_SNAPSHOT_FILE,
+) -> LogHandler:
+    """
+    Returns the handler of the long-running modes, with the stateful observers of the events.
+
+    Arguments:
+        args -- Parsed command line arguments
+        sink -- Where the events are written, None for the default FileSink
+        groups_snapshot -- Snapshot of the party and faction members, --groups-snapshot if
+            given, None keeps them only in memory
+    """
+    sessions = SessionTracker()
+
+    def user_role(userid: int) -> Optional[int]:
+        roles = sessions.online_roles(userid)
+        return next(iter(roles)) if len(roles) == 1 else None
+
+    log_handler = LogHandler(
+        verbose=args.verbose,
+        sink=sink,
+        observers=[
+            TradeCorrelator(TRADE_SESSION_TTL, TRADE_MAX_SIDES),
+            sessions,
+            RateDetector(RATE_RULES, RATE_MAX_KEYS),
+            EconomyLedger(user_role=user_role),
+        ],
+    )
+    log_handler.add_observer(
+        GroupMembership(
+            args.groups_snapshot or groups_snapshot, log_handler.get_role_name
+        )
+    )
+    return log_handler
+
+
+def start_stats(
+    log_handler: LogHandler,
+    path: str,
+    summaries: Optional[dict[str, Callable[[], dict]]] = None,
+) -> Optional[StatsWriter]:
+    """
+    Starts writing the metrics of a handler to a stats file, returns None if path is empty.
+    The summary of every observer that has one is written with the metrics.
+
+    Arguments:
+        log_handler -- Handler whose metrics are written
+        path -- Path of the stats file
+        summaries -- More sections of the file, keyed by section name
+    """
+    if not path:
+        return None
+    sections = {
+        observer.__class__.__name__: observer.summary
+        for observer in log_handler.observers
+        if hasattr(observer, "summary")
+    }
+    sections["ChatDecoder"] = log_handler.chat_decoder.cache_info
+    sections.update(summaries or {})
+    stats = StatsWriter(log_handler.metrics, path, STATS_INTERVAL, sections)
+    stats.start()
+    return stats
+
+
+def main(argv: list[str]) -> int:
+    """
+    Entry point of the listener, returns the exit code.
+
+    Arguments:
+        argv -- Command line arguments, without the program name
+    """
+    args = parse_args(argv)
+    # stop_log.sh stops the listener with SIGTERM, exiting through the finally clauses
+    # makes sure the buffered events are written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    sink = SQLiteSink(args.database) if args.database else None
+
+    if args.follow:
+        # The pipeline writes the events to the sink in its own stage, the handler only
+        # keeps those of the batch being parsed
+        output = sink if sink is not None else default_sink()
+        args.pipeline = args.pipeline or args.parse_workers > 0
+        log_handler = make_handler(args, MemorySink() if args.pipeline else output)
+        checkpoint = Checkpoint(args.checkpoint)
+        tailer = Tailer(
+            [
+                TrackedFile(
+                    path,
+                    checkpoint.get(path),
+                    from_start=args.from_start,
+                    encoding=args.encoding,
+                )
+                for path in args.follow
+            ]
+        )
+        reorder = None
+        if args.reorder_window > 0 and len(args.follow) > 1:
+            reorder = ReorderBuffer(args.reorder_window, REORDER_MAX_LINES)
+        if not args.pipeline:
+            stats = start_stats(log_handler, args.stats)
+            try:
+                log_handler.follow_files(
+                    tailer, checkpoint, follow=not args.once, reorder=reorder
+                )
+            finally:
+                log_handler.close()
+                tailer.close()
+                if stats is not None:
+                    stats.close()
+            return 0
+
+        pool = None
+        if args.parse_workers > 0:
+            # The workers are started from a clean process, the listener already runs threads
+            pool = ProcessPoolExecutor(
+                args.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(args.encoding,),
+            )
+        pipeline = Pipeline(
+            log_handler,
+            output,
+            tailer,
+            checkpoint,
+            reorder,
+            PIPELINE_QUEUE_LINES,
+            pool,
+            args.parse_workers,
+            PARSE_CHUNK_LINES,
+        )
+        stats = start_stats(log_handler, args.stats, {"Pipeline": pipeline.summary})
+        try:
+            asyncio.run(
+                pipeline.run(
+                    not args.once, stop_signals=(signal.SIGTERM, signal.SIGINT)
+                )
+            )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            log_handler.close()
+            output.close()
+            tailer.close()
+            if stats is not None:
+                stats.close()
+        return 0
+
+    if args.backfill:
+        # Old events replayed on the live snapshot would undo the current membership
+        log_handler = make_handler(args, sink, groups_snapshot=None)
+        try:
+            backfill(log_handler, args.backfill, args.workers, args.encoding)
+        finally:
+            log_handler.close()
+        return 0
+
+    if args.stream is not None:
+        log_handler = make_handler(args, sink)
+        stats = start_stats(log_handler, args.stats)
+        try:
+            if not args.stream:
+                if isinstance(sys.stdin, io.TextIOWrapper):
+                    sys.stdin.reconfigure(encoding=args.encoding, errors="replace")
+                log_handler.process_stream(sys.stdin)
+            for file_name in args.stream:
+                try:
+                    with open(
+                        file_name, encoding=args.encoding, errors="replace"
+                    ) as file:
+                        log_handler.process_stream(file)
+                except OSError as error:
+                    print(f"Could not read {file_name}: {error}", file=sys.stderr)
+        finally:
+            log_handler.close()
+            if stats is not None:
+                stats.close()
+        return 0
+
+    if args.log_line:
+        log_handler = LogHandler(verbose=True, sink=sink)
+        # The argument is already text, escaping it would hide the Chinese keywords
+        print(f"Processing log line: {args.log_line}")
+        try:
+            log_handler.process_log_line(log_line=args.log_line)
+        finally:
+            log_handler.close()
+        return 0
+
+    print("Nothing done, no log line provided.")
+    return 0
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        log_handler = LogHandler()
-        current_line = sys.argv[1].encode("unicode_escape").decode("utf-8")
-        print(f"Processing Decoded UTF-8 log line: {current_line}")
-        log_handler.process_log_line(log_line=current_line)
-    else:
-        print("Nothing done, no log line provided.")
-        sys.exit(0)
+    sys.exit(main(sys.argv[1:]))
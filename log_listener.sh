@@ -4,28 +4,22 @@ log_file_chat="/home/logs/world2.chat"
 log_file_format="/home/logs/world2.formatlog"
 log_file="/home/logs/world2.log"
 read_from_start="false"
-files=("$log_file_chat $log_file_format $log_file")
-
-process_log_line() {
-    local log_line="$1"
-    python3 "$log_script" "$log_line" 2>> logs/pw_log_handler.log
-}
+# Encoding of the log files, gbk for servers that write the Chinese lines in GBK
+log_encoding="utf-8"
+files=("$log_file_chat" "$log_file_format" "$log_file")
+# stop_log.sh stops the --follow process by this pid, not a --backfill running next to it
+pid_file="logs/log_listener.pid"
 
+# A single python process follows the files, resuming from logs/checkpoint.json after a restart.
+# read_from_start only applies to files that aren't in the checkpoint yet. Old and rotated files
+# are parsed faster with a process pool, oldest first:
+# python3 log_listener.py --backfill /home/logs/world2.log.2.gz /home/logs/world2.log.1
+options=(--encoding "$log_encoding")
 if [ "$read_from_start" = "true" ]; then
-    for file in "${files[@]}"; do
-        if [ -f "$file" ]; then
-            while read -r log_line; do
-                process_log_line "$log_line"
-            done < "$file"
-        fi
-    done
-else
-    stdbuf -oL tail -f -n0 \
-    "$log_file_chat" \
-    "$log_file_format" \
-    "$log_file" \
-    | while IFS= read -r log_line; do
-        echo "Processing Raw bash: $log_line"
-        process_log_line "$log_line"
-    done
-fi
\ No newline at end of file
+    options+=("--from-start")
+fi
+
+python3 "$log_script" "${options[@]}" --follow "${files[@]}" 2>> logs/pw_log_handler.log &
+echo $! > "$pid_file"
+wait $!
+rm -f "$pid_file"
@@ -0,0 +1,172 @@
+"""This module contains the reorder buffer that merges the lines of the log files by timestamp"""
+
+import heapq
+import time
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Optional
+
+from log_header import to_epoch
+
+
+def line_time(line: str) -> Optional[int]:
+    """
+    Returns the epoch timestamp of a log line, or None if it has no valid header.
+
+    Arguments:
+        line -- Log line
+    """
+    if len(line) < 20 or line[10] != " " or line[19] != " ":
+        return None
+    try:
+        return to_epoch(line[:19])
+    except ValueError:
+        return None
+
+
+class ReorderBuffer:
+    """
+    This class merges the lines of several log files (world2.chat, world2.formatlog and
+    world2.log are written by different daemons) into timestamp order, a k-way merge of their
+    batches through a heap. Lines with the same timestamp keep the order they were read in.
+
+    A line is held until one of these is true, so neither memory nor latency grow:
+    - a line at least window seconds newer (log time) was read, from any file
+    - it was read window seconds ago (wall time), so a quiet file never stalls the others
+    - the buffer holds more than max_lines lines, checked as every line is pushed, so the
+      buffer never holds more than max_lines lines, however large a round is
+    Lines without a timestamp take the timestamp of the line before them in their file.
+
+    Every pushed batch comes with the positions of the files after it (see
+    Checkpoint.save_positions): the positions returned by safe_positions only cover batches
+    whose lines were all released, so saving them never skips a held line.
+
+    Arguments:
+        window -- Seconds a line can be held, in log time and in wall time
+        max_lines -- Number of held lines that forces the oldest ones out
+        clock -- Wall clock, time.monotonic by default
+    """
+
+    def __init__(
+        self,
+        window: float = 2.0,
+        max_lines: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.max_lines = max_lines
+        self.clock = clock
+        self.heap: list = []
+        self.sequence = 0
+        self.newest = 0
+        self.last_times: dict[str, int] = {}
+        # [read time, lines still held, positions] of every batch not fully released yet
+        self.rounds: deque[list] = deque()
+        self.released_positions: Optional[dict] = None
+        # Lines forced out by push, released by the next pop_ready
+        self.overflow: list[tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(
+        self, batches: list[tuple[str, list[str]]], positions: Optional[dict] = None
+    ) -> None:
+        """
+        This function adds the lines read in a round. Once max_lines lines are held, each new
+        line forces the oldest one out, to be returned by the next pop_ready.
+
+        Arguments:
+            batches -- (path of the file, lines) batches, as returned by Tailer.read_batches
+            positions -- Positions of the files after these lines
+        """
+        current: list = [self.clock(), 0, positions]
+        self.rounds.append(current)
+        heap = self.heap
+        max_lines = self.max_lines
+        for source, lines in batches:
+            last = self.last_times.get(source, 0)
+            for line in lines:
+                timestamp = line_time(line)
+                if timestamp is None:
+                    timestamp = last
+                last = timestamp
+                self.sequence += 1
+                current[1] += 1
+                heapq.heappush(heap, (timestamp, self.sequence, source, line, current))
+                if len(heap) > max_lines:
+                    self.overflow.append(self._pop())
+            self.last_times[source] = last
+            if last > self.newest:
+                self.newest = last
+        self._complete_rounds()
+
+    def pop_ready(self) -> list[tuple[str, str]]:
+        """
+        Returns the (path of the file, line) pairs that can be released, in timestamp order.
+        """
+        released, self.overflow = self.overflow, []
+        heap = self.heap
+        expired = self.clock() - self.window
+        while heap:
+            if heap[0][0] > self.newest - self.window and self.rounds[0][0] > expired:
+                break
+            released.append(self._pop())
+            self._complete_rounds()
+        return released
+
+    def drain(self) -> list[tuple[str, str]]:
+        """
+        Returns every held line, in timestamp order.
+        """
+        released, self.overflow = self.overflow, []
+        released += [self._pop() for _ in range(len(self.heap))]
+        self._complete_rounds()
+        return released
+
+    def release(
+        self,
+        batches: list[tuple[str, list[str]]],
+        positions: Optional[dict] = None,
+        final: bool = False,
+    ) -> tuple[list[tuple[str, list[str]]], Optional[dict]]:
+        """
+        Adds the lines read in a round and returns the lines released, as (path of the file,
+        lines) batches of consecutive lines of a file, with the result of safe_positions.
+
+        Arguments:
+            batches -- (path of the file, lines) batches, as returned by Tailer.read_batches
+            positions -- Positions of the files after these lines
+            final -- Releases every held line, no more lines will be read
+        """
+        if batches:
+            self.push(batches, positions)
+        released = self.drain() if final else self.pop_ready()
+        grouped = [
+            (source, [line for _, line in lines])
+            for source, lines in groupby(released, key=itemgetter(0))
+        ]
+        return grouped, self.safe_positions()
+
+    def safe_positions(self) -> Optional[dict]:
+        """
+        Returns the positions after the last batch whose lines were all released, and forgets
+        them, or None if no batch was completed since the last call.
+        """
+        positions, self.released_positions = self.released_positions, None
+        return positions
+
+    def _pop(self) -> tuple[str, str]:
+        _, _, source, line, current = heapq.heappop(self.heap)
+        current[1] -= 1
+        return source, line
+
+    def _complete_rounds(self) -> None:
+        # The rounds are completed in the order they were read, a round whose lines were all
+        # released still waits for the rounds before it
+        rounds = self.rounds
+        while rounds and not rounds[0][1]:
+            done = rounds.popleft()
+            if done[2] is not None:
+                self.released_positions = done[2]
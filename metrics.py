@@ -0,0 +1,228 @@
+"""This module contains the metrics of the LogHandler and the writer of its stats file"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from log_header import to_epoch
+
+# Histograms have a bucket per power of two: bucket n counts the values v with
+# v.bit_length() == n, that is 2 ** (n - 1) <= v < 2 ** n, bucket 0 counts the zeros
+HISTOGRAM_BUCKETS = 64
+
+
+def histogram_summary(histogram: list[int], unit: float) -> dict:
+    """
+    Returns the non-empty buckets of a histogram, keyed by their upper bound, and the
+    approximated median and 99th percentile (the upper bound of their buckets).
+
+    Arguments:
+        histogram -- Count of each bucket
+        unit -- Value the bounds are divided by, 1000 turns nanoseconds into microseconds
+    """
+    total = sum(histogram)
+    summary: dict = {"p50": None, "p99": None, "buckets": {}}
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        if not count:
+            continue
+        bound = 2**bucket / unit
+        summary["buckets"][f"<{bound:g}"] = count
+        seen += count
+        if summary["p50"] is None and seen * 2 >= total:
+            summary["p50"] = bound
+        if summary["p99"] is None and seen * 100 >= total * 99:
+            summary["p99"] = bound
+    return summary
+
+
+class PatternStats:
+    """
+    This class counts the lines routed to one keyword of LOG_PATTERNS.
+
+    Arguments:
+        handler -- Name of the function of the keyword
+    """
+
+    __slots__ = ("handler", "hits", "non_matches", "errors", "total_ns", "latency")
+
+    def __init__(self, handler: str) -> None:
+        self.handler = handler
+        self.hits = 0
+        self.non_matches = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.latency = [0] * HISTOGRAM_BUCKETS
+
+    def summary(self) -> dict:
+        """
+        Returns the counters and latency histogram as a json serializable dictionary.
+        """
+        return {
+            "handler": self.handler,
+            "hits": self.hits,
+            "non_matches": self.non_matches,
+            "errors": self.errors,
+            "total_ms": self.total_ns / 1e6,
+            "latency_us": histogram_summary(self.latency, 1000),
+        }
+
+
+class HandlerMetrics:
+    """
+    This class keeps the metrics of a LogHandler, cheap enough to be always on: a few counter
+    increments and two clock reads per line, the histograms being updated in O(1).
+
+    For every keyword of LOG_PATTERNS it counts the hits (lines parsed into an event), the
+    non-matches (the keyword was found but the regex of its handler didn't match) and the
+    errors, with a histogram of the parse latency. Lines without any keyword are counted as
+    misses, and lines without a valid header as malformed. The lag is the time between the
+    timestamp of a parsed line and the moment it was parsed, sampled once per log second.
+
+    Arguments:
+        log_patterns -- Keywords and function names of the handler
+    """
+
+    def __init__(self, log_patterns: dict[str, str]) -> None:
+        self.started = time.time()
+        self.patterns = {
+            pattern: PatternStats(func_name)
+            for pattern, func_name in log_patterns.items()
+        }
+        self.misses = 0
+        self.malformed = 0
+        self.lag_timestamp = ""
+        self.last_lag = 0
+        self.max_lag = 0
+        self.lag = [0] * HISTOGRAM_BUCKETS
+
+    def record(
+        self, pattern: str, parsed: bool, elapsed_ns: int, timestamp: str
+    ) -> None:
+        """
+        This function counts a line routed to a keyword.
+
+        The lag is sampled once per distinct log timestamp, which keeps its cost off the busy
+        seconds where many lines share the same timestamp.
+
+        Arguments:
+            pattern -- Keyword found in the line
+            parsed -- True if an event was returned, False if the regex didn't match
+            elapsed_ns -- Time spent by the handler, in nanoseconds
+            timestamp -- Timestamp of the line, as written in the log
+        """
+        stats = self.patterns[pattern]
+        stats.total_ns += elapsed_ns
+        stats.latency[elapsed_ns.bit_length()] += 1
+        if not parsed:
+            stats.non_matches += 1
+            return
+        stats.hits += 1
+        if timestamp != self.lag_timestamp:
+            self.lag_timestamp = timestamp
+            self.record_lag(to_epoch(timestamp))
+
+    def record_lag(self, timestamp: int) -> None:
+        """
+        This function records the lag of a parsed line.
+
+        Arguments:
+            timestamp -- Epoch timestamp of the line
+        """
+        lag = max(int(time.time()) - timestamp, 0)
+        self.last_lag = lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+        self.lag[min(lag.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns every metric as a json serializable dictionary.
+        """
+        patterns = {
+            pattern: stats.summary() for pattern, stats in self.patterns.items()
+        }
+        routed = sum(
+            stats["hits"] + stats["non_matches"] + stats["errors"]
+            for stats in patterns.values()
+        )
+        lines = routed + self.misses + self.malformed
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.started,
+            "lines": lines,
+            "misses": self.misses,
+            "malformed": self.malformed,
+            "miss_rate": self.misses / lines if lines else 0.0,
+            "lag_seconds": {
+                "last": self.last_lag,
+                "max": self.max_lag,
+                **histogram_summary(self.lag, 1),
+            },
+            "patterns": patterns,
+        }
+
+
+class StatsWriter:
+    """
+    This class writes the snapshot of a HandlerMetrics to a json file every interval seconds,
+    from a background thread, replacing the file atomically so readers never see it partially
+    written. The file is written a last time when the writer is closed.
+
+    Arguments:
+        metrics -- Metrics being written
+        path -- Path of the stats file, its directory is created if needed
+        interval -- Seconds between writes
+        summaries -- Functions returning more sections of the file, keyed by section name
+    """
+
+    def __init__(
+        self,
+        metrics: HandlerMetrics,
+        path: str,
+        interval: float = 10.0,
+        summaries: Optional[dict[str, Callable[[], dict]]] = None,
+    ) -> None:
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.summaries = summaries or {}
+        self.closed = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        This function starts writing the stats file periodically.
+        """
+        self.thread = threading.Thread(target=self._write_periodically, daemon=True)
+        self.thread.start()
+
+    def write(self) -> None:
+        """
+        This function writes the current snapshot to the stats file.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        snapshot = self.metrics.snapshot()
+        for name, summary in self.summaries.items():
+            snapshot[name] = summary()
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, ensure_ascii=False, indent=1)
+        os.replace(temporary, self.path)
+
+    def close(self) -> None:
+        """
+        This function stops the background thread and writes the stats file a last time.
+        """
+        self.closed.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.write()
+
+    def _write_periodically(self) -> None:
+        while not self.closed.wait(self.interval):
+            self.write()
@@ -0,0 +1,308 @@
+"""This module contains the asyncio pipeline of --follow, whose read, parse and sink stages run
+concurrently, joined by bounded queues"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+from time import perf_counter_ns
+from typing import Any, Iterable, NamedTuple, Optional
+
+from backfill import parse_lines
+from merge import ReorderBuffer
+from reader import Checkpoint, Tailer, positions_of
+
+
+class StageQueue:
+    """
+    This class is the bounded queue between two stages of the pipeline. Every item has a size
+    (the lines of a batch, the events parsed from it) and the queue holds up to capacity of
+    them. A stage putting an item into a full queue waits until the next stage takes enough
+    (backpressure), so a stalled stage holds up the ones before it instead of letting the
+    items pile up in memory. An item larger than the capacity is put once the queue is empty.
+
+    It counts the items put, the largest size reached, and how many times and for how long
+    the stage before it waited for room.
+
+    Arguments:
+        capacity -- Total size of the items the queue holds
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.queue: deque[tuple[Any, int]] = deque()
+        self.size = 0
+        self.changed = asyncio.Condition()
+        self.items = 0
+        self.max_size = 0
+        self.full_waits = 0
+        self.wait_ns = 0
+
+    async def put(self, item: Any, size: int = 1) -> None:
+        """
+        This function puts an item into the queue, waiting while there's no room for it.
+
+        Arguments:
+            item -- Item to be put, None marks the end of the items
+            size -- Size of the item
+        """
+        async with self.changed:
+            if not self._has_room(size):
+                self.full_waits += 1
+                start = perf_counter_ns()
+                await self.changed.wait_for(lambda: self._has_room(size))
+                self.wait_ns += perf_counter_ns() - start
+            self.queue.append((item, size))
+            self.size += size
+            if item is not None:
+                self.items += 1
+            if self.size > self.max_size:
+                self.max_size = self.size
+            self.changed.notify_all()
+
+    async def get(self) -> Any:
+        """
+        Returns the next item of the queue, waiting while it's empty.
+        """
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.queue)
+            item, size = self.queue.popleft()
+            self.size -= size
+            self.changed.notify_all()
+            return item
+
+    def summary(self) -> dict:
+        """
+        Returns the size and counters of the queue as a json serializable dictionary.
+        """
+        return {
+            "depth": len(self.queue),
+            "size": self.size,
+            "capacity": self.capacity,
+            "max_size": self.max_size,
+            "items": self.items,
+            "full_waits": self.full_waits,
+            "wait_ms": self.wait_ns / 1e6,
+        }
+
+    def _has_room(self, size: int) -> bool:
+        return not self.queue or self.size + size <= self.capacity
+
+
+def count_lines(batches: list[tuple[str, list[str]]]) -> int:
+    """
+    Returns the number of lines of the batches.
+
+    Arguments:
+        batches -- (source, lines) of the batches
+    """
+    return sum(len(lines) for _, lines in batches)
+
+
+class Pipeline:
+    """
+    This class follows the log files like LogHandler.follow_files, with the reading, the
+    parsing and the writing of the events in three asyncio stages:
+    - read: reads the new lines of the files (in a thread), merged by the reorder buffer if
+      there's one, and puts them into the lines queue
+    - parse: passes the lines to the handler, whose events (and those of its observers) are
+      put into the records queue
+    - sink: writes the events to the sink (in a thread), then saves the positions of the
+      lines they were parsed from to the checkpoint
+
+    The state of the observers (LogHandler.save_state) is saved by the parse stage, which
+    changes it, when it reaches the positions of a batch, so it's saved before the checkpoint
+    of the same lines, never after.
+
+    The lines queue holds up to queue_lines lines, and the records queue as many events. A
+    slow flush of the sink only delays the output while the queues have room, and then the
+    reading, the files holding the lines meanwhile: nothing is dropped. Stopping the pipeline
+    stops the reading, and every line already read is parsed and written before run returns.
+
+    With a pool of parser processes (created with backfill.init_worker), the parse stage
+    splits the batches into chunks of chunk_lines lines, parsed by the workers while the
+    stage keeps reading. The chunks are queued in the order their lines were read, and their
+    events are written through the handler in that order, whichever worker finishes first,
+    so the sink and the observers see the same events as without a pool. Up to two chunks
+    per worker are submitted at a time, counting the one whose events are being collected:
+    the next chunk is only submitted once an earlier one was parsed. The parse metrics of
+    the handler only count the lines parsed in this process.
+
+    Arguments:
+        handler -- LogHandler parsing the lines, its sink must be a MemorySink
+        sink -- Where the events are written
+        tailer -- Tailer following the log files
+        checkpoint -- Where the positions are saved, None doesn't save them
+        reorder -- Buffer merging the lines of the files by timestamp, None passes each batch
+            as it's read
+        queue_lines -- Number of lines (or events) each queue holds
+        pool -- Pool of parser processes, None parses in the event loop
+        workers -- Number of processes of the pool
+        chunk_lines -- Lines of a chunk parsed by a worker
+    """
+
+    def __init__(
+        self,
+        handler,
+        sink,
+        tailer: Tailer,
+        checkpoint: Optional[Checkpoint] = None,
+        reorder: Optional[ReorderBuffer] = None,
+        queue_lines: int = 100_000,
+        pool: Optional[Executor] = None,
+        workers: int = 1,
+        chunk_lines: int = 5000,
+    ) -> None:
+        self.handler = handler
+        self.sink = sink
+        self.tailer = tailer
+        self.checkpoint = checkpoint
+        self.reorder = reorder
+        self.lines = StageQueue(queue_lines)
+        self.records = StageQueue(queue_lines)
+        self.pool = pool
+        self.chunk_lines = chunk_lines
+        # (future of the events, positions) of the chunks being parsed, in the order they were
+        # read. The slots bound the chunks submitted to the pool, they're released once the
+        # events of a chunk are collected
+        self.parsing = StageQueue(2 * workers)
+        self.slots = asyncio.Semaphore(2 * workers)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.stopping = asyncio.Event()
+
+    async def run(self, follow: bool = True, stop_signals: Iterable[int] = ()) -> None:
+        """
+        This function runs the stages until the pipeline is stopped, and every line read was
+        written. If a stage fails the others are cancelled and the error is raised.
+
+        Arguments:
+            follow -- Keeps waiting for new lines, False stops once every file was read
+            stop_signals -- Signals that stop the pipeline, like SIGTERM
+        """
+        loop = asyncio.get_running_loop()
+        for signum in stop_signals:
+            loop.add_signal_handler(signum, self.stop)
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self._read(follow))
+                if self.pool is None:
+                    group.create_task(self._parse())
+                else:
+                    group.create_task(self._submit())
+                    group.create_task(self._collect())
+                group.create_task(self._write())
+        finally:
+            for signum in stop_signals:
+                loop.remove_signal_handler(signum)
+
+    def stop(self) -> None:
+        """
+        This function stops reading the files, called from the event loop.
+        """
+        self.stopping.set()
+
+    def summary(self) -> dict:
+        """
+        Returns the metrics of the queues as a json serializable dictionary.
+        """
+        summary = {"lines": self.lines.summary(), "records": self.records.summary()}
+        if self.pool is not None:
+            summary["parsing"] = {
+                **self.parsing.summary(),
+                "max_in_flight": self.max_in_flight,
+            }
+        return summary
+
+    async def _read(self, follow: bool) -> None:
+        reorder = self.reorder
+        while not self.stopping.is_set():
+            batches, positions = await asyncio.to_thread(self._read_round)
+            if not batches and not follow:
+                break
+            released = batches
+            if reorder is not None:
+                released, positions = reorder.release(batches, positions)
+            if released or positions is not None:
+                await self.lines.put((released, positions), count_lines(released))
+            if not batches:
+                await asyncio.to_thread(self.tailer.wait)
+        if reorder is not None:
+            released, positions = reorder.release([], final=True)
+            await self.lines.put((released, positions), count_lines(released))
+        await self.lines.put(None)
+
+    def _read_round(self) -> tuple[list[tuple[str, list[str]]], Optional[dict]]:
+        batches = self.tailer.read_batches()
+        if not batches or self.checkpoint is None:
+            return batches, None
+        return batches, positions_of(self.tailer.files)
+
+    async def _parse(self) -> None:
+        handler = self.handler
+        while (item := await self.lines.get()) is not None:
+            batches, positions = item
+            for source, lines in batches:
+                handler.process_stream(lines, source)
+            if positions is not None and self.checkpoint is not None:
+                handler.save_state()
+            records = handler.sink.take()
+            await self.records.put((records, positions), len(records))
+            # The batches are parsed in the event loop, the other stages run between them
+            await asyncio.sleep(0)
+        await self.records.put(None)
+
+    async def _submit(self) -> None:
+        loop = asyncio.get_running_loop()
+        size = self.chunk_lines
+        while (item := await self.lines.get()) is not None:
+            batches, positions = item
+            chunks = [
+                (source, lines[start : start + size])
+                for source, lines in batches
+                for start in range(0, len(lines), size)
+            ]
+            if not chunks:
+                await self.parsing.put((None, positions), 0)
+                continue
+            # The positions are saved once the events of the last chunk are written
+            last = len(chunks) - 1
+            for index, (source, lines) in enumerate(chunks):
+                await self.slots.acquire()
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                future = loop.run_in_executor(self.pool, parse_lines, lines, source)
+                await self.parsing.put((future, positions if index == last else None))
+        await self.parsing.put(None)
+
+    async def _collect(self) -> None:
+        handler = self.handler
+        while (item := await self.parsing.get()) is not None:
+            future, positions = item
+            if future is not None:
+                try:
+                    events = await future
+                finally:
+                    self.in_flight -= 1
+                    self.slots.release()
+                for record in events:
+                    handler.write_record(record)
+            if positions is not None and self.checkpoint is not None:
+                handler.save_state()
+            records = handler.sink.take()
+            await self.records.put((records, positions), len(records))
+        await self.records.put(None)
+
+    async def _write(self) -> None:
+        while (item := await self.records.get()) is not None:
+            await asyncio.to_thread(self._write_batch, *item)
+        await asyncio.to_thread(self.sink.flush)
+
+    def _write_batch(
+        self, records: list[NamedTuple], positions: Optional[dict]
+    ) -> None:
+        sink = self.sink
+        for record in records:
+            sink.write(record)
+        if positions is not None and self.checkpoint is not None:
+            sink.flush()
+            self.checkpoint.save_positions(positions)
@@ -0,0 +1,193 @@
+"""This module contains the sliding window rate detector of the farming events"""
+
+from collections import OrderedDict
+from functools import partial
+from operator import attrgetter
+from typing import Any, Callable, NamedTuple, Optional
+
+from events import EVENT_SPECS
+
+
+class RateAlert(NamedTuple):
+    """
+    Total of a key of a rule that reached its threshold within the window.
+    """
+
+    timestamp: int
+    event: str
+    roleid: int
+    itemid: int
+    total: int
+    window: int
+    threshold: int
+
+
+class RateWindow:
+    """
+    This class counts the values of one key over a sliding window, as a ring buffer of time
+    buckets: a bucket is cleared when the window slides past it, so adding a value costs at
+    most one pass over the ring and usually a single bucket update.
+
+    Arguments:
+        size -- Number of buckets of the window
+    """
+
+    __slots__ = ("counts", "last", "total", "alerted")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.last = 0
+        self.total = 0
+        self.alerted = False
+
+    def add(self, bucket: int, value: int) -> int:
+        """
+        This function adds a value to a bucket and returns the total of the window.
+
+        Arguments:
+            bucket -- Bucket number (timestamp divided by the bucket size)
+            value -- Value added
+        """
+        size = len(self.counts)
+        if bucket > self.last:
+            if bucket - self.last >= size:
+                self.counts = [0] * size
+                self.total = 0
+            else:
+                for expired in range(self.last + 1, bucket + 1):
+                    index = expired % size
+                    self.total -= self.counts[index]
+                    self.counts[index] = 0
+            self.last = bucket
+        elif bucket <= self.last - size:
+            # Older than the window, it's already out of the total
+            return self.total
+        self.counts[bucket % size] += value
+        self.total += value
+        return self.total
+
+
+class RateRule:
+    """
+    This class is the rate limit of one event type, e.g. the units mined of an item per role.
+
+    Arguments:
+        event -- Name of the event type, a key of EVENT_SPECS
+        key -- Record fields the values are counted by
+        value -- Record field counted, None counts the events
+        window -- Length of the window in seconds
+        bucket -- Length of a bucket in seconds
+        threshold -- Total of the window that raises an alert
+        item_thresholds -- Thresholds of specific item IDs, replacing threshold
+    """
+
+    def __init__(
+        self,
+        event: str,
+        key: tuple[str, ...],
+        value: Optional[str],
+        window: int,
+        bucket: int,
+        threshold: int,
+        item_thresholds: Optional[dict[int, int]] = None,
+    ) -> None:
+        record = EVENT_SPECS[event].record
+        if record is None:
+            raise ValueError(f"{event} has sub-types, its rules go on the sub-types")
+        self.event = event
+        self.record = record
+        self.key = attrgetter(*key)
+        self.value = attrgetter(value) if value else None
+        self.window = window
+        self.bucket = bucket
+        self.size = max(window // bucket, 1)
+        self.threshold = threshold
+        self.item_thresholds = item_thresholds or {}
+        self.windows: OrderedDict = OrderedDict()
+
+
+class RateDetector:
+    """
+    This class raises a RateAlert when the total of a key (e.g. a role and an item) in a
+    sliding window reaches the threshold of its rule, the alert is written to the sink with the
+    other events. A key alerts once, and again only after its total fell below the threshold.
+
+    The time is the timestamp of the events, so backfills alert like live logs. Keys without
+    events for a whole window are evicted, as well as the least recently updated keys once a
+    rule has max_keys, so memory stays bounded with many active roles.
+
+    Arguments:
+        rules -- Rules by event type, as in config.RATE_RULES
+        max_keys -- Maximum number of keys counted by each rule
+    """
+
+    def __init__(self, rules: dict[str, dict], max_keys: int = 100_000) -> None:
+        self.rules = [RateRule(event, **rule) for event, rule in rules.items()]
+        self.max_keys = max_keys
+        self.alerts = 0
+
+    def handlers(self) -> dict[type, Callable[[Any], Optional[NamedTuple]]]:
+        """
+        Returns the function called with each record class this detector follows.
+        """
+        return {rule.record: partial(self.count, rule) for rule in self.rules}
+
+    def summary(self) -> dict:
+        """
+        Returns the number of alerts and of keys counted by each rule, for the stats file.
+        """
+        return {
+            "alerts": self.alerts,
+            "keys": {rule.event: len(rule.windows) for rule in self.rules},
+        }
+
+    def count(self, rule: RateRule, record: Any) -> Optional[RateAlert]:
+        """
+        This function adds an event to its window, returning a RateAlert if it reached the
+        threshold.
+
+        Arguments:
+            rule -- Rule of the event type
+            record -- Event with timestamp and roleid fields, of the record class of the rule
+        """
+        key = rule.key(record)
+        windows = rule.windows
+        window = windows.get(key)
+        if window is None:
+            self._evict(rule, record.timestamp)
+            window = windows[key] = RateWindow(rule.size)
+        else:
+            windows.move_to_end(key)
+
+        value = rule.value(record) if rule.value else 1
+        total = window.add(record.timestamp // rule.bucket, value)
+        itemid = getattr(record, "itemid", 0)
+        threshold = rule.item_thresholds.get(itemid, rule.threshold)
+        if total < threshold:
+            window.alerted = False
+            return None
+        if window.alerted:
+            return None
+
+        window.alerted = True
+        self.alerts += 1
+        return RateAlert(
+            record.timestamp,
+            rule.event,
+            record.roleid,
+            itemid,
+            total,
+            rule.window,
+            threshold,
+        )
+
+    def _evict(self, rule: RateRule, now: int) -> None:
+        # The windows are ordered by their last update, so only the first ones can be expired,
+        # called before a key is added, it leaves room for it
+        windows = rule.windows
+        expired = now // rule.bucket - rule.size
+        while windows:
+            window = next(iter(windows.values()))
+            if window.last > expired and len(windows) < self.max_keys:
+                break
+            windows.popitem(last=False)
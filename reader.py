@@ -0,0 +1,419 @@
+"""This module follows the world2 log files from where the listener stopped, across rotations"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import json
+import os
+import select
+import time
+from typing import Optional
+
+FINGERPRINT_SIZE = 128
+READ_SIZE = 1024 * 1024
+# Bytes of a file read by one call of TrackedFile.read_lines, a backlog is read in several calls.
+# A round of the listener holds this much of every followed file
+MAX_READ_SIZE = 2 * READ_SIZE
+
+# inotify events of a watched directory that mean a log file has new lines or was rotated
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+def fingerprint(file_descriptor: int, size: int) -> str:
+    """
+    Returns the sha1 of the first bytes of a file, it tells a rotated copy of a file apart
+    from an unrelated file.
+
+    Arguments:
+        file_descriptor -- Descriptor of the open file
+        size -- Number of bytes hashed
+    """
+    return hashlib.sha1(os.pread(file_descriptor, size, 0)).hexdigest()
+
+
+def same_start(path: str, position: dict) -> bool:
+    """
+    Checks if a file starts with the same bytes as the file of a saved position.
+
+    Arguments:
+        path -- Path of the file
+        position -- Position saved in the checkpoint
+    """
+    size = position.get("fingerprint_size", 0)
+    if not size:
+        return True
+    with open(path, "rb") as file:
+        return fingerprint(file.fileno(), size) == position["fingerprint"]
+
+
+def positions_of(files: list["TrackedFile"]) -> dict[str, dict]:
+    """
+    Returns the position of every open file, keyed by its path.
+
+    Arguments:
+        files -- Files being read
+    """
+    positions = {}
+    for tracked in files:
+        position = tracked.position_state()
+        if position is not None:
+            positions[tracked.path] = position
+    return positions
+
+
+class Checkpoint:
+    """
+    This class persists the position of every log file read by the listener, as a json file
+    with the inode, byte offset and fingerprint (sha1 of the first bytes) of each path.
+
+    The file is replaced atomically, so a crash leaves either the previous or the new
+    positions, never a partially written file.
+
+    Arguments:
+        path -- Path of the checkpoint file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.positions: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.positions = json.load(file)
+
+    def get(self, log_path: str) -> Optional[dict]:
+        """
+        Returns the saved position of a log file, or None if it was never read.
+
+        Arguments:
+            log_path -- Path of the log file
+        """
+        return self.positions.get(log_path)
+
+    def save(self, files: list["TrackedFile"]) -> None:
+        """
+        Writes the position of the given files into the checkpoint file.
+
+        Arguments:
+            files -- Files being read
+        """
+        self.save_positions(positions_of(files))
+
+    def save_positions(self, positions: dict[str, dict]) -> None:
+        """
+        Writes the given positions into the checkpoint file, keeping the ones of other files.
+
+        Arguments:
+            positions -- Positions by path, as returned by positions_of
+        """
+        self.positions.update(positions)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.positions, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+
+class TrackedFile:
+    """
+    This class reads the complete lines of a log file, keeping track of the byte offset of the
+    last complete line, so it can be saved to a Checkpoint and resumed later.
+
+    When opened with a saved position it resumes at that offset. If the file was rotated while
+    the listener was down, the rest of the old file is read first:
+    - rename rotation: the path has a new inode, the old one is looked for among the rotated
+      files of the same directory (world2.log.1, ...)
+    - copy-truncate rotation: the inode is the same but the file is shorter than the offset,
+      the copy is the rotated file with the same fingerprint
+    The same checks are done while following the file, every time read_lines reaches its end.
+
+    Arguments:
+        path -- Path of the log file
+        position -- Position saved in the checkpoint, None if it was never read
+        from_start -- Reads a never read file from the start instead of from its end
+        encoding -- Encoding the file is written in, e.g. utf-8 or gbk
+    """
+
+    def __init__(
+        self,
+        path: str,
+        position: Optional[dict] = None,
+        from_start: bool = False,
+        encoding: str = "utf-8",
+    ) -> None:
+        self.path = path
+        self.encoding = encoding
+        self.file: Optional[io.FileIO] = None
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self.fingerprint: Optional[str] = None
+        self.fingerprint_size = 0
+        self.pending: list[str] = []
+        self.resume = position
+        self._open(position, from_start)
+
+    def read_lines(self) -> list[str]:
+        """
+        Returns the complete lines written since the last call, decoded from the encoding of
+        the file and without the newline. A partially written last line is left to be read by
+        the next call, and so are the lines after the first MAX_READ_SIZE bytes, so a backlog
+        (a first run from the start, an old checkpoint) is read a part at a time.
+        """
+        lines, self.pending = self.pending, []
+        if self.file is None:
+            self._open(self.resume, True)
+            if self.file is None:
+                return lines
+
+        new_lines, finished = self._read_complete_lines(self.file, MAX_READ_SIZE)
+        lines += new_lines
+        if finished:
+            self._check_rotation(lines)
+        return lines
+
+    def position_state(self) -> Optional[dict]:
+        """
+        Returns the position to be saved in the checkpoint, None if the file isn't open.
+        """
+        if self.file is None:
+            return None
+        size = min(self.offset, FINGERPRINT_SIZE)
+        if size != self.fingerprint_size:
+            self.fingerprint = fingerprint(self.file.fileno(), size)
+            self.fingerprint_size = size
+        return {
+            "inode": self.inode,
+            "offset": self.offset,
+            "fingerprint": self.fingerprint,
+            "fingerprint_size": self.fingerprint_size,
+        }
+
+    def close(self) -> None:
+        """
+        Closes the log file.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _read_complete_lines(self, file, max_size: int = 0) -> tuple[list[str], bool]:
+        # The file is read in large blocks, each one decoded once up to its last newline and
+        # split, the incomplete line at its end is read again with the next block. It stops at
+        # the end of the file, or once max_size bytes were read (0 reads to the end), and
+        # returns whether the end was reached
+        lines: list[str] = []
+        partial = b""
+        read = 0
+        finished = True
+        while True:
+            if max_size and read >= max_size:
+                finished = False
+                break
+            block = file.read(READ_SIZE)
+            if not block:
+                break
+            read += len(block)
+            if partial:
+                block = partial + block
+            end = block.rfind(b"\n") + 1
+            if end:
+                text = str(memoryview(block)[: end - 1], self.encoding, "replace")
+                lines += text.split("\n")
+                if file is self.file:
+                    self.offset += end
+            partial = block[end:]
+        if partial:
+            file.seek(-len(partial), os.SEEK_CUR)
+        return lines, finished
+
+    def _open(self, position: Optional[dict], from_start: bool) -> None:
+        try:
+            file = self.file = open(self.path, "rb", buffering=0)
+        except FileNotFoundError:
+            self.file = None
+            return
+        stat = os.fstat(file.fileno())
+        self.resume = None
+        self.inode = stat.st_ino
+        self.offset = 0
+        self.fingerprint = None
+        self.fingerprint_size = 0
+
+        if position is None:
+            if not from_start:
+                self.offset = file.seek(0, os.SEEK_END)
+            return
+
+        rotated = None
+        if position["inode"] != stat.st_ino:
+            rotated = self._find_rotated(inode=position["inode"])
+        elif stat.st_size < position["offset"] or not same_start(self.path, position):
+            rotated = self._find_rotated(fingerprint_of=position)
+        else:
+            self.offset = file.seek(position["offset"])
+            return
+
+        if rotated is not None:
+            with open(rotated, "rb", buffering=0) as old_file:
+                old_file.seek(position["offset"])
+                self.pending, _ = self._read_complete_lines(old_file)
+
+    def _check_rotation(self, lines: list[str]) -> None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        file = self.file
+        if file is None:
+            return
+        size = os.fstat(file.fileno()).st_size
+        if stat.st_ino != self.inode:
+            # Renamed, the old file is still open, so whatever is left in it is read first
+            rest, finished = self._read_complete_lines(file, MAX_READ_SIZE)
+            lines += rest
+            if not finished:
+                return
+            self.close()
+            self._open(None, True)
+            if self.file is not None:
+                lines += self._read_complete_lines(self.file, MAX_READ_SIZE)[0]
+        elif size < self.offset:
+            position = self.position_state()
+            rotated = self._find_rotated(fingerprint_of=position)
+            if rotated is not None and position is not None:
+                with open(rotated, "rb", buffering=0) as old_file:
+                    old_file.seek(position["offset"])
+                    lines += self._read_complete_lines(old_file)[0]
+            file.seek(0)
+            self.offset = 0
+            self.fingerprint_size = 0
+            lines += self._read_complete_lines(file, MAX_READ_SIZE)[0]
+
+    def _rotated_candidates(self) -> list[str]:
+        directory = os.path.dirname(self.path) or "."
+        prefix = f"{os.path.basename(self.path)}."
+        return sorted(
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.startswith(prefix) and not name.endswith(".gz")
+        )
+
+    def _find_rotated(
+        self, inode: Optional[int] = None, fingerprint_of: Optional[dict] = None
+    ) -> Optional[str]:
+        for candidate in self._rotated_candidates():
+            if inode is not None and os.stat(candidate).st_ino == inode:
+                return candidate
+            if (
+                fingerprint_of is not None
+                and os.path.getsize(candidate) >= fingerprint_of["offset"]
+                and same_start(candidate, fingerprint_of)
+            ):
+                return candidate
+        return None
+
+
+class Watcher:
+    """
+    This class waits until a file of the watched directories changes, so the tailer reads the
+    new lines as soon as they're written instead of at the next poll.
+
+    It uses inotify on Linux, watching the directories (a watch on the file itself would be
+    lost when it's rotated). Where inotify isn't available it sleeps for the whole timeout.
+
+    Arguments:
+        paths -- Files whose directories are watched
+    """
+
+    def __init__(self, paths: list[str]) -> None:
+        self.descriptor: Optional[int] = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            descriptor = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if descriptor < 0:
+            return
+
+        directories = {os.path.dirname(os.path.abspath(path)) for path in paths}
+        for directory in directories:
+            libc.inotify_add_watch(
+                descriptor, os.fsencode(directory), IN_MODIFY | IN_MOVED_TO | IN_CREATE
+            )
+        self.descriptor = descriptor
+
+    def wait(self, timeout: float) -> None:
+        """
+        Returns when a watched directory changed or after timeout seconds.
+
+        Arguments:
+            timeout -- Maximum number of seconds to wait
+        """
+        if self.descriptor is None:
+            time.sleep(timeout)
+            return
+
+        ready, _, _ = select.select([self.descriptor], [], [], timeout)
+        if ready:
+            # Only the wake up matters, the queued events are discarded
+            try:
+                while os.read(self.descriptor, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        """
+        Stops watching the directories.
+        """
+        if self.descriptor is not None:
+            os.close(self.descriptor)
+            self.descriptor = None
+
+
+class Tailer:
+    """
+    This class follows several log files in a single process, replacing the tail -f pipeline:
+    the new lines of each file are read in blocks and returned tagged with their file, and
+    between reads it waits on a Watcher, with poll_interval as the longest wait.
+
+    Arguments:
+        files -- Files being followed
+        poll_interval -- Seconds between reads when no change is notified
+    """
+
+    def __init__(self, files: list[TrackedFile], poll_interval: float = 0.5) -> None:
+        self.files = files
+        self.poll_interval = poll_interval
+        self.watcher = Watcher([tracked.path for tracked in files])
+
+    def read_batches(self) -> list[tuple[str, list[str]]]:
+        """
+        Returns the new lines of every file, as (path of the file, lines) batches.
+        """
+        batches = []
+        for tracked in self.files:
+            lines = tracked.read_lines()
+            if lines:
+                batches.append((tracked.path, lines))
+        return batches
+
+    def wait(self) -> None:
+        """
+        Waits until a file may have new lines.
+        """
+        self.watcher.wait(self.poll_interval)
+
+    def close(self) -> None:
+        """
+        Closes the files and stops watching them.
+        """
+        self.watcher.close()
+        for tracked in self.files:
+            tracked.close()
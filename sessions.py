@@ -0,0 +1,157 @@
+"""This module contains the tracker of the roles online, built from the login and logout lines"""
+
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from events import Login, Logout
+
+
+class RoleSession(NamedTuple):
+    """
+    Session of a role, from its login to its logout. duration is measured from the login line,
+    logged_duration is the time= of the logout line, -1 when the session was closed by a new
+    login of the same role instead of a logout.
+    """
+
+    timestamp: int
+    userid: int
+    roleid: int
+    login: int
+    duration: int
+    logged_duration: int
+
+
+class SessionTracker:
+    """
+    This class keeps the roles that are online and pairs their logins and logouts into
+    RoleSession records, written to the sink with the other events.
+
+    The online roles are indexed by roleid and by userid, and the sessions closed today by
+    roleid, so every query is a dictionary lookup instead of a scan of the logs. A logout
+    without a login (the role logged in before the listener started) gets its login from the
+    time= of the logout line. Sessions whose measured and logged durations differ by more than
+    tolerance seconds are counted in mismatches.
+
+    Arguments:
+        tolerance -- Seconds the measured and logged durations may differ
+    """
+
+    def __init__(self, tolerance: int = 2) -> None:
+        self.tolerance = tolerance
+        self.online: dict[int, Login] = {}
+        self.online_by_user: dict[int, set[int]] = {}
+        self.today: dict[int, list[RoleSession]] = {}
+        self.day_end = 0
+        self.mismatches = 0
+
+    def handlers(self) -> dict[type, Callable[[Any], Optional[NamedTuple]]]:
+        """
+        Returns the function called with each record class this tracker follows.
+        """
+        return {Login: self.login, Logout: self.logout}
+
+    def login(self, record: Login) -> Optional[RoleSession]:
+        """
+        This function marks a role as online, closing its previous session if it never logged
+        out.
+
+        Arguments:
+            record -- Login record
+        """
+        previous = self.online.get(record.roleid)
+        closed = None
+        if previous is not None:
+            closed = self._close(previous, record.timestamp, -1)
+        self.online[record.roleid] = record
+        self.online_by_user.setdefault(record.userid, set()).add(record.roleid)
+        return closed
+
+    def logout(self, record: Logout) -> RoleSession:
+        """
+        This function marks a role as offline and returns its session.
+
+        Arguments:
+            record -- Logout record
+        """
+        login = self.online.get(record.roleid)
+        if login is None:
+            login = Login(
+                record.timestamp - record.duration, record.userid, record.roleid
+            )
+        session = self._close(login, record.timestamp, record.duration)
+        if abs(session.duration - record.duration) > self.tolerance:
+            self.mismatches += 1
+        return session
+
+    def is_online(self, roleid: int) -> bool:
+        """
+        Returns True if the role is online.
+
+        Arguments:
+            roleid -- Role ID
+        """
+        return roleid in self.online
+
+    def online_count(self) -> int:
+        """
+        Returns the number of roles online.
+        """
+        return len(self.online)
+
+    def online_roles(self, userid: Optional[int] = None):
+        """
+        Returns the role IDs online, as a live view of the index, or those of one user.
+
+        Arguments:
+            userid -- User ID, None returns the roles of every user
+        """
+        if userid is None:
+            return self.online.keys()
+        return self.online_by_user.get(userid, set())
+
+    def sessions_today(self, roleid: int) -> list[RoleSession]:
+        """
+        Returns the sessions of a role that ended today, by the time of the logs.
+
+        Arguments:
+            roleid -- Role ID
+        """
+        return self.today.get(roleid, [])
+
+    def summary(self) -> dict:
+        """
+        Returns the roles online as a json serializable dictionary, for the stats file.
+        """
+        return {
+            "online_count": len(self.online),
+            "online_roles": list(self.online),
+            "mismatches": self.mismatches,
+        }
+
+    def _close(self, login: Login, timestamp: int, logged_duration: int) -> RoleSession:
+        self.online.pop(login.roleid, None)
+        roles = self.online_by_user.get(login.userid)
+        if roles is not None:
+            roles.discard(login.roleid)
+            if not roles:
+                del self.online_by_user[login.userid]
+
+        session = RoleSession(
+            timestamp,
+            login.userid,
+            login.roleid,
+            login.timestamp,
+            timestamp - login.timestamp,
+            logged_duration,
+        )
+        if timestamp >= self.day_end:
+            self._start_day(timestamp)
+        self.today.setdefault(login.roleid, []).append(session)
+        return session
+
+    def _start_day(self, timestamp: int) -> None:
+        day = time.localtime(timestamp)
+        self.day_end = int(
+            time.mktime((day.tm_year, day.tm_mon, day.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        )
+        self.today.clear()
@@ -0,0 +1,338 @@
+"""This module contains the sinks where the events parsed by the LogHandler are written"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import traceback
+from datetime import date
+from typing import Iterable, NamedTuple, Optional, TextIO, get_origin
+
+from events import EVENT_SPECS, EventSpec
+
+
+class BufferedSink:
+    """
+    Base class of the sinks, it buffers the events and hands them over in batches.
+
+    The buffer is written when it has max_records events, when flush_interval seconds have
+    passed since the last flush (checked by a background thread, so a quiet log still gets
+    written) and when the sink is closed. Subclasses implement _write_records.
+
+    A batch that fails to be written is reported to stderr and dropped, the same way the
+    handler skips a line that raises, so a broken sink loses its events instead of growing the
+    buffer until the listener runs out of memory.
+
+    Arguments:
+        max_records -- Number of buffered events that triggers a flush
+        flush_interval -- Seconds between flushes of a partially filled buffer, 0 disables it
+    """
+
+    def __init__(self, max_records: int, flush_interval: float) -> None:
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self.buffer: list[NamedTuple] = []
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+
+    def write(self, record: NamedTuple) -> None:
+        """
+        This function buffers an event, flushing the buffer when it's full.
+
+        Arguments:
+            record -- Event to be written
+        """
+        with self.lock:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.max_records:
+                self._flush()
+        if self.flusher is None and self.flush_interval > 0:
+            self.flusher = threading.Thread(
+                target=self._flush_periodically, daemon=True
+            )
+            self.flusher.start()
+
+    def flush(self) -> None:
+        """
+        This function writes every buffered event.
+        """
+        with self.lock:
+            self._flush()
+
+    def close(self) -> None:
+        """
+        This function flushes the buffer, stops the background flush and closes the sink.
+        """
+        self.closed.set()
+        with self.lock:
+            self._flush()
+            self._close()
+
+    def _flush_periodically(self) -> None:
+        while not self.closed.wait(self.flush_interval):
+            self.flush()
+
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        try:
+            self._write_records(self.buffer)
+        except Exception:  # pylint: disable=broad-exception-caught
+            print(
+                f"Failed to write {len(self.buffer)} events to {type(self).__name__}",
+                file=sys.stderr,
+            )
+            traceback.print_exc()
+        finally:
+            self.buffer.clear()
+
+    def _write_records(self, records: list[NamedTuple]) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class MemorySink(BufferedSink):
+    """
+    This class keeps the events in memory until they're taken, for a handler whose events are
+    written somewhere else: by the parent process of a backfill worker, or by the sink stage
+    of the pipeline.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(max_records=sys.maxsize, flush_interval=0)
+
+    def take(self) -> list[NamedTuple]:
+        """
+        Returns the buffered events and empties the buffer.
+        """
+        with self.lock:
+            records, self.buffer = self.buffer, []
+        return records
+
+    def _write_records(self, records: list[NamedTuple]) -> None:
+        pass
+
+
+class FileSink(BufferedSink):
+    """
+    This class writes the events into a text file, one repr per line.
+
+    The file is kept open and written in batches (see BufferedSink). It's rotated when it
+    grows over max_bytes, keeping backup_count numbered backups (log.log.1 is the newest), or
+    at the first flush of a new day if daily is set, renaming the file to log.log.YYYY-MM-DD.
+
+    Arguments:
+        file_name -- Path of the output file, its directory is created if needed
+        max_records -- Number of buffered events that triggers a flush
+        flush_interval -- Seconds between flushes of a partially filled buffer, 0 disables it
+        max_bytes -- Size that triggers a rotation, 0 disables it
+        backup_count -- Number of backups kept by the size rotation
+        daily -- Rotates the file when the day changes
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        max_records: int = 1000,
+        flush_interval: float = 1.0,
+        max_bytes: int = 0,
+        backup_count: int = 5,
+        daily: bool = False,
+    ) -> None:
+        super().__init__(max_records, flush_interval)
+        self.file_name = file_name
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.daily = daily
+        self.file: Optional[TextIO] = None
+        self.day: Optional[date] = None
+
+    def _write_records(self, records: list[NamedTuple]) -> None:
+        file = self.file or self._open()
+        if self.daily and self.day is not None and self.day != date.today():
+            file = self._rotate(f"{self.file_name}.{self.day.isoformat()}")
+
+        file.write("".join([f"{record!r}\n" for record in records]))
+        file.flush()
+        if self.max_bytes and file.tell() >= self.max_bytes:
+            self._rotate_numbered(file)
+
+    def _close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _open(self) -> TextIO:
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.day is None:
+            self.day = date.today()
+            if os.path.exists(self.file_name) and os.path.getsize(self.file_name):
+                self.day = date.fromtimestamp(os.path.getmtime(self.file_name))
+        self.file = open(self.file_name, "a", encoding="utf-8")
+        return self.file
+
+    def _rotate(self, rotated_name: str) -> TextIO:
+        self._close()
+        os.replace(self.file_name, rotated_name)
+        self.day = date.today()
+        return self._open()
+
+    def _rotate_numbered(self, file: TextIO) -> None:
+        for number in range(self.backup_count - 1, 0, -1):
+            source = f"{self.file_name}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_name}.{number + 1}")
+        if self.backup_count > 0:
+            self._rotate(f"{self.file_name}.1")
+        else:
+            file.truncate(0)
+
+
+SQLITE_TYPES = {int: "INTEGER", float: "REAL", str: "TEXT", bytes: "BLOB"}
+
+
+def table_name(record_class: type) -> str:
+    """
+    Returns the table of a record class, TradeSave is stored in trade_save.
+    """
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", record_class.__name__).lower()
+
+
+def json_row(record: NamedTuple, fields: tuple[int, ...]) -> list:
+    """
+    Returns the values of a record with the tuple fields encoded as JSON arrays.
+
+    Arguments:
+        record -- Event to be inserted, a typing.NamedTuple
+        fields -- Indexes of the tuple fields
+    """
+    row = list(record)
+    for index in fields:
+        row[index] = json.dumps(row[index], ensure_ascii=False)
+    return row
+
+
+class SQLiteSink(BufferedSink):
+    """
+    This class stores the events in a SQLite database, with a table per event type.
+
+    The tables are created from the event types declared in events.py, their columns are the
+    record fields, with an index on the timestamp and one on each roleid column (with the
+    timestamp) for per player reports. Records of other classes get a table the first time
+    they're written, with the column types taken from that record. Tuple fields, like the
+    GM action arguments, are stored as JSON arrays in TEXT columns.
+
+    Every flush inserts the buffered events with one executemany per table inside a single
+    transaction, and the database runs in WAL mode so reports can read while it's written.
+
+    Arguments:
+        database -- Path of the database file, its directory is created if needed
+        max_records -- Number of buffered events that triggers a flush
+        flush_interval -- Seconds between flushes of a partially filled buffer, 0 disables it
+        specs -- Event types whose tables are created when the database is opened
+    """
+
+    def __init__(
+        self,
+        database: str,
+        max_records: int = 5000,
+        flush_interval: float = 1.0,
+        specs: Optional[Iterable[EventSpec]] = None,
+    ) -> None:
+        super().__init__(max_records, flush_interval)
+        directory = os.path.dirname(database)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The background flush writes from another thread, the lock serializes every access
+        self.connection = sqlite3.connect(
+            database, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.inserts: dict[type, str] = {}
+        self.json_fields: dict[type, tuple[int, ...]] = {}
+        if specs is None:
+            specs = EVENT_SPECS.values()
+        for spec in specs:
+            if spec.record is not None:
+                self.create_table(spec.record, spec.types)
+
+    def create_table(
+        self, record_class: type[NamedTuple], types: Iterable[type]
+    ) -> None:
+        """
+        This function creates the table and indexes of a record class, if they don't exist.
+
+        Arguments:
+            record_class -- Record class, a typing.NamedTuple
+            types -- Python type of each field
+        """
+        table = table_name(record_class)
+        fields = record_class._fields
+        types = tuple(types)
+        json_fields = tuple(
+            index
+            for index, field_type in enumerate(types)
+            if (get_origin(field_type) or field_type) is tuple
+        )
+        columns = ", ".join(
+            f"{field} {SQLITE_TYPES.get(field_type, 'TEXT')}"
+            for field, field_type in zip(fields, types)
+        )
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+            if "timestamp" in fields:
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_timestamp ON {table} (timestamp)"
+                )
+            for field in fields:
+                if field.startswith("roleid"):
+                    order = ", timestamp" if "timestamp" in fields else ""
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {table}_{field} ON {table} ({field}{order})"
+                    )
+            placeholders = ", ".join("?" * len(fields))
+            self.inserts[record_class] = f"INSERT INTO {table} VALUES ({placeholders})"
+            if json_fields:
+                self.json_fields[record_class] = json_fields
+
+    def write(self, record: NamedTuple) -> None:
+        """
+        This function buffers an event, creating the table of a new record class.
+
+        Arguments:
+            record -- Event to be written, a typing.NamedTuple
+        """
+        if record.__class__ not in self.inserts:
+            self.create_table(record.__class__, [type(value) for value in record])
+        super().write(record)
+
+    def _write_records(self, records: list[NamedTuple]) -> None:
+        batches: dict[type, list[NamedTuple]] = {}
+        for record in records:
+            batches.setdefault(record.__class__, []).append(record)
+
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            for record_class, batch in batches.items():
+                fields = self.json_fields.get(record_class)
+                rows: Iterable = batch
+                if fields:
+                    rows = [json_row(record, fields) for record in batch]
+                cursor.executemany(self.inserts[record_class], rows)
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def _close(self) -> None:
+        self.connection.close()
@@ -7,5 +7,6 @@ if [ -n "$pwlogger_pid" ]; then
 else
     echo "Starting pwlogger"
     cd $(dirname -- "$script_path")
+    mkdir -p logs
     nohup "$script_path" > /dev/null 2> logs/start_error.log &
 fi
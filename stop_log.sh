@@ -1,6 +1,20 @@
 #!/bin/bash
 
 pwlogger_pid=$(pidof -x log_listener.sh)
+# The python process has to be stopped too, or it outlives the script.
+# SIGTERM lets it write the buffered events and save the checkpoint.
+# Only the --follow process started by log_listener.sh is stopped, by the pid it saved,
+# a --backfill run by hand keeps going.
+pid_file="logs/log_listener.pid"
+stream_pid=""
+if [ -f "$pid_file" ]; then
+    stream_pid=$(cat "$pid_file")
+    # The pid may belong to another process if the listener died without removing the file
+    if ! ps -p "$stream_pid" -o args= | grep -q "log_listener.py.*--follow"; then
+        stream_pid=""
+    fi
+    rm -f "$pid_file"
+fi
 
 if [ -n "$pwlogger_pid" ]; then
     echo "Stopping pwlogger process (PID: $pwlogger_pid)"
@@ -8,3 +22,8 @@ if [ -n "$pwlogger_pid" ]; then
 else
     echo "No pwlogger process found."
 fi
+
+if [ -n "$stream_pid" ]; then
+    echo "Stopping log_listener.py process (PID: $stream_pid)"
+    kill $stream_pid
+fi
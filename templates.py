@@ -0,0 +1,183 @@
+"""This module contains the compiler of the printf-style templates of REGEX_PATTERNS (GM actions)"""
+
+import re
+from typing import NamedTuple, Optional, Union
+
+from log_header import LogHeader, to_epoch
+
+# Regex and type of each printf conversion of the templates
+CONVERSIONS = {
+    "d": (r"(-?\d+)", int),
+    "f": (r"(-?\d+(?:\.\d+)?)", float),
+    "s": (r"(.*?)", str),
+}
+CONVERSION = re.compile(r"%([dfs%])")
+
+
+class GmAction(NamedTuple):
+    """
+    Action of a GM line, named after its template. roleid is the first number of the template
+    (the GM or the player), arguments are the other values in the order of the template,
+    converted to the type of their conversion (%d int, %f float, %s str), so every action fits
+    the same record. SQLiteSink stores them as a JSON array.
+    """
+
+    timestamp: int
+    action: str
+    roleid: int
+    arguments: tuple[Union[int, float, str], ...]
+
+
+def tokenize(template: str) -> list[tuple[str, str]]:
+    """
+    Returns the pieces of a printf-style template, as ("literal", text) and
+    ("conversion", code) tuples.
+
+    Arguments:
+        template -- Template like "GM %d started the activity %d."
+    """
+    tokens = []
+    literal = ""
+    position = 0
+    for conversion in CONVERSION.finditer(template):
+        literal += template[position : conversion.start()]
+        code = conversion.group(1)
+        if code == "%":
+            literal += "%"
+        else:
+            if literal:
+                tokens.append(("literal", literal))
+            tokens.append(("conversion", code))
+            literal = ""
+        position = conversion.end()
+    literal += template[position:]
+    if literal:
+        tokens.append(("literal", literal))
+    return tokens
+
+
+def end_pattern(template: str) -> str:
+    """
+    Returns the regex matched after a template: the end of the line, except for templates
+    ending with a comma, whose lines go on with details that aren't parsed.
+
+    Arguments:
+        template -- printf-style template
+    """
+    return "" if template.endswith(",") else r"\s*$"
+
+
+def compile_template(template: str) -> tuple[str, tuple[type, ...]]:
+    """
+    Returns the regex of a printf-style template, with a group per conversion, and the type of
+    each group, anchored like end_pattern.
+
+    Arguments:
+        template -- Template like "GM %d started the activity %d."
+    """
+    pieces = []
+    types = []
+    for kind, value in tokenize(template):
+        if kind == "literal":
+            pieces.append(re.escape(value))
+        else:
+            pattern, convert = CONVERSIONS[value]
+            pieces.append(pattern)
+            types.append(convert)
+    pieces.append(end_pattern(template))
+    return "".join(pieces), tuple(types)
+
+
+class TemplateMatcher:
+    """
+    This class matches a text against every template at once.
+
+    The templates are compiled into a single regex shaped like a prefix tree of their pieces,
+    so the "GM %d " most of them start with is matched once instead of once per template, and
+    each template ends with an empty named group: the name of the last group of a match
+    (lastgroup) is the template found. Its values are the groups along its path in the tree,
+    converted to their types.
+
+    Arguments:
+        templates -- Printf-style templates by name, like config.REGEX_PATTERNS
+    """
+
+    def __init__(self, templates: dict[str, str]) -> None:
+        trie: dict = {}
+        for name, template in templates.items():
+            node = trie
+            for token in tokenize(template):
+                node = node.setdefault(token, {})
+            node[("end", name)] = end_pattern(template)
+        self.groups: dict[str, tuple[tuple[int, ...], tuple[type, ...]]] = {}
+        self.group_count = 0
+        self.regex = re.compile(self._to_regex(trie, (), ()))
+
+    def match(self, text: str, position: int = 0) -> Optional[tuple[str, tuple]]:
+        """
+        Returns the name of the template matching the text and its converted values, or None.
+
+        Arguments:
+            text -- Text to be matched, from position to its end
+            position -- Where the template must start in the text
+        """
+        matches = self.regex.match(text, position)
+        # Every template ends with its named group, the last one a match closes
+        if matches is None or matches.lastgroup is None:
+            return None
+        name = matches.lastgroup
+        indexes, types = self.groups[name]
+        if len(indexes) == 1:
+            return name, (types[0](matches.group(indexes[0])),)
+        values = matches.group(*indexes) if indexes else ()
+        return name, tuple([convert(value) for convert, value in zip(types, values)])
+
+    def _to_regex(self, node: dict, indexes: tuple, types: tuple) -> str:
+        # The groups are numbered in the order their parentheses open, the order they're written
+        alternatives = []
+        for (kind, value), child in node.items():
+            if kind == "end":
+                self.group_count += 1
+                self.groups[value] = (indexes, types)
+                alternatives.append(f"{child}(?P<{value}>)")
+            elif kind == "literal":
+                alternatives.append(
+                    re.escape(value) + self._to_regex(child, indexes, types)
+                )
+            else:
+                self.group_count += 1
+                pattern, convert = CONVERSIONS[value]
+                alternatives.append(
+                    pattern
+                    + self._to_regex(
+                        child, indexes + (self.group_count,), types + (convert,)
+                    )
+                )
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return f"(?:{'|'.join(alternatives)})"
+
+
+def parse_gm_action(header: LogHeader, matcher: TemplateMatcher) -> Optional[GmAction]:
+    """
+    Returns the GmAction of a GM line, whose message follows "GM:" in the payload, or None if
+    no template matches it.
+
+    Arguments:
+        header -- Header of the log line
+        matcher -- Matcher of the GM templates
+    """
+    payload = header.payload
+    start = payload.find("GM:")
+    if start < 0:
+        return None
+    start += 3
+    while payload[start : start + 1] == " ":
+        start += 1
+    found = matcher.match(payload, start)
+    if found is None:
+        return None
+    name, values = found
+    if not values:
+        return None
+    return GmAction(to_epoch(header.timestamp), name, values[0], values[1:])
@@ -0,0 +1,52 @@
+"""This package contains the tests, the sink they share to look at the written events and the
+chat lines they parse in several processes"""
+
+import base64
+
+from sinks import BufferedSink
+
+# Messages of a GBK server, with a few UTF-16LE clients. The ASCII messages in GBK are valid
+# UTF-16LE too, they only decode the same everywhere if the decoder doesn't depend on the
+# messages it decoded before
+CHAT_MESSAGES = (
+    ("卖金币便宜", "gbk"),
+    ("组队打副本", "gbk"),
+    ("hello!", "gbk"),
+    ("wts cheap", "gbk"),
+    ("lf1m party", "gbk"),
+    ("你好", "utf-16-le"),
+    ("hi all", "utf-16-le"),
+)
+
+
+class ListSink(BufferedSink):
+    """
+    Sink keeping the written events in a list
+    """
+
+    def __init__(self):
+        super().__init__(max_records=1, flush_interval=0)
+        self.records = []
+
+    def _write_records(self, records):
+        self.records += records
+
+
+def chat_lines(count: int) -> list[str]:
+    """
+    Returns count chat lines: the Chinese GBK messages in the first half, so the lines of the
+    second half only have ASCII and UTF-16LE messages.
+
+    Arguments:
+        count -- Number of lines
+    """
+    lines = []
+    for index in range(count):
+        messages = CHAT_MESSAGES if index < count // 2 else CHAT_MESSAGES[2:]
+        text, encoding = messages[index % len(messages)]
+        message = base64.b64encode(text.encode(encoding)).decode()
+        lines.append(
+            f"2024-10-06 20:{index // 60 % 60:02}:{index % 60:02} pwtestes.com glinkd-1: "
+            f"chat : Chat: src={1024 + index % 7} chl=1 msg={message}"
+        )
+    return lines
@@ -0,0 +1,83 @@
+"""This script is run to test the columnar analytics of the events"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import analytics
+from events import ExpSp, LevelUp, Mine, ReceiveMoney, SpendMoney
+from sinks import SQLiteSink
+
+
+@unittest.skipIf(analytics.np is None, "numpy isn't installed")
+class TestAnalytics(unittest.TestCase):
+    """
+    Class to hold all tests from the columnar analytics
+    """
+
+    def test_to_columns(self):
+        """
+        Test if records become one array per field, integer fields as int64
+        """
+        columns = analytics.group_by_class(
+            [Mine(10, 1, 2, 410), LevelUp(10, 1, 9, "2:01:46")]
+        )
+        self.assertEqual(columns[Mine]["itemid"].tolist(), [410])
+        self.assertEqual(columns[Mine]["itemid"].dtype, analytics.np.int64)
+        self.assertEqual(columns[LevelUp]["playtime"].tolist(), ["2:01:46"])
+        self.assertEqual(columns[LevelUp]["level"].dtype, analytics.np.int64)
+
+    def test_group_sum_and_top_k(self):
+        """
+        Test if values are summed per key, counted or sorted, and the highest sums are
+        returned first
+        """
+        np = analytics.np
+        roles = np.array([3, 1, 3, 2, 1, 3])
+        items = np.array([5, 5, 6, 5, 5, 5])
+        counts = np.array([1, 2, 3, 4, 5, 6])
+        keys, sums = analytics.group_sum(counts, roles, items)
+        self.assertEqual([key.tolist() for key in keys], [[1, 2, 3, 3], [5, 5, 5, 6]])
+        self.assertEqual(sums.tolist(), [7, 4, 7, 3])
+        self.assertEqual(analytics.top_k(keys, sums, 2), [(1, 5, 7), (3, 5, 7)])
+
+        with mock.patch.object(analytics, "DENSE_GROUPS", 0):
+            sorted_keys, sorted_sums = analytics.group_sum(counts, roles, items)
+        self.assertEqual(
+            [key.tolist() for key in sorted_keys], [key.tolist() for key in keys]
+        )
+        self.assertEqual(sorted_sums.tolist(), sums.tolist())
+
+    def test_reports(self):
+        """
+        Test if the reports aggregate the events stored in the SQLite database
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "events.db")
+            sink = SQLiteSink(database, flush_interval=0)
+            for record in (
+                ReceiveMoney(3600, 1, 500),
+                SpendMoney(3700, 1, 100),
+                ReceiveMoney(3800, 2, 300),
+                Mine(3600, 1, 2, 410),
+                Mine(3601, 1, 3, 410),
+                ExpSp(3600, 1, 100, 5),
+                ExpSp(7300, 2, 50, 5),
+                ExpSp(99999, 2, 50, 5),
+            ):
+                sink.write(record)
+            sink.close()
+
+            names = [*analytics.MONEY_SIGNS, "process_mine", "process_exp_sp"]
+            columns = analytics.load_events(database, names, 0, 86400)
+
+        self.assertEqual(analytics.economy_report(columns), [(1, 400), (2, 300)])
+        self.assertEqual(analytics.mining_report(columns), [(1, 410, 5)])
+        top, (hours, exp) = analytics.exp_report(columns)
+        self.assertEqual(top, [(1, 100), (2, 50)])
+        self.assertEqual((hours.tolist(), exp.tolist()), ([3600, 7200], [100, 50]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""This script is run to test the parallel backfill of whole log files"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import log_listener
+from backfill import backfill, split_ranges
+from benchmarks.generator import generate_lines
+from log_listener import LogHandler
+from tests import CHAT_MESSAGES, ListSink, chat_lines
+from trades import TradeCorrelator
+
+
+class TestBackfill(unittest.TestCase):
+    """
+    Class to hold all tests from the parallel backfill
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "world2.log")
+        self.lines = [
+            line for _, line in generate_lines(3000, unmatched_ratio=0.1, seed=3)
+        ]
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("".join(f"{line}\n" for line in self.lines))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_split_ranges(self):
+        """
+        Test if the ranges cover the whole file and start right after a newline
+        """
+        ranges = split_ranges(self.path, 4096)
+        self.assertGreater(len(ranges), 10)
+        self.assertEqual(ranges[0][1], 0)
+        self.assertEqual(ranges[-1][2], os.path.getsize(self.path))
+        with open(self.path, "rb") as file:
+            data = file.read()
+        for (_, _, end), (_, start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[start - 1 : start], b"\n")
+
+    def test_same_events_as_stream(self):
+        """
+        Test if the backfill of a plain and a .gz file writes the events of reading them in
+        order, including the events derived by the observers
+        """
+        rotated = f"{self.path}.1.gz"
+        with open(self.path, "rb") as source, gzip.open(rotated, "wb") as target:
+            shutil.copyfileobj(source, target)
+
+        expected = LogHandler(sink=ListSink(), observers=[TradeCorrelator()])
+        expected.process_stream(self.lines + self.lines)
+        expected.close()
+
+        handler = LogHandler(sink=ListSink(), observers=[TradeCorrelator()])
+        processed = backfill(handler, [rotated, self.path], workers=2, range_size=4096)
+        handler.close()
+        self.assertEqual(processed, 2 * len(self.lines))
+        self.assertEqual(handler.sink.records, expected.sink.records)
+
+    def test_chat_same_as_stream(self):
+        """
+        Test if the workers decode the chat messages, GBK and UTF-16LE, as a handler reading
+        the lines in order does
+        """
+        lines = chat_lines(2000)
+        chat = os.path.join(self.directory.name, "world2.chat")
+        with open(chat, "w", encoding="utf-8") as file:
+            file.write("".join(f"{line}\n" for line in lines))
+
+        expected = LogHandler(sink=ListSink())
+        expected.process_stream(lines)
+        expected.close()
+
+        handler = LogHandler(sink=ListSink())
+        backfill(handler, [chat], workers=2, range_size=4096)
+        handler.close()
+        self.assertEqual(handler.sink.records, expected.sink.records)
+        texts = {record.text for record in handler.sink.records}
+        self.assertEqual(texts, {text for text, _ in CHAT_MESSAGES})
+
+    def test_merge_logs_by_timestamp(self):
+        """
+        Test if the events of different logs are merged by timestamp, and the rotated files of
+        a log are read before it
+        """
+        formatlog = os.path.join(self.directory.name, "world2.formatlog")
+        lines = [
+            "2024-10-06 20:42:0{} pwtestes.com glinkd-1: notice : formatlog:rolelogout:"
+            "userid=1072:roleid=1041:localsid=147:time=3481",
+            "2024-10-06 20:42:0{} pwtestes.com gamed: info : 用户1041拣起金钱9",
+        ]
+        with open(f"{formatlog}.1", "w", encoding="utf-8") as file:
+            file.write(lines[0].format(1) + "\n")
+        with open(formatlog, "w", encoding="utf-8") as file:
+            file.write(lines[0].format(4) + "\n")
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(lines[1].format(2) + "\n" + lines[1].format(5) + "\n")
+
+        handler = LogHandler(sink=ListSink())
+        backfill(handler, [self.path, f"{formatlog}.1", formatlog], workers=1)
+        handler.close()
+        timestamps = [record.timestamp for record in handler.sink.records]
+        self.assertEqual(len(timestamps), 4)
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_live_snapshot_untouched(self):
+        """
+        Test if a backfill neither loads nor saves the live snapshot of the groups
+        """
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(
+                "2024-09-06 20:00:00 pwtestes.com gamed: info : 用户42脱离队伍(1,1727463280)\n"
+            )
+        live = os.path.join(self.directory.name, "groups.json")
+        snapshot = '{"parties": {"1": {"42": true}}, "factions": {"9": {"42": 6}}}'
+        with open(live, "w", encoding="utf-8") as file:
+            file.write(snapshot)
+
+        with mock.patch.object(log_listener, "GROUPS_SNAPSHOT_FILE", live):
+            arguments = ["--backfill", self.path, "--workers", "1", "--database"]
+            log_listener.main(
+                arguments + [os.path.join(self.directory.name, "events.db")]
+            )
+        with open(live, encoding="utf-8") as file:
+            self.assertEqual(file.read(), snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
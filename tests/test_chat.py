@@ -0,0 +1,76 @@
+"""This script is run to test the parser of the chat lines and the decoder of their messages"""
+
+import base64
+import unittest
+
+from chat import ChatDecoder, parse_chat
+from log_header import parse_header
+
+
+class TestChat(unittest.TestCase):
+    """
+    Class to hold all tests from the chat lines
+    """
+
+    def test_decode_encodings(self):
+        """
+        Test if UTF-16LE messages are decoded, and GBK messages are decoded by the fallback,
+        whatever their length
+        """
+        decoder = ChatDecoder()
+        utf16 = base64.b64encode("卖金币".encode("utf-16-le")).decode()
+        self.assertEqual(decoder.decode(utf16), "卖金币")
+        # Even length GBK also decodes as UTF-16LE, into private use and unassigned characters
+        gbk = base64.b64encode("卖金币便宜".encode("gbk")).decode()
+        self.assertEqual(decoder.decode(gbk), "卖金币便宜")
+        odd = base64.b64encode("金a".encode("gbk")).decode()
+        self.assertEqual(decoder.decode(odd), "金a")
+        self.assertEqual(ChatDecoder(("gbk",)).decode(gbk), "卖金币便宜")
+
+    def test_decode_ambiguous(self):
+        """
+        Test if a message valid in both encodings is decoded with the one giving text, from the
+        first message on, whatever the decoder decoded before
+        """
+        hello = base64.b64encode("hello!".encode("gbk")).decode()
+        # ASCII in GBK is also valid CJK in UTF-16LE, "敨汬Ⅿ"
+        self.assertEqual(ChatDecoder().decode(hello), "hello!")
+        # UTF-16LE ideographs whose bytes are all ASCII, "`O}Y" in GBK
+        hi = base64.b64encode("你好".encode("utf-16-le")).decode()
+        self.assertEqual(ChatDecoder().decode(hi), "你好")
+        decoder = ChatDecoder()
+        for message in (hi, base64.b64encode("卖金币".encode("gbk")).decode(), hello):
+            decoder.decode(message)
+        self.assertEqual(decoder.decode(hello), "hello!")
+        self.assertEqual(decoder.decode(hi), "你好")
+        self.assertEqual(
+            decoder.decode(base64.b64encode("hello!".encode("utf-16-le")).decode()),
+            "hello!",
+        )
+
+    def test_decode_cache(self):
+        """
+        Test if repeated messages are decoded once and invalid base64 is kept as is
+        """
+        decoder = ChatDecoder(cache_size=2)
+        message = base64.b64encode("spam".encode("utf-16-le")).decode()
+        for _ in range(3):
+            self.assertEqual(decoder.decode(message), "spam")
+        self.assertEqual(decoder.decode("not base64!"), "not base64!")
+        self.assertEqual(decoder.cache_info(), {"hits": 2, "misses": 2, "size": 2})
+
+    def test_parse_chat(self):
+        """
+        Test if chat payloads without a channel code are kept and other payloads are skipped
+        """
+        decoder = ChatDecoder()
+        header = parse_header(
+            "2024-10-06 20:45:12 pwtestes.com glinkd-1: chat : Chat: src=1041 msg=SABpAA=="
+        )
+        self.assertEqual(parse_chat(header, decoder)[1:], ("common", 1041, 0, "Hi"))
+        header = header._replace(payload="Chat: src=1041 chl=1")
+        self.assertIsNone(parse_chat(header, decoder))
+
+
+if __name__ == "__main__":
+    unittest.main()
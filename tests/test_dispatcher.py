@@ -0,0 +1,47 @@
+"""This script is run to test the keyword dispatcher"""
+
+import unittest
+
+from config import LOG_PATTERNS
+from dispatcher import KeywordDispatcher
+
+
+class TestDispatcher(unittest.TestCase):
+    """
+    Class to hold all tests from the keyword dispatcher
+    """
+
+    def setUp(self):
+        self.dispatcher = KeywordDispatcher(LOG_PATTERNS)
+
+    def test_longest_keyword_wins(self):
+        """
+        Test if the longest keyword is found, no matter the dictionary order
+        """
+        line = "2024-09-21 08:23:24 pwtestes.com gamed: info : 用户1028拣起金钱9"
+        self.assertEqual(
+            self.dispatcher.find(line), ("拣起金钱", "process_pick_up_money")
+        )
+
+    def test_team_pickup_is_reachable(self):
+        """
+        Test if the team pick up keyword is not shadowed by the shorter pick up keyword
+        """
+        line = "2024-09-21 08:23:24 pwtestes.com gamed: info : 用户1028组队拣起用户1029的金钱9"
+        self.assertEqual(
+            self.dispatcher.find(line), ("组队拣起用户", "pickupTeamMoney")
+        )
+
+    def test_shorter_keyword_still_found(self):
+        """
+        Test if a keyword that prefixes a longer one is still found on its own
+        """
+        line = "2024-09-22 03:37:29 pwtestes.com gamed: info : 用户1088拣起100个410"
+        self.assertEqual(self.dispatcher.find(line), ("拣起", "process_pick_item"))
+
+    def test_no_keyword(self):
+        """
+        Test if a line without any keyword returns None
+        """
+        line = "2024-09-22 03:37:29 pwtestes.com gamed: info : 用户1088进入副本"
+        self.assertIsNone(self.dispatcher.find(line))
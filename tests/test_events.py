@@ -0,0 +1,95 @@
+"""This script is run to test the declared event types and the generic parser"""
+
+import unittest
+
+from events import EVENT_SPECS, EventSpec, Mine, parse_event, resolve_spec
+from log_header import parse_header, to_epoch
+from log_listener import LogHandler
+
+
+class TestEvents(unittest.TestCase):
+    """
+    Class to hold all tests from the event types
+    """
+
+    def setUp(self):
+        self.give_up_task = parse_header(
+            "2024-09-24 08:03:33 pwtestes.com gamed: notice : formatlog:task:roleid=1120:taskid=33582:type=1:msg=GiveUpTask"
+        )
+        self.mine_item = parse_header(
+            "2024-09-21 08:23:02 pwtestes.com gamed: info : 用户1028采集得到2个1837"
+        )
+
+    def test_fields_follow_named_groups(self):
+        """
+        Test if the fields of an event type are the date followed by the regex named groups
+        """
+        self.assertEqual(
+            EVENT_SPECS["process_mine"].fields,
+            ("timestamp", "roleid", "count", "itemid"),
+        )
+        self.assertEqual(EVENT_SPECS["process_level_up"].types, (int, int, int, str))
+
+    def test_groups_must_match_record(self):
+        """
+        Test if an event type whose named groups aren't the fields of its record is rejected
+        """
+        with self.assertRaises(ValueError):
+            EventSpec(
+                "process_mine", Mine, r"用户(?P<roleid>\d+)采集得到(?P<itemid>\d+)"
+            )
+
+    def test_subtype_is_resolved(self):
+        """
+        Test if the sub-type of a shared keyword is picked by its token
+        """
+        spec = resolve_spec(EVENT_SPECS["process_task"], self.give_up_task.payload)
+        self.assertIs(spec, EVENT_SPECS["process_task_give_up"])
+
+    def test_subtype_by_discriminator(self):
+        """
+        Test if the sub-type is picked by the token of its field, and unknown tokens are skipped
+        """
+        faction = parse_header(
+            "2024-10-12 01:00:42 pwtestes.com gamedbd: notice : formatlog:faction:type=join:roleid=1088:factionid=1"
+        )
+        spec = resolve_spec(EVENT_SPECS["process_faction"], faction.payload)
+        self.assertIs(spec, EVENT_SPECS["process_join_faction"])
+        self.assertIsNone(
+            resolve_spec(
+                EVENT_SPECS["process_faction"],
+                faction.payload.replace("join", "rename"),
+            )
+        )
+        trade = (
+            "formatlog:trade_debug:tradesubmit,rid=1088,A:1024,B:1088,retcode=76,tid=1"
+        )
+        spec = resolve_spec(EVENT_SPECS["process_trade"], trade)
+        self.assertIs(spec, EVENT_SPECS["process_trade_submit"])
+        self.assertIsNone(parse_event(EVENT_SPECS["process_task"], faction))
+
+    def test_parse_event_no_match(self):
+        """
+        Test if a payload that doesn't match the regex returns None
+        """
+        self.assertIsNone(parse_event(EVENT_SPECS["process_mine"], self.give_up_task))
+
+    def test_compatibility_wrapper(self):
+        """
+        Test if the process_* methods still parse their own lines
+        """
+        handler = LogHandler()
+        self.assertEqual(
+            handler.process_mine(self.mine_item, "process_mine"),
+            (to_epoch("2024-09-21 08:23:02"), 1028, 2, 1837),
+        )
+
+    def test_typed_record(self):
+        """
+        Test if the event is a record of its event type with typed fields
+        """
+        record = parse_event(EVENT_SPECS["process_mine"], self.mine_item)
+        self.assertIs(type(record), Mine)
+        self.assertEqual(type(record).__name__, "Mine")
+        self.assertEqual((record.roleid, record.count, record.itemid), (1028, 2, 1837))
+        self.assertFalse(hasattr(record, "__dict__"))
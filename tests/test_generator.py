@@ -0,0 +1,45 @@
+"""This script is run to test the synthetic log generator of the benchmarks"""
+
+import unittest
+
+from benchmarks.generator import generate_lines, parse_mix
+from log_listener import LogHandler
+from tests import ListSink
+
+
+class TestGenerator(unittest.TestCase):
+    """
+    Class to hold all tests from the synthetic log generator
+    """
+
+    def test_generated_lines_parse(self):
+        """
+        Test if every generated fixture line is parsed and every unmatched line is ignored
+        """
+        handler = LogHandler(sink=ListSink())
+        for name, line in generate_lines(2000, unmatched_ratio=0.2, seed=1):
+            result = handler.process_log_line(line)
+            if name == "unmatched":
+                self.assertIsNone(result, line)
+            else:
+                self.assertIsNotNone(result, line)
+        handler.close()
+
+    def test_mix_and_seed(self):
+        """
+        Test if the corpus follows the event mix and the same seed generates the same lines
+        """
+        mix = parse_mix("login=3,trade_save")
+        self.assertEqual(mix, {"login": 3.0, "trade_save": 1.0})
+        lines = list(generate_lines(1000, mix, unmatched_ratio=0, seed=2))
+        self.assertEqual({name for name, _ in lines}, {"login", "trade_save"})
+        self.assertEqual(
+            lines, list(generate_lines(1000, mix, unmatched_ratio=0, seed=2))
+        )
+        self.assertEqual(lines[999][1][:19], "2024-10-06 20:00:00")
+        with self.assertRaises(ValueError):
+            list(generate_lines(1, {"unknown": 1}))
+
+
+if __name__ == "__main__":
+    unittest.main()
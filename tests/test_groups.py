@@ -0,0 +1,126 @@
+"""This script is run to test the party and faction membership"""
+
+import os
+import tempfile
+import unittest
+
+from groups import GroupMembership
+from log_listener import LogHandler
+from reader import Checkpoint, Tailer, TrackedFile
+from sinks import MemorySink
+
+
+def gamed_line(payload):
+    """
+    Returns a gamed info line
+    """
+    return f"2024-10-06 20:00:00 pwtestes.com gamed: info : {payload}"
+
+
+def faction_line(payload):
+    """
+    Returns a gamedbd faction line
+    """
+    return f"2024-10-06 20:00:00 pwtestes.com gamedbd: notice : formatlog:faction:{payload}"
+
+
+class TestGroupMembership(unittest.TestCase):
+    """
+    Class to hold all tests from the party and faction membership
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.directory.name, "groups.json")
+        self.groups = GroupMembership(self.snapshot)
+        self.handler = LogHandler(sink=MemorySink(), observers=[self.groups])
+
+    def tearDown(self):
+        self.handler.close()
+        self.directory.cleanup()
+
+    def process(self, *lines):
+        """
+        Processes log lines
+        """
+        for line in lines:
+            self.handler.process_log_line(line)
+
+    def test_party(self):
+        """
+        Test if party members are added and removed, and an empty party is dropped
+        """
+        self.process(
+            gamed_line("用户1104建立了队伍(1104,0)"),
+            gamed_line("用户1184成为队员(1104,1727463280)"),
+        )
+        self.assertEqual(
+            self.groups.party_members(1104), {1104: "Leader", 1184: "Member"}
+        )
+        self.assertEqual(self.groups.groups_of(1184), {"party": 1104, "faction": None})
+
+        self.process(
+            gamed_line("用户1184脱离队伍(1104,1727463280)"),
+            gamed_line("用户1104脱离队伍(1104,1727463280)"),
+        )
+        self.assertEqual(self.groups.party_members(1104), {})
+        self.assertEqual(self.groups.summary()["parties"], 0)
+        self.assertEqual(self.groups.groups_of(1104)["party"], None)
+
+    def test_faction(self):
+        """
+        Test if faction members keep their role name, and deleting the faction drops them
+        """
+        self.process(
+            faction_line("type=create:roleid=1024:factionid=1"),
+            faction_line("type=join:roleid=1088:factionid=1"),
+            faction_line("type=promote:superior=1024:roleid=1088:factionid=1:role=5"),
+            faction_line("type=join:roleid=1100:factionid=1"),
+            faction_line("type=leave:roleid=1100:factionid=1:role=6"),
+        )
+        self.assertEqual(
+            self.groups.faction_members(1), {1024: "Marechal", 1088: "Capitão"}
+        )
+        self.assertEqual(self.groups.faction_role(1088), "Capitão")
+        self.assertIsNone(self.groups.faction_role(1100))
+
+        self.process(faction_line("type=delete:factionid=1"))
+        self.assertEqual(self.groups.faction_members(1), {})
+        self.assertEqual(self.groups.groups_of(1024), {"party": None, "faction": None})
+
+    def test_snapshot(self):
+        """
+        Test if the state saved when the handler is closed is loaded by a new model
+        """
+        self.process(
+            gamed_line("用户1104建立了队伍(1104,0)"),
+            faction_line("type=create:roleid=1024:factionid=7"),
+        )
+        self.handler.close()
+        restored = GroupMembership(self.snapshot)
+        self.assertEqual(restored.party_members(1104), {1104: "Leader"})
+        self.assertEqual(restored.faction_members(7), {1024: "Marechal"})
+        self.assertEqual(restored.groups_of(1024), {"party": None, "faction": 7})
+
+    def test_snapshot_with_checkpoint(self):
+        """
+        Test if the snapshot is saved with the checkpoint, and only when the membership changed
+        """
+        log_path = os.path.join(self.directory.name, "world2.log")
+        with open(log_path, "w", encoding="utf-8") as file:
+            file.write(gamed_line("用户1104建立了队伍(1104,0)") + "\n")
+        tailer = Tailer([TrackedFile(log_path, from_start=True)])
+        checkpoint = Checkpoint(os.path.join(self.directory.name, "checkpoint.json"))
+        self.handler.follow_files(tailer, checkpoint, follow=False)
+        tailer.close()
+
+        self.assertFalse(self.groups.changed)
+        restored = GroupMembership(self.snapshot)
+        self.assertEqual(restored.party_members(1104), {1104: "Leader"})
+        os.remove(self.snapshot)
+        self.handler.save_state()
+        self.assertFalse(os.path.exists(self.snapshot))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""This script is run to test the economy ledger"""
+
+import unittest
+
+from events import GshopTrade, ReceiveMoney, SpendMoney
+from ledger import EconomyLedger, Rollup
+from trades import TradeCompleted
+
+
+class TestEconomyLedger(unittest.TestCase):
+    """
+    Class to hold all tests from the economy ledger
+    """
+
+    def setUp(self):
+        self.ledger = EconomyLedger(user_role={1056: 1088}.get)
+        self.handlers = self.ledger.handlers()
+
+    def feed(self, *records):
+        """
+        Passes records to the ledger
+        """
+        for record in records:
+            self.handlers[record.__class__](record)
+
+    def test_rollup_window(self):
+        """
+        Test if the totals only cover the retained buckets
+        """
+        rollup = Rollup(60, 3)
+        rollup.add(0, 1, "receive_money", 100)
+        rollup.add(60, 1, "receive_money", 10)
+        rollup.add(130, 2, "receive_money", 50)
+        self.assertEqual(rollup.top(2), [(1, 110), (2, 50)])
+        rollup.add(185, 2, "spend_money", -5)
+        self.assertEqual(rollup.top(2), [(2, 45), (1, 10)])
+        self.assertEqual(
+            rollup.history(2),
+            [(120, {"receive_money": 50}), (180, {"spend_money": -5})],
+        )
+        rollup.add(10, 1, "receive_money", 1000)
+        self.assertEqual(rollup.top(1), [(2, 45)])
+
+    def test_top_earners(self):
+        """
+        Test if the top earners add up the money sources and can be filtered by source
+        """
+        self.feed(
+            ReceiveMoney(3600, 1, 500),
+            SpendMoney(3610, 1, 200),
+            ReceiveMoney(3620, 2, 400),
+            TradeCompleted(3630, 1, 3, 2, "", 1000, "410:1", 0),
+        )
+        self.assertEqual(self.ledger.top_earners(2), [(2, 1400), (1, 300)])
+        self.assertEqual(self.ledger.top_earners(1, source="receive_money"), [(1, 500)])
+        self.assertEqual(
+            self.ledger.top_earners(3, "day"), [(2, 1400), (1, 300), (3, -1000)]
+        )
+
+    def test_gshop_cash(self):
+        """
+        Test if gshop cash goes to the role of the user, out of the money flow
+        """
+        self.feed(
+            GshopTrade(3600, 1056, 17, 21508, 1, 750000, 100),
+            GshopTrade(3600, 9999, 18, 21508, 1, 750000, 100),
+        )
+        self.assertEqual(self.ledger.top_earners(5), [])
+        self.assertEqual(self.ledger.top_earners(5, source="gshop"), [(1088, -750000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
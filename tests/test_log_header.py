@@ -0,0 +1,53 @@
+"""This script is run to test the parsing of the log line header"""
+
+import time
+import unittest
+
+from log_header import LogHeader, parse_header, to_epoch
+
+
+class TestLogHeader(unittest.TestCase):
+    """
+    Class to hold all tests from the log line header
+    """
+
+    def test_parse_header(self):
+        """
+        Test if the header is split into timestamp, host, daemon, level and payload
+        """
+        line = "2024-10-06 20:42:05 pwtestes.com glinkd-1: notice : formatlog:rolelogin:userid=1072"
+        self.assertEqual(
+            parse_header(line),
+            LogHeader(
+                "2024-10-06 20:42:05",
+                "pwtestes.com",
+                "glinkd",
+                "notice",
+                "formatlog:rolelogin:userid=1072",
+            ),
+        )
+
+    def test_parse_header_chinese_payload(self):
+        """
+        Test if a payload with chinese characters is kept untouched
+        """
+        line = "2024-09-21 08:23:02 pwtestes.com gamed: info : 用户1028采集得到2个1837"
+        header = parse_header(line)
+        self.assertEqual(header.daemon, "gamed")
+        self.assertEqual(header.payload, "用户1028采集得到2个1837")
+
+    def test_invalid_header(self):
+        """
+        Test if lines without a header return None
+        """
+        self.assertIsNone(parse_header("==> /home/logs/world2.log <=="))
+        self.assertIsNone(parse_header("2024-09-21 08:23:02 pwtestes.com gamed info"))
+
+    def test_to_epoch(self):
+        """
+        Test if the timestamp is converted to an epoch in the local time of the server
+        """
+        timestamp = "2024-10-06 20:42:05"
+        expected = int(time.mktime(time.strptime(timestamp, "%Y-%m-%d %H:%M:%S")))
+        self.assertEqual(to_epoch(timestamp), expected)
+        self.assertEqual(to_epoch("2024-10-06 20:43:06"), expected + 61)
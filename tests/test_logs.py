@@ -1,6 +1,12 @@
 """This script is run to perform all tests from log lines"""
 
+import contextlib
+import io
 import unittest
+from unittest import mock
+
+import log_listener
+from log_header import to_epoch
 from log_listener import LogHandler
 
 
@@ -74,49 +80,62 @@ class TestLogs(unittest.TestCase):
         self.remove_trade_itens = "2024-10-12 01:06:23 pwtestes.com gdeliveryd: notice : formatlog:trade_debug:traderemovegoods: roleid=1024,item (id=5029,pos=25,count=1),money=0,tid=1"
         self.trade_submit = "2024-10-11 06:35:10 pwtestes.com gdeliveryd: notice : formatlog:trade_debug:tradesubmit,rid=1088,A:1024,B:1088,retcode=76,tid=1"
         self.trade_save = "2024-10-11 06:35:16 pwtestes.com gdeliveryd: notice : formatlog:trade_debug:TradeSave:Trade done. tid=1,(Trader:1024,1088)"
+        self.world_chat = "2024-10-06 20:45:12 pwtestes.com glinkd-1: chat : Chat: src=1041 chl=1 msg=SABlAGwAbABvACAAdwBvAHIAbABkAA=="
+        self.whisper_chat = "2024-10-06 20:45:30 pwtestes.com glinkd-1: chat : Whisper: src=1041 dst=1024 msg=VlPRkQFeIAC/T5xb"
+        self.faction_chat = "2024-10-06 20:46:02 pwtestes.com glinkd-1: chat : Guild: src=1024 fid=1 msg=SABlAGwAbABvACAAdwBvAHIAbABkAA=="
+        self.gm_start_activity = "2024-10-06 21:05:11 pwtestes.com gamed: notice : GM:GM 1024 started the activity 27."
+        self.gm_move_player = "2024-10-06 21:06:40 pwtestes.com gamed: notice : GM:GM 1024 moved player 1088 to position (1250.500000, 220.000000, -830.250000)."
+        self.send_mail = "2024-10-06 21:10:02 pwtestes.com gdeliveryd: notice : formatlog:sendmail:timestamp=1728259802:src=1024:dst=1088:mid=3:size=120:money=5000:item=8103:count=2:pos=-1"
         self.handler = LogHandler()
 
+    def tearDown(self):
+        self.handler.close()
+
     def test_login_log(self):
         """
         Test if the login log line is correctly processed
         """
         results = self.handler.process_log_line(self.login)
-        self.assertEqual(results, ("2024-10-06 20:42:05", "1072", "1041"))
+        self.assertEqual(results, (to_epoch("2024-10-06 20:42:05"), 1072, 1041))
 
     def test_logout_log(self):
         """
         Test if the logout log line is correctly processed
         """
         results = self.handler.process_log_line(self.logout)
-        self.assertEqual(results, ("2024-10-06 21:40:07", "1072", "1041"))
+        self.assertEqual(results, (to_epoch("2024-10-06 21:40:07"), 1072, 1041, 3481))
 
     def test_exp_sp_log(self):
         """
         Test if the exp_sp log line is correctly processed
         """
         results = self.handler.process_log_line(self.exp_sp)
-        self.assertEqual(results, ("2024-10-06 21:52:43", "1024", "27", "6"))
+        self.assertEqual(results, (to_epoch("2024-10-06 21:52:43"), 1024, 27, 6))
 
     def test_pickup_money_log(self):
         """
         Test if the pickup money log line is correctly processed
         """
         results = self.handler.process_log_line(self.pickup_money)
-        self.assertEqual(results, ("2024-09-21 08:23:24", "1028", "9"))
+        self.assertEqual(results, (to_epoch("2024-09-21 08:23:24"), 1028, 9))
 
     def test_receive_task(self):
         """
         Test if the receive task log line is correctly processed
         """
         results = self.handler.process_log_line(self.receive_task)
-        self.assertEqual(results, ("2024-09-23 08:29:26", "1088", "6436", "receive"))
+        self.assertEqual(
+            results, (to_epoch("2024-09-23 08:29:26"), 1088, 6436, "receive")
+        )
 
     def test_task_give_up(self):
         """
         Test if the give up task log line is correctly processed
         """
         results = self.handler.process_log_line(self.give_up_task)
-        self.assertEqual(results, ("2024-09-24 08:03:33", "1120", "33582", "give_up"))
+        self.assertEqual(
+            results, (to_epoch("2024-09-24 08:03:33"), 1120, 33582, "give_up")
+        )
 
     def test_receive_xp_task(self):
         """
@@ -125,7 +144,7 @@ class TestLogs(unittest.TestCase):
         results = self.handler.process_log_line(self.receive_xp_task)
         self.assertEqual(
             results,
-            ("2024-09-24 08:01:17", "1088", "6437", "8100", "13500", "3000", "2"),
+            (to_epoch("2024-09-24 08:01:17"), 1088, 6437, 8100, 13500, 3000, 2),
         )
 
     def test_receive_item_task(self):
@@ -133,14 +152,24 @@ class TestLogs(unittest.TestCase):
         Test if the receive item task log line is correctly processed
         """
         results = self.handler.process_log_line(self.receive_item_task)
-        self.assertEqual(results, ("2024-09-24 08:01:17", "1088", "6437", "3366", "1"))
+        self.assertEqual(
+            results, (to_epoch("2024-09-24 08:01:17"), 1088, 6437, 3366, 1)
+        )
 
     def test_mine_item(self):
         """
         Test if the mine item log line is correctly processed
         """
         results = self.handler.process_log_line(self.mine_item)
-        self.assertEqual(results, ("2024-09-21 08:23:02", "1028", "2", "1837"))
+        self.assertEqual(results, (to_epoch("2024-09-21 08:23:02"), 1028, 2, 1837))
+
+    def test_process_method_with_line(self):
+        """
+        Test if a process_* method still parses a log line passed as a str
+        """
+        results = self.handler.process_mine(self.mine_item, "process_mine")
+        self.assertEqual(results, (to_epoch("2024-09-21 08:23:02"), 1028, 2, 1837))
+        self.assertIsNone(self.handler.process_mine("no header", "process_mine"))
 
     def test_craft_item(self):
         """
@@ -149,7 +178,7 @@ class TestLogs(unittest.TestCase):
         results = self.handler.process_log_line(self.craft_item)
         self.assertEqual(
             results,
-            ("2024-09-24 18:28:03", "1104", "5", "11330", "1275"),
+            (to_epoch("2024-09-24 18:28:03"), 1104, 5, 11330, 1275),
         )
 
     def test_create_faction(self):
@@ -157,7 +186,7 @@ class TestLogs(unittest.TestCase):
         Test if the create faction log line is correctly processed
         """
         results = self.handler.process_log_line(self.create_faction)
-        self.assertEqual(results, ("2024-10-06 03:10:54", "1024", "1"))
+        self.assertEqual(results, (to_epoch("2024-10-06 03:10:54"), 1024, 1))
 
     def test_upgrade_faction(self):
         """
@@ -165,7 +194,7 @@ class TestLogs(unittest.TestCase):
         """
         results = self.handler.process_log_line(self.upgrade_faction)
         self.assertEqual(
-            results, ("2024-10-06 03:11:10", "1", "1024", "194154706", "2")
+            results, (to_epoch("2024-10-06 03:11:10"), 1, 1024, 194154706, 2)
         )
 
     def test_join_faction(self):
@@ -173,7 +202,7 @@ class TestLogs(unittest.TestCase):
         Test if the join faction log line is correctly processed
         """
         results = self.handler.process_log_line(self.join_faction)
-        self.assertEqual(results, ("2024-10-12 01:00:42", "1088", "1"))
+        self.assertEqual(results, (to_epoch("2024-10-12 01:00:42"), 1088, 1))
 
     def test_promote_role_in_faction(self):
         """
@@ -181,7 +210,7 @@ class TestLogs(unittest.TestCase):
         """
         results = self.handler.process_log_line(self.promote_role_in_faction)
         self.assertEqual(
-            results, ("2024-10-12 01:00:56", "1024", "1088", "1", "5", "Capitão")
+            results, (to_epoch("2024-10-12 01:00:56"), 1024, 1088, 1, 5, "Capitão")
         )
 
     def test_get_new_role(self):
@@ -199,42 +228,42 @@ class TestLogs(unittest.TestCase):
         Test if the leave faction log line is correctly processed
         """
         results = self.handler.process_log_line(self.leave_faction)
-        self.assertEqual(results, ("2024-10-12 01:01:07", "1024", "1"))
+        self.assertEqual(results, (to_epoch("2024-10-12 01:01:07"), 1024, 1))
 
     def test_delete_faction(self):
         """
         Test if the delete faction log line is correctly processed
         """
         results = self.handler.process_log_line(self.delete_faction)
-        self.assertEqual(results, ("2024-10-12 01:01:29", "1"))
+        self.assertEqual(results, (to_epoch("2024-10-12 01:01:29"), 1))
 
     def test_create_party(self):
         """
         Test if the create party log line is correctly processed
         """
         results = self.handler.process_log_line(self.create_party)
-        self.assertEqual(results, ("2024-09-27 15:46:15", "1104", "1104"))
+        self.assertEqual(results, (to_epoch("2024-09-27 15:46:15"), 1104, 1104))
 
     def test_join_party(self):
         """
         Test if the join party log line is correctly processed
         """
         results = self.handler.process_log_line(self.join_party)
-        self.assertEqual(results, ("2024-09-27 15:46:15", "1184", "1104"))
+        self.assertEqual(results, (to_epoch("2024-09-27 15:46:15"), 1184, 1104))
 
     def test_leave_party(self):
         """
         Test if the leave party log line is correctly processed
         """
         results = self.handler.process_log_line(self.leave_party)
-        self.assertEqual(results, ("2024-09-27 16:08:46", "1104", "1104"))
+        self.assertEqual(results, (to_epoch("2024-09-27 16:08:46"), 1104, 1104))
 
     def test_kill_person(self):
         """
         Test if the kill person log line is correctly processed
         """
         results = self.handler.process_log_line(self.kill_person)
-        self.assertEqual(results, ("2024-10-06 20:43:36", "1041", "1024"))
+        self.assertEqual(results, (to_epoch("2024-10-06 20:43:36"), 1041, 1024))
 
     def test_gshop_purchase(self):
         """
@@ -243,7 +272,7 @@ class TestLogs(unittest.TestCase):
         results = self.handler.process_log_line(self.gshop_purchase)
         self.assertEqual(
             results,
-            ("2024-10-02 18:54:40", "1056", "17", "21508", "1", "750000", "98649800"),
+            (to_epoch("2024-10-02 18:54:40"), 1056, 17, 21508, 1, 750000, 98649800),
         )
 
     def test_drop_item(self):
@@ -251,77 +280,77 @@ class TestLogs(unittest.TestCase):
         Test if the drop item log line is correctly processed
         """
         results = self.handler.process_log_line(self.drop_item)
-        self.assertEqual(results, ("2024-09-22 13:31:20", "1072", "1", "154"))
+        self.assertEqual(results, (to_epoch("2024-09-22 13:31:20"), 1072, 1, 154))
 
     def test_drop_equipment(self):
         """
         Test if the drop equipment log line is correctly processed
         """
         results = self.handler.process_log_line(self.drop_equipament)
-        self.assertEqual(results, ("2024-10-06 22:14:40", "1024", "6212"))
+        self.assertEqual(results, (to_epoch("2024-10-06 22:14:40"), 1024, 6212))
 
     def test_discard_money(self):
         """
         Test if the discard money log line is correctly processed
         """
         results = self.handler.process_log_line(self.discard_money)
-        self.assertEqual(results, ("2024-10-10 17:27:46", "1024", "200000"))
+        self.assertEqual(results, (to_epoch("2024-10-10 17:27:46"), 1024, 200000))
 
     def test_sell_npc(self):
         """
         Test if the sell npc log line is correctly processed
         """
         results = self.handler.process_log_line(self.sell_item)
-        self.assertEqual(results, ("2024-09-22 01:41:36", "1029", "1", "154"))
+        self.assertEqual(results, (to_epoch("2024-09-22 01:41:36"), 1029, 1, 154))
 
     def test_receive_money(self):
         """
         Test if the receive money log line is correctly processed
         """
         results = self.handler.process_log_line(self.receive_money)
-        self.assertEqual(results, ("2024-09-22 03:33:47", "1088", "26"))
+        self.assertEqual(results, (to_epoch("2024-09-22 03:33:47"), 1088, 26))
 
     def test_pickup_item(self):
         """
         Test if the pickup item log line is correctly processed
         """
         results = self.handler.process_log_line(self.pickup_item)
-        self.assertEqual(results, ("2024-09-22 03:37:29", "1088", "100", "410"))
+        self.assertEqual(results, (to_epoch("2024-09-22 03:37:29"), 1088, 100, 410))
 
     def test_level_up(self):
         """
         Test if the level up log line is correctly processed
         """
         results = self.handler.process_log_line(self.level_up)
-        self.assertEqual(results, ("2024-09-22 03:41:52", "1088", "9", "2:01:46"))
+        self.assertEqual(results, (to_epoch("2024-09-22 03:41:52"), 1088, 9, "2:01:46"))
 
     def test_spend_money(self):
         """
         Test if the spend money log line is correctly processed
         """
         results = self.handler.process_log_line(self.spend_money)
-        self.assertEqual(results, ("2024-09-22 03:49:15", "1088", "0"))
+        self.assertEqual(results, (to_epoch("2024-09-22 03:49:15"), 1088, 0))
 
     def test_spend_sp(self):
         """
         Test if the spend sp log line is correctly processed
         """
         results = self.handler.process_log_line(self.spend_sp)
-        self.assertEqual(results, ("2024-09-22 03:49:15", "1088", "800"))
+        self.assertEqual(results, (to_epoch("2024-09-22 03:49:15"), 1088, 800))
 
     def test_upgrade_skill(self):
         """
         Test if the upgrade skill log line is correctly processed
         """
         results = self.handler.process_log_line(self.upgrade_skill)
-        self.assertEqual(results, ("2024-09-22 03:49:14", "1088", "245", "1"))
+        self.assertEqual(results, (to_epoch("2024-09-22 03:49:14"), 1088, 245, 1))
 
     def test_pet_hatch(self):
         """
         Test if the pet hatch log line is correctly processed
         """
         results = self.handler.process_log_line(self.pet_hatch)
-        self.assertEqual(results, ("2024-09-24 18:56:58", "1104", "31096"))
+        self.assertEqual(results, (to_epoch("2024-09-24 18:56:58"), 1104, 31096))
 
     def test_add_trade_itens(self):
         """
@@ -329,7 +358,7 @@ class TestLogs(unittest.TestCase):
         """
         results = self.handler.process_log_line(self.add_trade_itens)
         self.assertEqual(
-            results, ("2024-10-11 06:35:02", "1088", "8103", "1", "0", "1")
+            results, (to_epoch("2024-10-11 06:35:02"), 1088, 8103, 1, 0, 1)
         )
 
     def test_remove_trade_itens(self):
@@ -338,7 +367,7 @@ class TestLogs(unittest.TestCase):
         """
         results = self.handler.process_log_line(self.remove_trade_itens)
         self.assertEqual(
-            results, ("2024-10-12 01:06:23", "1024", "5029", "1", "0", "1")
+            results, (to_epoch("2024-10-12 01:06:23"), 1024, 5029, 1, 0, 1)
         )
 
     def test_trade_submit(self):
@@ -346,11 +375,102 @@ class TestLogs(unittest.TestCase):
         Test if the trade submit log line is correctly processed
         """
         results = self.handler.process_log_line(self.trade_submit)
-        self.assertEqual(results, ("2024-10-11 06:35:10", "1088", "1024", "1088", "1"))
+        self.assertEqual(
+            results, (to_epoch("2024-10-11 06:35:10"), 1088, 1024, 1088, 1)
+        )
 
     def test_trade_save(self):
         """
         Test if the trade save log line is correctly processed
         """
         results = self.handler.process_log_line(self.trade_save)
-        self.assertEqual(results, ("2024-10-11 06:35:16", "1", "1024", "1088"))
+        self.assertEqual(results, (to_epoch("2024-10-11 06:35:16"), 1, 1024, 1088))
+
+    def test_world_chat(self):
+        """
+        Test if the world chat log line is correctly processed and its message decoded
+        """
+        results = self.handler.process_log_line(self.world_chat)
+        self.assertEqual(
+            results, (to_epoch("2024-10-06 20:45:12"), "world", 1041, 0, "Hello world")
+        )
+
+    def test_whisper_chat(self):
+        """
+        Test if the whisper log line is correctly processed with its receiver
+        """
+        results = self.handler.process_log_line(self.whisper_chat)
+        self.assertEqual(
+            results,
+            (to_epoch("2024-10-06 20:45:30"), "whisper", 1041, 1024, "卖金币 便宜"),
+        )
+
+    def test_faction_chat(self):
+        """
+        Test if the faction chat log line is correctly processed with its faction
+        """
+        results = self.handler.process_log_line(self.faction_chat)
+        self.assertEqual(
+            results,
+            (to_epoch("2024-10-06 20:46:02"), "faction", 1024, 1, "Hello world"),
+        )
+
+    def test_gm_start_activity(self):
+        """
+        Test if the GM start activity log line is correctly processed
+        """
+        results = self.handler.process_log_line(self.gm_start_activity)
+        self.assertEqual(
+            results, (to_epoch("2024-10-06 21:05:11"), "startActivity", 1024, (27,))
+        )
+
+    def test_gm_move_player(self):
+        """
+        Test if the GM move player log line is correctly processed with its position
+        """
+        results = self.handler.process_log_line(self.gm_move_player)
+        self.assertEqual(
+            results,
+            (
+                to_epoch("2024-10-06 21:06:40"),
+                "movePlayer",
+                1024,
+                (1088, 1250.5, 220.0, -830.25),
+            ),
+        )
+
+    def test_send_mail(self):
+        """
+        Test if the send mail log line is correctly processed
+        """
+        results = self.handler.process_log_line(self.send_mail)
+        self.assertEqual(
+            results,
+            (to_epoch("2024-10-06 21:10:02"), 1024, 1088, 3, 120, 5000, 8103, 2, -1),
+        )
+
+    def test_single_line_chinese(self):
+        """
+        Test if a Chinese log line given on the command line reaches its handler unescaped
+        """
+        sink = mock.Mock()
+        with mock.patch.object(log_listener, "SQLiteSink", return_value=sink):
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                log_listener.main([self.mine_item, "--database", "events.db"])
+        sink.write.assert_called_once_with(
+            (to_epoch("2024-09-21 08:23:02"), 1028, 2, 1837)
+        )
+        self.assertIn("用户1028采集得到2个1837", output.getvalue())
+
+    def test_process_stream(self):
+        """
+        Test if a stream of log lines is processed by the same handler,
+        skipping blank lines and lines that fail to be processed
+        """
+        lines = [
+            f"{self.login}\n",
+            "\n",
+            "2024-09-23 08:29:26 pwtestes.com gamed: notice : formatlog:task:broken\n",
+            f"{self.mine_item}\n",
+        ]
+        self.assertEqual(self.handler.process_stream(lines), 3)
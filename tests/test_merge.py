@@ -0,0 +1,127 @@
+"""This script is run to test the merge of the log files by timestamp"""
+
+import os
+import tempfile
+import unittest
+
+from log_listener import LogHandler
+from merge import ReorderBuffer
+from reader import Checkpoint, Tailer, TrackedFile
+from tests import ListSink
+
+
+def line(second, text):
+    """
+    Returns a log line written at the given second of 2024-10-06 20:42
+    """
+    return f"2024-10-06 20:42:{second:02d} pwtestes.com gamed: info : {text}"
+
+
+class TestReorderBuffer(unittest.TestCase):
+    """
+    Class to hold all tests from the reorder buffer
+    """
+
+    def setUp(self):
+        self.now = 0.0
+        self.buffer = ReorderBuffer(window=2, max_lines=5, clock=lambda: self.now)
+
+    def test_merge_by_timestamp(self):
+        """
+        Test if the lines of several files are released in timestamp order once a line newer
+        than the window was read
+        """
+        self.buffer.push(
+            [("log", [line(1, "a"), line(4, "d")]), ("chat", [line(2, "b")])]
+        )
+        self.assertEqual(
+            self.buffer.pop_ready(), [("log", line(1, "a")), ("chat", line(2, "b"))]
+        )
+        self.buffer.push([("chat", [line(3, "c"), "no header"])])
+        self.assertEqual(self.buffer.pop_ready(), [])
+        self.assertEqual(
+            self.buffer.drain(),
+            [("chat", line(3, "c")), ("chat", "no header"), ("log", line(4, "d"))],
+        )
+
+    def test_quiet_files_and_bound(self):
+        """
+        Test if held lines are released after the window in wall time, and when the buffer is full
+        """
+        self.buffer.push([("log", [line(1, "a"), line(2, "b")])])
+        self.assertEqual(self.buffer.pop_ready(), [])
+        self.now = 2.5
+        self.assertEqual(len(self.buffer.pop_ready()), 2)
+
+        self.buffer.push([("log", [line(10, "x")] * 7)])
+        self.assertEqual(len(self.buffer), 5)
+        self.assertEqual(len(self.buffer.pop_ready()), 2)
+        self.assertEqual(len(self.buffer), 5)
+
+    def test_safe_positions(self):
+        """
+        Test if the positions of a batch are only returned once all its lines were released
+        """
+        self.buffer.push([("log", [line(1, "a")])], {"log": 1})
+        self.buffer.push([("chat", [line(5, "b")])], {"log": 1, "chat": 1})
+        self.assertIsNone(self.buffer.safe_positions())
+        self.buffer.pop_ready()
+        self.assertEqual(self.buffer.safe_positions(), {"log": 1})
+        self.assertIsNone(self.buffer.safe_positions())
+        self.buffer.drain()
+        self.assertEqual(self.buffer.safe_positions(), {"log": 1, "chat": 1})
+
+    def test_positions_of_forced_out_round(self):
+        """
+        Test if a round larger than the buffer only returns its positions once its last line
+        was released
+        """
+        self.buffer.push([("log", [line(10, "x")] * 7)], {"log": 7})
+        self.assertEqual(len(self.buffer.pop_ready()), 2)
+        self.assertIsNone(self.buffer.safe_positions())
+        self.assertEqual(len(self.buffer.drain()), 5)
+        self.assertEqual(self.buffer.safe_positions(), {"log": 7})
+
+
+class TestFollowMerged(unittest.TestCase):
+    """
+    Class to hold all tests from following several files merged by timestamp
+    """
+
+    def test_follow_files_in_order(self):
+        """
+        Test if the events of the followed files are written in timestamp order
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [
+                os.path.join(directory, name)
+                for name in ("world2.formatlog", "world2.log")
+            ]
+            with open(paths[0], "w", encoding="utf-8") as file:
+                file.write(
+                    "2024-10-06 20:42:09 pwtestes.com glinkd-1: notice : "
+                    "formatlog:rolelogout:userid=1072:roleid=1041:localsid=147:time=3481\n"
+                )
+            with open(paths[1], "w", encoding="utf-8") as file:
+                file.write(
+                    f"{line(5, '用户1041拣起金钱9')}\n{line(8, '用户1041得到金钱26')}\n"
+                )
+
+            handler = LogHandler(sink=ListSink())
+            tailer = Tailer([TrackedFile(path, from_start=True) for path in paths])
+            checkpoint = Checkpoint(os.path.join(directory, "checkpoint.json"))
+            handler.follow_files(
+                tailer, checkpoint, follow=False, reorder=ReorderBuffer()
+            )
+            handler.close()
+            tailer.close()
+
+            names = [type(record).__name__ for record in handler.sink.records]
+            self.assertEqual(names, ["PickUpMoney", "ReceiveMoney", "Logout"])
+            self.assertEqual(
+                checkpoint.get(paths[1])["offset"], os.path.getsize(paths[1])
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""This script is run to test the metrics of the log handler"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from log_listener import LogHandler
+from metrics import HandlerMetrics, StatsWriter, histogram_summary
+from sinks import MemorySink
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Class to hold all tests from the handler metrics
+    """
+
+    def setUp(self):
+        self.handler = LogHandler(sink=MemorySink())
+        self.login = "2024-10-06 20:42:05 pwtestes.com glinkd-1: notice : formatlog:rolelogin:userid=1072:roleid=1041:lineid=1:localsid=147"
+
+    def tearDown(self):
+        self.handler.close()
+
+    def test_counters(self):
+        """
+        Test if hits, non-matches, misses and malformed lines are counted
+        """
+        self.handler.process_log_line(self.login)
+        self.handler.process_log_line(self.login)
+        self.handler.process_log_line(self.login.replace("userid=1072", "userid=x"))
+        self.handler.process_log_line(
+            "2024-10-06 20:42:05 pwtestes.com gamed: info : 用户1024进入副本"
+        )
+        self.handler.process_log_line("not a log line")
+
+        snapshot = self.handler.metrics.snapshot()
+        login = snapshot["patterns"]["formatlog:rolelogin"]
+        self.assertEqual(login["handler"], "process_login")
+        self.assertEqual(
+            (login["hits"], login["non_matches"], login["errors"]), (2, 1, 0)
+        )
+        self.assertEqual(sum(login["latency_us"]["buckets"].values()), 3)
+        self.assertEqual((snapshot["misses"], snapshot["malformed"]), (1, 1))
+        self.assertEqual(snapshot["lines"], 5)
+        self.assertAlmostEqual(snapshot["miss_rate"], 0.2)
+        self.assertGreater(snapshot["lag_seconds"]["max"], 0)
+
+    def test_histogram_summary(self):
+        """
+        Test if the percentiles are the upper bounds of their power of two buckets
+        """
+        histogram = [0] * 8
+        histogram[3] = 98
+        histogram[6] = 2
+        summary = histogram_summary(histogram, 1)
+        self.assertEqual(summary["buckets"], {"<8": 98, "<64": 2})
+        self.assertEqual((summary["p50"], summary["p99"]), (8, 64))
+
+    def test_stats_writer(self):
+        """
+        Test if the stats file is written when the writer is closed
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "logs", "stats.json")
+            metrics = HandlerMetrics({"formatlog:rolelogin": "process_login"})
+            metrics.misses = 3
+            writer = StatsWriter(metrics, path, interval=60)
+            writer.start()
+            writer.close()
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(json.load(file)["misses"], 3)
+            self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
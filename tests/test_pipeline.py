@@ -0,0 +1,222 @@
+"""This script is run to test the asyncio pipeline of --follow"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from backfill import init_worker
+from benchmarks.generator import generate_lines
+from log_listener import LogHandler
+from merge import ReorderBuffer
+from pipeline import Pipeline
+from reader import Checkpoint, Tailer, TrackedFile
+from sinks import MemorySink
+from tests import ListSink, chat_lines
+from trades import TradeCorrelator
+
+
+class GatedSink(ListSink):
+    """
+    Sink keeping the written events in a list, each write waiting for the gate to be open
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _write_records(self, records):
+        self.gate.wait()
+        super()._write_records(records)
+
+
+class RoundTailer:
+    """
+    Tailer returning a round of lines per read, then nothing
+    """
+
+    def __init__(self, rounds):
+        self.files = []
+        self.rounds = list(rounds)
+
+    def read_batches(self):
+        return [("world2.log", self.rounds.pop(0))] if self.rounds else []
+
+    def wait(self):
+        pass
+
+
+def line(second, text):
+    """
+    Returns a log line written at the given second of 2024-10-06 20:42
+    """
+    return f"2024-10-06 20:42:{second:02d} pwtestes.com gamed: info : {text}"
+
+
+class TestPipeline(unittest.TestCase):
+    """
+    Class to hold all tests from the pipeline
+    """
+
+    def setUp(self):
+        self.sink = GatedSink()
+        self.handler = LogHandler(sink=MemorySink())
+
+    def test_follow_files(self):
+        """
+        Test if the pipeline writes the events of LogHandler.follow_files, and saves the
+        positions after them
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [
+                os.path.join(directory, name)
+                for name in ("world2.formatlog", "world2.log")
+            ]
+            with open(paths[0], "w", encoding="utf-8") as file:
+                file.write(
+                    "2024-10-06 20:42:09 pwtestes.com glinkd-1: notice : "
+                    "formatlog:rolelogout:userid=1072:roleid=1041:localsid=147:time=3481\n"
+                )
+            with open(paths[1], "w", encoding="utf-8") as file:
+                file.write(
+                    f"{line(5, '用户1041拣起金钱9')}\n{line(8, '用户1041得到金钱26')}\n"
+                )
+
+            tailer = Tailer([TrackedFile(path, from_start=True) for path in paths])
+            checkpoint = Checkpoint(os.path.join(directory, "checkpoint.json"))
+            pipeline = Pipeline(
+                self.handler, self.sink, tailer, checkpoint, ReorderBuffer()
+            )
+            asyncio.run(pipeline.run(follow=False))
+            tailer.close()
+
+            names = [type(record).__name__ for record in self.sink.records]
+            self.assertEqual(names, ["PickUpMoney", "ReceiveMoney", "Logout"])
+            for path in paths:
+                self.assertEqual(checkpoint.get(path)["offset"], os.path.getsize(path))
+
+    def test_backpressure(self):
+        """
+        Test if a stalled sink fills the queues up to their number of lines and holds up the
+        reading, without losing or reordering events
+        """
+        rounds = [
+            [
+                line(second, f"用户1041拣起金钱{second}"),
+                line(second, f"用户1041拣起金钱{second + 1}"),
+            ]
+            for second in range(0, 60, 2)
+        ]
+        pipeline = Pipeline(self.handler, self.sink, RoundTailer(rounds), queue_lines=5)
+        self.sink.gate.clear()
+
+        async def run():
+            task = asyncio.create_task(pipeline.run(follow=False))
+            while pipeline.lines.full_waits == 0:
+                await asyncio.sleep(0.01)
+            self.assertEqual(pipeline.summary()["lines"]["depth"], 2)
+            self.assertEqual(pipeline.summary()["records"]["depth"], 2)
+            self.sink.gate.set()
+            await task
+
+        asyncio.run(run())
+        self.assertEqual(
+            [record.money for record in self.sink.records], list(range(60))
+        )
+        summary = pipeline.summary()
+        self.assertEqual(summary["lines"]["items"], 30)
+        self.assertLessEqual(summary["lines"]["max_size"], 5)
+        self.assertLessEqual(summary["records"]["max_size"], 5)
+
+    def test_drain_on_stop(self):
+        """
+        Test if stopping the pipeline writes every line already read, including those held by
+        the reorder buffer
+        """
+        rounds = [[line(1, "用户1041拣起金钱1")], [line(2, "用户1041拣起金钱2")]]
+        pipeline = Pipeline(
+            self.handler,
+            self.sink,
+            RoundTailer(rounds),
+            reorder=ReorderBuffer(window=60),
+        )
+
+        async def run():
+            task = asyncio.create_task(pipeline.run(follow=True))
+            while pipeline.tailer.rounds:
+                await asyncio.sleep(0.01)
+            self.assertEqual(self.sink.records, [])
+            pipeline.stop()
+            await task
+
+        asyncio.run(run())
+        self.assertEqual([record.money for record in self.sink.records], [1, 2])
+
+    def test_parse_workers(self):
+        """
+        Test if the events parsed by a pool of processes are written in the order of their
+        lines, and the observers see them in that order
+        """
+        lines = [line for _, line in generate_lines(3000, unmatched_ratio=0.1, seed=5)]
+        rounds = [lines[start : start + 700] for start in range(0, len(lines), 700)]
+
+        expected = LogHandler(sink=ListSink(), observers=[TradeCorrelator()])
+        expected.process_stream(lines)
+        expected.close()
+
+        handler = LogHandler(sink=MemorySink(), observers=[TradeCorrelator()])
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            2, mp_context=context, initializer=init_worker, initargs=("utf-8",)
+        ) as pool:
+            pipeline = Pipeline(
+                handler,
+                self.sink,
+                RoundTailer(rounds),
+                pool=pool,
+                workers=2,
+                chunk_lines=100,
+            )
+            asyncio.run(pipeline.run(follow=False))
+        handler.close()
+        self.assertEqual(self.sink.records, expected.sink.records)
+        self.assertEqual(pipeline.summary()["parsing"]["items"], 30)
+        self.assertLessEqual(pipeline.summary()["parsing"]["max_size"], 4)
+        self.assertLessEqual(pipeline.summary()["parsing"]["max_in_flight"], 4)
+
+    def test_parse_workers_chat(self):
+        """
+        Test if a pool of processes decodes the chat messages, GBK and UTF-16LE, as the
+        handler does
+        """
+        lines = chat_lines(2000)
+        rounds = [lines[start : start + 500] for start in range(0, len(lines), 500)]
+
+        expected = LogHandler(sink=ListSink())
+        expected.process_stream(lines)
+        expected.close()
+
+        handler = LogHandler(sink=MemorySink())
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            2, mp_context=context, initializer=init_worker, initargs=("utf-8",)
+        ) as pool:
+            pipeline = Pipeline(
+                handler,
+                self.sink,
+                RoundTailer(rounds),
+                pool=pool,
+                workers=2,
+                chunk_lines=100,
+            )
+            asyncio.run(pipeline.run(follow=False))
+        handler.close()
+        self.assertEqual(self.sink.records, expected.sink.records)
+
+
+if __name__ == "__main__":
+    unittest.main()
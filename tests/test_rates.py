@@ -0,0 +1,89 @@
+"""This script is run to test the sliding window rate detector"""
+
+import unittest
+
+from events import Mine, ReceiveMoney
+from rates import RateAlert, RateDetector, RateWindow
+
+RULES = {
+    "process_mine": {
+        "key": ("roleid", "itemid"),
+        "value": "count",
+        "window": 60,
+        "bucket": 10,
+        "threshold": 10,
+        "item_thresholds": {1837: 5},
+    },
+    "process_receive_money": {
+        "key": ("roleid",),
+        "value": "money",
+        "window": 60,
+        "bucket": 10,
+        "threshold": 1000,
+    },
+}
+
+
+class TestRateDetector(unittest.TestCase):
+    """
+    Class to hold all tests from the rate detector
+    """
+
+    def setUp(self):
+        self.detector = RateDetector(RULES, max_keys=3)
+        self.handlers = self.detector.handlers()
+
+    def feed(self, record):
+        """
+        Passes a record to the detector, returning its alert
+        """
+        return self.handlers[record.__class__](record)
+
+    def test_window_slides(self):
+        """
+        Test if values older than the window leave the total
+        """
+        window = RateWindow(6)
+        self.assertEqual(window.add(100, 3), 3)
+        self.assertEqual(window.add(103, 2), 5)
+        self.assertEqual(window.add(106, 1), 3)
+        self.assertEqual(window.add(104, 1), 4)
+        self.assertEqual(window.add(99, 50), 4)
+        self.assertEqual(window.add(200, 1), 1)
+
+    def test_alert_once_per_burst(self):
+        """
+        Test if a key alerts when it reaches the threshold, and again only after it fell below
+        """
+        self.assertIsNone(self.feed(Mine(1000, 1, 6, 410)))
+        alert = self.feed(Mine(1010, 1, 4, 410))
+        self.assertEqual(alert, RateAlert(1010, "process_mine", 1, 410, 10, 60, 10))
+        self.assertIsNone(self.feed(Mine(1020, 1, 4, 410)))
+        self.assertIsNone(self.feed(Mine(1080, 1, 1, 410)))
+        self.assertIsNotNone(self.feed(Mine(1090, 1, 9, 410)))
+        self.assertEqual(self.detector.alerts, 2)
+
+    def test_item_thresholds_and_keys(self):
+        """
+        Test if item thresholds replace the rule threshold and keys are counted apart
+        """
+        self.assertIsNotNone(self.feed(Mine(1000, 1, 5, 1837)))
+        self.assertIsNone(self.feed(Mine(1000, 2, 5, 410)))
+        alert = self.feed(ReceiveMoney(1000, 2, 1000))
+        self.assertEqual(
+            (alert.event, alert.roleid, alert.itemid), ("process_receive_money", 2, 0)
+        )
+
+    def test_bounded_keys(self):
+        """
+        Test if idle keys are evicted and the number of keys is bounded
+        """
+        for roleid in range(5):
+            self.feed(Mine(1000, roleid, 1, 410))
+        self.assertEqual(self.detector.summary()["keys"]["process_mine"], 3)
+        self.feed(Mine(2000, 9, 1, 410))
+        self.assertEqual(self.detector.summary()["keys"]["process_mine"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+"""This script is run to test the checkpointed reader of the log files"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import reader
+from reader import Checkpoint, Tailer, TrackedFile
+
+
+class TestTrackedFile(unittest.TestCase):
+    """
+    Class to hold all tests from the rotation aware log reader and its checkpoint
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "world2.log")
+        self.checkpoint_path = os.path.join(self.directory.name, "checkpoint.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def append(self, text, path=None):
+        """
+        Appends text to a log file
+        """
+        with open(path or self.path, "a", encoding="utf-8") as file:
+            file.write(text)
+
+    def restart(self, tracked):
+        """
+        Saves the position of a file, closes it and opens it again from the checkpoint
+        """
+        Checkpoint(self.checkpoint_path).save([tracked])
+        tracked.close()
+        return TrackedFile(self.path, Checkpoint(self.checkpoint_path).get(self.path))
+
+    def test_resume_from_checkpoint(self):
+        """
+        Test if a reopened file resumes after the last line read, and skips history when new
+        """
+        self.append("old\n")
+        self.assertEqual(TrackedFile(self.path).read_lines(), [])
+
+        tracked = TrackedFile(self.path, from_start=True)
+        self.assertEqual(tracked.read_lines(), ["old"])
+        self.append("first\n")
+        tracked = self.restart(tracked)
+        self.append("second\n")
+        self.assertEqual(tracked.read_lines(), ["first", "second"])
+        tracked.close()
+
+    def test_partial_line(self):
+        """
+        Test if a partially written line is only read once it's complete
+        """
+        tracked = TrackedFile(self.path, from_start=True)
+        self.append("complete\npart")
+        self.assertEqual(tracked.read_lines(), ["complete"])
+        tracked = self.restart(tracked)
+        self.append("ial\n")
+        self.assertEqual(tracked.read_lines(), ["partial"])
+        tracked.close()
+
+    def test_block_boundaries(self):
+        """
+        Test if lines longer than a block and characters split between blocks are read whole
+        """
+        tracked = TrackedFile(self.path, from_start=True)
+        self.append("得到金钱 long line\nshort\n拣起\n")
+        with mock.patch.object(reader, "READ_SIZE", 4):
+            self.assertEqual(
+                tracked.read_lines(), ["得到金钱 long line", "short", "拣起"]
+            )
+        self.assertEqual(tracked.position_state()["offset"], os.path.getsize(self.path))
+        tracked.close()
+
+    def test_read_budget(self):
+        """
+        Test if a backlog is read a part at a time, including the rest of a renamed file
+        """
+        tracked = TrackedFile(self.path, from_start=True)
+        self.append("line 1\nline 2\nline 3\n")
+        with mock.patch.object(reader, "READ_SIZE", 7), mock.patch.object(
+            reader, "MAX_READ_SIZE", 14
+        ):
+            self.assertEqual(tracked.read_lines(), ["line 1", "line 2"])
+            self.assertEqual(tracked.position_state()["offset"], 14)
+            os.rename(self.path, f"{self.path}.1")
+            self.append("line 4\n")
+            self.assertEqual(tracked.read_lines(), ["line 3", "line 4"])
+            self.assertEqual(tracked.read_lines(), [])
+        tracked.close()
+
+    def test_gbk_encoding(self):
+        """
+        Test if a file written in GBK is decoded with its encoding, split between blocks
+        """
+        with open(self.path, "wb") as file:
+            file.write("用户1028采集得到2个1837\n用户1088得到金钱26\n".encode("gbk"))
+        tracked = TrackedFile(self.path, from_start=True, encoding="gbk")
+        with mock.patch.object(reader, "READ_SIZE", 5):
+            self.assertEqual(
+                tracked.read_lines(), ["用户1028采集得到2个1837", "用户1088得到金钱26"]
+            )
+        tracked.close()
+
+    def test_rename_rotation_while_down(self):
+        """
+        Test if the rest of a file renamed while the listener was down is read before the new file
+        """
+        self.append("first\n")
+        tracked = TrackedFile(self.path, from_start=True)
+        tracked.read_lines()
+        Checkpoint(self.checkpoint_path).save([tracked])
+        tracked.close()
+
+        self.append("second\n")
+        os.rename(self.path, f"{self.path}.1")
+        self.append("third\n")
+        tracked = TrackedFile(
+            self.path, Checkpoint(self.checkpoint_path).get(self.path)
+        )
+        self.assertEqual(tracked.read_lines(), ["second", "third"])
+        tracked.close()
+
+    def test_rename_rotation_while_following(self):
+        """
+        Test if a file renamed while being read is drained before the new file is read
+        """
+        tracked = TrackedFile(self.path, from_start=True)
+        self.append("first\n")
+        self.assertEqual(tracked.read_lines(), ["first"])
+        self.append("second\n")
+        os.rename(self.path, f"{self.path}.1")
+        self.append("third\n")
+        self.assertEqual(tracked.read_lines(), ["second", "third"])
+        self.assertEqual(tracked.position_state()["offset"], len("third\n"))
+        tracked.close()
+
+    def test_copy_truncate_rotation(self):
+        """
+        Test if a copied and truncated file is detected, reading the rest of the copy
+        """
+        self.append("first line\n")
+        tracked = TrackedFile(self.path, from_start=True)
+        tracked.read_lines()
+        Checkpoint(self.checkpoint_path).save([tracked])
+        tracked.close()
+
+        self.append("second line\n")
+        with open(self.path, "rb") as file:
+            content = file.read()
+        with open(f"{self.path}.1", "wb") as file:
+            file.write(content)
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("new\n")
+
+        tracked = TrackedFile(
+            self.path, Checkpoint(self.checkpoint_path).get(self.path)
+        )
+        self.assertEqual(tracked.read_lines(), ["second line", "new"])
+        tracked.close()
+
+    def test_checkpoint_save(self):
+        """
+        Test if the checkpoint is replaced atomically and keeps files that aren't open
+        """
+        self.append("line\n")
+        tracked = TrackedFile(self.path, from_start=True)
+        tracked.read_lines()
+        missing = TrackedFile(os.path.join(self.directory.name, "world2.chat"))
+        checkpoint = Checkpoint(self.checkpoint_path)
+        checkpoint.save([tracked, missing])
+        tracked.close()
+
+        position = Checkpoint(self.checkpoint_path).get(self.path)
+        self.assertEqual(position["offset"], len("line\n"))
+        self.assertEqual(position["inode"], os.stat(self.path).st_ino)
+        self.assertIsNone(Checkpoint(self.checkpoint_path).get(missing.path))
+        self.assertFalse(os.path.exists(f"{self.checkpoint_path}.tmp"))
+
+
+class TestTailer(unittest.TestCase):
+    """
+    Class to hold all tests from the multi file tailer
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = [
+            os.path.join(self.directory.name, name)
+            for name in ("world2.chat", "world2.log")
+        ]
+        self.tailer = Tailer(
+            [TrackedFile(path, from_start=True) for path in self.paths]
+        )
+
+    def tearDown(self):
+        self.tailer.close()
+        self.directory.cleanup()
+
+    def test_batches_by_source(self):
+        """
+        Test if the new lines are returned tagged with the file they were read from
+        """
+        for path in self.paths:
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(f"{os.path.basename(path)} 1\n{os.path.basename(path)} 2\n")
+        self.assertEqual(
+            self.tailer.read_batches(),
+            [
+                (self.paths[0], ["world2.chat 1", "world2.chat 2"]),
+                (self.paths[1], ["world2.log 1", "world2.log 2"]),
+            ],
+        )
+        self.assertEqual(self.tailer.read_batches(), [])
+
+    def test_wait_wakes_up_on_write(self):
+        """
+        Test if waiting returns as soon as a followed file is written
+        """
+        if self.tailer.watcher.descriptor is None:
+            self.skipTest("inotify isn't available")
+
+        def write():
+            time.sleep(0.05)
+            with open(self.paths[1], "a", encoding="utf-8") as file:
+                file.write("line\n")
+
+        self.tailer.poll_interval = 5
+        writer = threading.Thread(target=write)
+        writer.start()
+        started = time.monotonic()
+        self.tailer.wait()
+        writer.join()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(self.tailer.read_batches(), [(self.paths[1], ["line"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
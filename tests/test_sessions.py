@@ -0,0 +1,132 @@
+"""This script is run to test the tracker of the roles online"""
+
+import unittest
+
+from log_header import to_epoch
+from log_listener import LogHandler
+from sessions import RoleSession, SessionTracker
+from tests import ListSink
+
+
+def login_line(timestamp, userid, roleid):
+    """
+    Returns a rolelogin line
+    """
+    return (
+        f"{timestamp} pwtestes.com glinkd-1: notice : formatlog:rolelogin:"
+        f"userid={userid}:roleid={roleid}:lineid=1:localsid=147"
+    )
+
+
+def logout_line(timestamp, userid, roleid, duration):
+    """
+    Returns a rolelogout line
+    """
+    return (
+        f"{timestamp} pwtestes.com glinkd-1: notice : formatlog:rolelogout:"
+        f"userid={userid}:roleid={roleid}:localsid=147:time={duration}"
+    )
+
+
+class TestSessionTracker(unittest.TestCase):
+    """
+    Class to hold all tests from the session tracker
+    """
+
+    def setUp(self):
+        self.sink = ListSink()
+        self.tracker = SessionTracker()
+        self.handler = LogHandler(sink=self.sink, observers=[self.tracker])
+
+    def tearDown(self):
+        self.handler.close()
+
+    def sessions(self):
+        """
+        Returns the sessions written to the sink
+        """
+        return [
+            record for record in self.sink.records if isinstance(record, RoleSession)
+        ]
+
+    def test_online_indexes(self):
+        """
+        Test if the online roles are indexed by role and by user
+        """
+        self.handler.process_log_line(login_line("2024-10-06 20:42:05", 1072, 1041))
+        self.handler.process_log_line(login_line("2024-10-06 20:43:00", 1072, 1042))
+        self.handler.process_log_line(login_line("2024-10-06 20:44:00", 2000, 2001))
+        self.assertTrue(self.tracker.is_online(1041))
+        self.assertEqual(self.tracker.online_count(), 3)
+        self.assertEqual(set(self.tracker.online_roles()), {1041, 1042, 2001})
+        self.assertEqual(self.tracker.online_roles(1072), {1041, 1042})
+
+        self.handler.process_log_line(
+            logout_line("2024-10-06 21:40:07", 1072, 1041, 3481)
+        )
+        self.assertFalse(self.tracker.is_online(1041))
+        self.assertEqual(self.tracker.online_roles(1072), {1042})
+        self.assertEqual(self.tracker.summary()["online_count"], 2)
+
+    def test_session_pairing(self):
+        """
+        Test if a logout is paired with its login, and the logged duration cross-checked
+        """
+        self.handler.process_log_line(login_line("2024-10-06 20:42:05", 1072, 1041))
+        self.handler.process_log_line(
+            logout_line("2024-10-06 21:40:07", 1072, 1041, 3481)
+        )
+        session = RoleSession(
+            to_epoch("2024-10-06 21:40:07"),
+            1072,
+            1041,
+            to_epoch("2024-10-06 20:42:05"),
+            3482,
+            3481,
+        )
+        self.assertEqual(self.sessions(), [session])
+        self.assertEqual(self.tracker.sessions_today(1041), [session])
+        self.assertEqual(self.tracker.mismatches, 0)
+
+        self.handler.process_log_line(login_line("2024-10-06 22:00:00", 1072, 1041))
+        self.handler.process_log_line(
+            logout_line("2024-10-06 22:10:00", 1072, 1041, 60)
+        )
+        self.assertEqual(self.tracker.mismatches, 1)
+        self.assertEqual(len(self.tracker.sessions_today(1041)), 2)
+
+    def test_unpaired_lines(self):
+        """
+        Test if a logout without login uses the logged duration, and a repeated login closes
+        the previous session
+        """
+        self.handler.process_log_line(
+            logout_line("2024-10-06 21:40:07", 1072, 1041, 3481)
+        )
+        self.assertEqual(
+            self.sessions()[0].login, to_epoch("2024-10-06 21:40:07") - 3481
+        )
+        self.handler.process_log_line(login_line("2024-10-06 22:00:00", 1072, 1041))
+        self.handler.process_log_line(login_line("2024-10-06 22:30:00", 1072, 1041))
+        self.assertEqual(self.sessions()[1].logged_duration, -1)
+        self.assertEqual(self.sessions()[1].duration, 1800)
+        self.assertEqual(self.tracker.online_count(), 1)
+
+    def test_sessions_today(self):
+        """
+        Test if the sessions of the previous day are dropped when the day changes
+        """
+        self.handler.process_log_line(login_line("2024-10-06 23:00:00", 1072, 1041))
+        self.handler.process_log_line(
+            logout_line("2024-10-06 23:30:00", 1072, 1041, 1800)
+        )
+        self.handler.process_log_line(login_line("2024-10-07 00:10:00", 1072, 1042))
+        self.handler.process_log_line(
+            logout_line("2024-10-07 00:20:00", 1072, 1042, 600)
+        )
+        self.assertEqual(self.tracker.sessions_today(1041), [])
+        self.assertEqual(len(self.tracker.sessions_today(1042)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""This script is run to test the sinks where the events are written"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from collections import namedtuple
+from datetime import date, timedelta
+
+from chat import ChatMessage
+from events import EVENT_SPECS, parse_event
+from log_header import parse_header
+from sinks import BufferedSink, FileSink, SQLiteSink
+from templates import GmAction
+
+
+class FailingSink(BufferedSink):
+    """
+    Sink whose writes fail the first time, to test the recovery of the buffer
+    """
+
+    def __init__(self):
+        super().__init__(max_records=2, flush_interval=0)
+        self.written = []
+
+    def _write_records(self, records):
+        if not self.written:
+            self.written.append(None)
+            raise OSError("disk full")
+        self.written.extend(records)
+
+
+class TestBufferedSink(unittest.TestCase):
+    """
+    Class to hold all tests from the base buffered sink
+    """
+
+    def test_failed_batch_dropped(self):
+        """
+        Test if a batch that fails to be written is reported and dropped, not kept in the buffer
+        """
+        sink = FailingSink()
+        with contextlib.redirect_stderr(io.StringIO()) as errors:
+            sink.write(1)
+            sink.write(2)
+        self.assertIn("Failed to write 2 events to FailingSink", errors.getvalue())
+        self.assertIn("disk full", errors.getvalue())
+        self.assertEqual(sink.buffer, [])
+        sink.write(3)
+        sink.write(4)
+        self.assertEqual(sink.written, [None, 3, 4])
+
+
+class TestFileSink(unittest.TestCase):
+    """
+    Class to hold all tests from the buffered file sink
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "logs", "log.log")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, file_name=None):
+        """
+        Returns the lines written to the output file
+        """
+        with open(file_name or self.file_name, encoding="utf-8") as file:
+            return file.read().splitlines()
+
+    def test_flush_by_size_and_close(self):
+        """
+        Test if events are buffered until the buffer is full, and the rest written on close
+        """
+        sink = FileSink(self.file_name, max_records=2, flush_interval=0)
+        sink.write((1, 2))
+        self.assertFalse(os.path.exists(self.file_name))
+        sink.write((3, 4))
+        sink.write((5, 6))
+        self.assertEqual(self.read(), ["(1, 2)", "(3, 4)"])
+        sink.close()
+        self.assertEqual(self.read(), ["(1, 2)", "(3, 4)", "(5, 6)"])
+
+    def test_flush_by_interval(self):
+        """
+        Test if a partially filled buffer is written by the background flush
+        """
+        sink = FileSink(self.file_name, flush_interval=0.01)
+        sink.write((1, 2))
+        deadline = time.monotonic() + 2
+        while not os.path.exists(self.file_name) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.read(), ["(1, 2)"])
+        sink.close()
+
+    def test_rotate_by_size(self):
+        """
+        Test if the file is rotated into numbered backups when it's too big
+        """
+        sink = FileSink(self.file_name, max_records=1, flush_interval=0, max_bytes=5)
+        sink.write((1, 2))
+        sink.write((3, 4))
+        sink.close()
+        self.assertEqual(self.read(f"{self.file_name}.1"), ["(3, 4)"])
+        self.assertEqual(self.read(f"{self.file_name}.2"), ["(1, 2)"])
+
+    def test_rotate_daily(self):
+        """
+        Test if the file of a previous day is renamed with its date
+        """
+        sink = FileSink(self.file_name, max_records=1, flush_interval=0, daily=True)
+        sink.write((1, 2))
+        yesterday = date.today() - timedelta(days=1)
+        sink.day = yesterday
+        sink.write((3, 4))
+        sink.close()
+        self.assertEqual(
+            self.read(f"{self.file_name}.{yesterday.isoformat()}"), ["(1, 2)"]
+        )
+        self.assertEqual(self.read(), ["(3, 4)"])
+
+
+class TestSQLiteSink(unittest.TestCase):
+    """
+    Class to hold all tests from the SQLite sink
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, "events.db")
+        self.sink = SQLiteSink(self.database, flush_interval=0)
+
+    def tearDown(self):
+        self.sink.close()
+        self.directory.cleanup()
+
+    def test_tables_from_event_types(self):
+        """
+        Test if a table with indexes on roleid and timestamp is created per event type
+        """
+        names = {
+            row[0]
+            for row in self.sink.connection.execute("SELECT name FROM sqlite_master")
+        }
+        self.assertIn("mine", names)
+        self.assertIn("trade_save", names)
+        self.assertIn("mine_roleid", names)
+        self.assertIn("mine_timestamp", names)
+        self.assertIn("trade_save_roleid_a", names)
+
+    def test_insert_batch(self):
+        """
+        Test if the buffered events are inserted in their tables on flush
+        """
+        header = parse_header(
+            "2024-09-21 08:23:02 pwtestes.com gamed: info : 用户1028采集得到2个1837"
+        )
+        record = parse_event(EVENT_SPECS["process_mine"], header)
+        self.sink.write(record)
+        self.sink.write(record)
+        self.sink.flush()
+        rows = self.sink.connection.execute("SELECT * FROM mine").fetchall()
+        self.assertEqual(rows, [tuple(record), tuple(record)])
+
+    def test_unknown_record_class(self):
+        """
+        Test if a record class that isn't an event type gets its own table
+        """
+        completed = namedtuple("CompletedThing", ["timestamp", "roleid", "name"])
+        self.sink.write(completed(1, 2, "three"))
+        self.sink.flush()
+        rows = self.sink.connection.execute("SELECT * FROM completed_thing").fetchall()
+        self.assertEqual(rows, [(1, 2, "three")])
+
+    def test_handler_records(self):
+        """
+        Test if the records built by the handler methods (GM actions, chat messages) are stored
+        """
+        self.sink.write(GmAction(1, "startActivity", 1024, (27,)))
+        self.sink.write(GmAction(2, "setRate", 1024, (1.5, "exp")))
+        self.sink.write(ChatMessage(1, "world", 1041, 0, "Hello"))
+        self.sink.flush()
+        rows = self.sink.connection.execute("SELECT * FROM gm_action").fetchall()
+        self.assertEqual(
+            rows,
+            [(1, "startActivity", 1024, "[27]"), (2, "setRate", 1024, '[1.5, "exp"]')],
+        )
+        rows = self.sink.connection.execute("SELECT * FROM chat_message").fetchall()
+        self.assertEqual(rows, [(1, "world", 1041, 0, "Hello")])
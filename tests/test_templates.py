@@ -0,0 +1,61 @@
+"""This script is run to test the compiler of the printf-style templates"""
+
+import re
+import unittest
+
+from config import REGEX_PATTERNS
+from templates import TemplateMatcher, compile_template
+
+
+class TestTemplates(unittest.TestCase):
+    """
+    Class to hold all tests from the template compiler
+    """
+
+    def test_compile_template(self):
+        """
+        Test if a template becomes an anchored regex with typed groups
+        """
+        pattern, types = compile_template(
+            "GM %d moved to player %d at position (%f, %f, %f)."
+        )
+        self.assertEqual(types, (int, int, float, float, float))
+        regex = re.compile(pattern)
+        self.assertIsNotNone(
+            regex.match("GM 1 moved to player 2 at position (1.5, -2, 3.0).")
+        )
+        self.assertIsNone(
+            regex.match("GM 1 moved to player 2 at position (1.5, 2, 3.0).!")
+        )
+        self.assertIsNone(
+            regex.match("GM 1 moved to player 2 at position (a, 2, 3.0).")
+        )
+
+        # A template ending with a comma is followed by details that aren't parsed
+        pattern, _ = compile_template(
+            "GM %d created %d monster(s) of type %d and ID %d,"
+        )
+        self.assertIsNotNone(
+            re.match(pattern, "GM 1 created 2 monster(s) of type 3 and ID 4, x")
+        )
+
+    def test_matcher(self):
+        """
+        Test if every template of REGEX_PATTERNS is found by the combined matcher
+        """
+        matcher = TemplateMatcher(REGEX_PATTERNS)
+        for name, template in REGEX_PATTERNS.items():
+            text = template.replace("%d", "17").replace("%f", "2.5")
+            found = matcher.match(text)
+            self.assertIsNotNone(found, text)
+            self.assertEqual(found[0], name)
+            self.assertEqual(len(found[1]), template.count("%"))
+        self.assertEqual(
+            matcher.match("GM 5 toggled invisibility state. Current state : 1."),
+            ("toggleInvisibility", (5, 1)),
+        )
+        self.assertIsNone(matcher.match("GM 5 did something else."))
+
+
+if __name__ == "__main__":
+    unittest.main()
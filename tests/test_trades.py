@@ -0,0 +1,141 @@
+"""This script is run to test the correlation of the trade lines into completed trades"""
+
+import unittest
+
+from log_header import to_epoch
+from log_listener import LogHandler
+from tests import ListSink
+from trades import TradeCompleted, TradeCorrelator
+
+
+def trade_line(time, payload):
+    """
+    Returns a gdeliveryd trade line
+    """
+    return f"2024-10-06 {time} pwtestes.com gdeliveryd: notice : formatlog:trade_debug:{payload}"
+
+
+class TestTradeCorrelator(unittest.TestCase):
+    """
+    Class to hold all tests from the trade correlator
+    """
+
+    def setUp(self):
+        self.sink = ListSink()
+        self.correlator = TradeCorrelator(ttl=600)
+        self.handler = LogHandler(sink=self.sink, observers=[self.correlator])
+
+    def tearDown(self):
+        self.handler.close()
+
+    def process(self, *lines):
+        """
+        Processes trade lines, returning the completed trades written to the sink
+        """
+        for line in lines:
+            self.handler.process_log_line(line)
+        return [
+            record for record in self.sink.records if isinstance(record, TradeCompleted)
+        ]
+
+    def test_completed_trade(self):
+        """
+        Test if a saved trade has the net items and money given by each side
+        """
+        completed = self.process(
+            trade_line(
+                "20:00:00",
+                "tradeaddgoods: roleid=1088,goods is (id=8103,pos=15,count=3),money=0,tid=7",
+            ),
+            trade_line(
+                "20:00:01",
+                "tradeaddgoods: roleid=1024,goods is (id=5029,pos=25,count=1),money=500,tid=7",
+            ),
+            trade_line(
+                "20:00:02",
+                "traderemovegoods: roleid=1088,item (id=8103,pos=15,count=1),money=0,tid=7",
+            ),
+            trade_line(
+                "20:00:03",
+                "tradeaddgoods: roleid=1088,goods is (id=410,pos=2,count=1),money=0,tid=7",
+            ),
+            trade_line(
+                "20:00:03",
+                "traderemovegoods: roleid=1088,item (id=410,pos=2,count=1),money=0,tid=7",
+            ),
+            trade_line(
+                "20:00:04", "tradesubmit,rid=1088,A:1024,B:1088,retcode=76,tid=7"
+            ),
+            trade_line("20:00:05", "TradeSave:Trade done. tid=7,(Trader:1024,1088)"),
+        )
+        self.assertEqual(
+            completed,
+            [
+                TradeCompleted(
+                    to_epoch("2024-10-06 20:00:05"),
+                    7,
+                    1024,
+                    1088,
+                    "5029:1",
+                    500,
+                    "8103:2",
+                    0,
+                )
+            ],
+        )
+        self.assertEqual(len(self.correlator.sides), 0)
+
+    def test_reused_trade_id(self):
+        """
+        Test if two trades with the same trade ID are kept apart by their roles
+        """
+        completed = self.process(
+            trade_line(
+                "20:00:00",
+                "tradeaddgoods: roleid=1,goods is (id=10,pos=0,count=1),money=0,tid=3",
+            ),
+            trade_line(
+                "20:00:00",
+                "tradeaddgoods: roleid=5,goods is (id=50,pos=0,count=1),money=0,tid=3",
+            ),
+            trade_line("20:00:01", "TradeSave:Trade done. tid=3,(Trader:5,6)"),
+            trade_line("20:00:02", "TradeSave:Trade done. tid=3,(Trader:1,2)"),
+        )
+        self.assertEqual(
+            [(trade.roleid_a, trade.items_a) for trade in completed],
+            [(5, "50:1"), (1, "10:1")],
+        )
+
+    def test_ttl_eviction(self):
+        """
+        Test if abandoned trades are evicted after the ttl, and the number of sides is bounded
+        """
+        self.process(
+            trade_line(
+                "20:00:00",
+                "tradeaddgoods: roleid=1,goods is (id=10,pos=0,count=1),money=0,tid=1",
+            ),
+            trade_line(
+                "20:05:00",
+                "tradeaddgoods: roleid=2,goods is (id=10,pos=0,count=1),money=0,tid=2",
+            ),
+        )
+        self.assertEqual(len(self.correlator.sides), 2)
+        self.process(
+            trade_line(
+                "20:10:01",
+                "tradeaddgoods: roleid=3,goods is (id=10,pos=0,count=1),money=0,tid=3",
+            ),
+        )
+        self.assertEqual(list(self.correlator.sides), [(2, 2), (3, 3)])
+        self.assertEqual(self.correlator.evicted, 1)
+
+        self.correlator.max_sides = 1
+        self.process(
+            trade_line("20:10:02", "tradesubmit,rid=4,A:4,B:5,retcode=0,tid=4")
+        )
+        self.assertEqual(list(self.correlator.sides), [(4, 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""This module contains the correlator that joins the trade lines into completed trades"""
+
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional
+
+from events import TradeAddItens, TradeRemoveItens, TradeSave, TradeSubmit
+
+
+class TradeCompleted(NamedTuple):
+    """
+    Trade closed by a TradeSave line. items_a and items_b are what each side gave, as
+    "itemid:count" joined by ";", the other side received them. money_a and money_b are the
+    money each side gave.
+    """
+
+    timestamp: int
+    tid: int
+    roleid_a: int
+    roleid_b: int
+    items_a: str
+    money_a: int
+    items_b: str
+    money_b: int
+
+
+class TradeSide:
+    """
+    This class holds what one role has put into a trade so far.
+    """
+
+    __slots__ = ("items", "money", "updated")
+
+    def __init__(self) -> None:
+        self.items: dict[int, int] = {}
+        self.money = 0
+        self.updated = 0
+
+    def add(self, itemid: int, count: int, money: int) -> None:
+        """
+        This function adds (or with negative values removes) items and money from the trade.
+
+        Arguments:
+            itemid -- Item ID
+            count -- Number of units
+            money -- Money
+        """
+        total = self.items.get(itemid, 0) + count
+        if total > 0:
+            self.items[itemid] = total
+        else:
+            self.items.pop(itemid, None)
+        self.money = max(self.money + money, 0)
+
+    def items_text(self) -> str:
+        """
+        Returns the items of this side as "itemid:count" joined by ";", ordered by item ID.
+        """
+        return ";".join(
+            f"{itemid}:{count}" for itemid, count in sorted(self.items.items())
+        )
+
+
+class TradeCorrelator:
+    """
+    This class joins the trade lines of the same trade and emits a TradeCompleted record when
+    the trade is saved, with the net items and money given by each side.
+
+    The trade lines only share the trade ID, and the add/remove lines only have the role that
+    changed its side, so the open trades are kept as one TradeSide per (tid, roleid). The
+    TradeSave line names both roles, which finds the two sides even if the trade ID is being
+    reused by another trade at the same time.
+
+    Sides that aren't updated for ttl seconds (of log time) are abandoned trades and evicted,
+    as well as the oldest sides once there are max_sides of them, so memory stays bounded.
+
+    Arguments:
+        ttl -- Seconds after which a trade that isn't updated is dropped
+        max_sides -- Maximum number of open trade sides
+    """
+
+    def __init__(self, ttl: int = 600, max_sides: int = 100_000) -> None:
+        self.ttl = ttl
+        self.max_sides = max_sides
+        self.sides: OrderedDict[tuple[int, int], TradeSide] = OrderedDict()
+        self.evicted = 0
+
+    def handlers(self) -> dict[type, Callable[[Any], Optional[NamedTuple]]]:
+        """
+        Returns the function called with each record class this correlator follows.
+        """
+        return {
+            TradeAddItens: self.add_items,
+            TradeRemoveItens: self.remove_items,
+            TradeSubmit: self.submit,
+            TradeSave: self.save,
+        }
+
+    def summary(self) -> dict:
+        """
+        Returns the number of open and evicted trade sides, for the stats file.
+        """
+        return {"open_sides": len(self.sides), "evicted": self.evicted}
+
+    def add_items(self, record: TradeAddItens) -> None:
+        """
+        This function adds the items and money of a tradeaddgoods line to its side.
+
+        Arguments:
+            record -- TradeAddItens record
+        """
+        side = self._side(record.tid, record.roleid, record.timestamp)
+        side.add(record.itemid, record.count, record.money)
+
+    def remove_items(self, record: TradeRemoveItens) -> None:
+        """
+        This function removes the items and money of a traderemovegoods line from its side.
+
+        Arguments:
+            record -- TradeRemoveItens record
+        """
+        side = self._side(record.tid, record.roleid, record.timestamp)
+        side.add(record.itemid, -record.count, -record.money)
+
+    def submit(self, record: TradeSubmit) -> None:
+        """
+        This function keeps both sides of a submitted trade from being evicted.
+
+        Arguments:
+            record -- TradeSubmit record
+        """
+        self._side(record.tid, record.roleid_a, record.timestamp)
+        self._side(record.tid, record.roleid_b, record.timestamp)
+
+    def save(self, record: TradeSave) -> TradeCompleted:
+        """
+        This function closes a trade, returning its TradeCompleted record.
+
+        Arguments:
+            record -- TradeSave record
+        """
+        side_a = self.sides.pop((record.tid, record.roleid_a), None) or TradeSide()
+        side_b = self.sides.pop((record.tid, record.roleid_b), None) or TradeSide()
+        self._evict(record.timestamp)
+        return TradeCompleted(
+            record.timestamp,
+            record.tid,
+            record.roleid_a,
+            record.roleid_b,
+            side_a.items_text(),
+            side_a.money,
+            side_b.items_text(),
+            side_b.money,
+        )
+
+    def _side(self, tid: int, roleid: int, timestamp: int) -> TradeSide:
+        key = (tid, roleid)
+        side = self.sides.get(key)
+        if side is None:
+            side = self.sides[key] = TradeSide()
+        else:
+            self.sides.move_to_end(key)
+        side.updated = timestamp
+        self._evict(timestamp)
+        return side
+
+    def _evict(self, now: int) -> None:
+        # The sides are ordered by their last update, so only the first ones can be expired
+        while self.sides:
+            side = next(iter(self.sides.values()))
+            if side.updated > now - self.ttl and len(self.sides) <= self.max_sides:
+                break
+            self.sides.popitem(last=False)
+            self.evicted += 1